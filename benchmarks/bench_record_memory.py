@@ -0,0 +1,73 @@
+import os
+import sys
+import argparse
+import gc
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from models import CheckinRecord, InvoiceRecord
+
+CHECKIN_KEYS = list(CheckinRecord._fields)
+INVOICE_KEYS = list(InvoiceRecord._fields)
+
+def make_checkin_rows(count: int):
+    return [(
+        i,
+        f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+        8.0 + (i % 50) / 10,
+        f'25_{i % 12 + 1:02d}',
+        '上下班打卡_日报.xlsx',
+        '2025-05-01 10:00:00'
+    ) for i in range(count)]
+
+def make_invoice_rows(count: int):
+    return [(
+        i,
+        'taxi',
+        f'2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+        20.0 + i % 80,
+        '起点',
+        '终点',
+        '高德',
+        f'【高德】行程单{i}.pdf',
+        f'【高德】发票{i}.pdf',
+        f'25_{i % 12 + 1:02d}',
+        '2025-05-01 10:00:00'
+    ) for i in range(count)]
+
+def measure(build, rows) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    gc.collect()
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description='比较 1M 条记录在 dict 与 NamedTuple 下的内存占用')
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    cases = [
+        ('CheckinRecord', make_checkin_rows, CHECKIN_KEYS, CheckinRecord),
+        ('InvoiceRecord', make_invoice_rows, INVOICE_KEYS, InvoiceRecord),
+    ]
+
+    print(f"{'记录类型':<16}{'dict (MB)':>12}{'NamedTuple (MB)':>18}{'节省':>10}")
+
+    for name, make_rows, keys, record_type in cases:
+        rows = make_rows(args.count)
+
+        dict_bytes = measure(lambda rs: [dict(zip(keys, r)) for r in rs], rows)
+        tuple_bytes = measure(lambda rs: [record_type._make(r) for r in rs], rows)
+
+        saved = 1 - tuple_bytes / dict_bytes
+        print(f"{name:<16}{dict_bytes / 1e6:>12.1f}{tuple_bytes / 1e6:>18.1f}{saved:>10.0%}")
+
+        del rows
+
+if __name__ == '__main__':
+    main()
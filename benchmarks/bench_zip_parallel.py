@@ -0,0 +1,83 @@
+import os
+import sys
+import argparse
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import archive
+
+def make_month(target_dir: str, pdf_count: int, xls_count: int, seed: int = 1):
+    rng = random.Random(seed)
+    members = []
+
+    for i in range(xls_count):
+        rows = ''.join(f'2025-04-{d % 28 + 1:02d}\t{rng.uniform(8, 13):.1f}\t正常\n' for d in range(40000))
+        file_name = f'上下班打卡_日报_{i}.xls'
+        with open(os.path.join(target_dir, file_name), 'wb') as f:
+            f.write(rows.encode('utf-8'))
+        members.append(file_name)
+
+    for i in range(pdf_count):
+        body = b'%PDF-1.4\n' + rng.randbytes(250_000) + b'\n%%EOF'
+        file_name = f'【高德】行程单{i}.pdf'
+        with open(os.path.join(target_dir, file_name), 'wb') as f:
+            f.write(body)
+        members.append(file_name)
+
+    return members
+
+def zip_serial_baseline(target: str, source_dir: str, members):
+    with zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for file_name in members:
+            with open(os.path.join(source_dir, file_name), 'rb') as f:
+                zf.writestr(f'附件/{file_name}', f.read())
+
+def zip_archive_writer(target_dir: str, source_dir: str, members, workers: int) -> str:
+    with archive.ArchiveWriter(target_dir, workers=workers) as zf:
+        zf.add_files((f'附件/{file_name}', os.path.join(source_dir, file_name)) for file_name in members)
+    return zf.path
+
+def main():
+    parser = argparse.ArgumentParser(description='比较附件打包在单线程 ZIP_DEFLATED 与并行压缩下的吞吐量')
+    parser.add_argument('--pdf', type=int, default=480)
+    parser.add_argument('--xls', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=archive.DEFAULT_WORKERS)
+    parser.add_argument('--deflate-all', action='store_true', help='PDF 也参与压缩，只比较压缩并行度')
+    args = parser.parse_args()
+
+    if args.deflate_all:
+        archive.STORED_EXTENSIONS = ()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_zip_')
+    try:
+        source_dir = os.path.join(work_dir, 'uploads')
+        output_dir = os.path.join(work_dir, 'output')
+        os.makedirs(source_dir)
+        members = make_month(source_dir, args.pdf, args.xls)
+        total_bytes = sum(os.path.getsize(os.path.join(source_dir, m)) for m in members)
+
+        cases = [
+            ('zipfile 单线程', lambda: zip_serial_baseline(os.path.join(work_dir, 'baseline.zip'), source_dir, members)
+                or os.path.join(work_dir, 'baseline.zip')),
+            ('ArchiveWriter 1 线程', lambda: zip_archive_writer(output_dir, source_dir, members, 1)),
+            (f'ArchiveWriter {args.workers} 线程', lambda: zip_archive_writer(output_dir, source_dir, members, args.workers)),
+        ]
+
+        print(f'{len(members)} 个文件，共 {total_bytes / 1e6:.1f} MB，CPU {os.cpu_count()} 核')
+        print(f"{'方式':<24}{'耗时 (s)':>10}{'吞吐 (MB/s)':>14}{'压缩包 (MB)':>14}")
+
+        for name, build in cases:
+            start = time.perf_counter()
+            path = build()
+            elapsed = time.perf_counter() - start
+            print(f'{name:<24}{elapsed:>10.2f}{total_bytes / 1e6 / elapsed:>14.1f}{os.path.getsize(path) / 1e6:>14.1f}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -132,12 +132,10 @@ st.markdown("---")
 
 st.markdown("### 最近导出记录")
 
-export_history = db.get_export_history(5)
+df_history = db.get_export_history_dataframe(5)
 
-if export_history:
-    import pandas as pd
-    df_history = pd.DataFrame(export_history)
-    df_history['created_at'] = pd.to_datetime(df_history['created_at']).dt.strftime('%Y-%m-%d %H:%M')
+if not df_history.empty:
+    df_history['created_at'] = df_history['created_at'].dt.strftime('%Y-%m-%d %H:%M')
     df_history = df_history[['month_folder', 'export_type', 'record_count', 'total_amount', 'created_at']]
     df_history.columns = ['月份', '类型', '记录数', '总金额', '导出时间']
     st.dataframe(df_history, use_container_width=True, hide_index=True)
@@ -0,0 +1,148 @@
+import os
+import sys
+import shutil
+import tempfile
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+# Pre-deflated members are appended by writing the local header and data
+# directly and registering the ZipInfo, which relies on ZipFile internals
+# (fp, start_dir, filelist, NameToInfo, _lock, _writing, _didModify) that
+# have been stable from 3.6 through 3.14. Other versions fall back to
+# sequential compression through the public ZipFile.open API.
+_RAW_MEMBER_WRITES = (3, 6) <= sys.version_info[:2] <= (3, 14)
+_ZIPFILE_INTERNALS = ('fp', 'start_dir', 'filelist', 'NameToInfo', '_lock', '_writing', '_didModify')
+
+STORED_EXTENSIONS = ('.pdf', '.xlsx', '.docx', '.zip', '.png', '.jpg', '.jpeg', '.gif', '.ofd')
+
+def compress_type_for(file_name: str) -> int:
+    if file_name.lower().endswith(STORED_EXTENSIONS):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+class _DeflatedMember(NamedTuple):
+    crc: int
+    file_size: int
+    chunks: List[bytes]
+
+def _deflate_file(file_path: str) -> _DeflatedMember:
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = 0
+    file_size = 0
+    chunks = []
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            crc = zlib.crc32(block, crc)
+            file_size += len(block)
+            chunk = compressor.compress(block)
+            if chunk:
+                chunks.append(chunk)
+    chunks.append(compressor.flush())
+    return _DeflatedMember(crc, file_size, chunks)
+
+class ArchiveWriter:
+    def __init__(self, target_dir: str, prefix: str = 'bundle_', workers: int = DEFAULT_WORKERS):
+        os.makedirs(target_dir, exist_ok=True)
+        self.workers = workers
+        fd, self.path = tempfile.mkstemp(suffix='.zip', prefix=prefix, dir=target_dir)
+        self._file = os.fdopen(fd, 'wb')
+        self._zip = zipfile.ZipFile(self._file, 'w', zipfile.ZIP_DEFLATED)
+        self.names = set()
+
+    def __enter__(self) -> 'ArchiveWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is not None:
+            remove_archive(self.path)
+
+    def add_bytes(self, arcname: str, data: bytes):
+        zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        zinfo.compress_type = compress_type_for(arcname)
+        self._zip.writestr(zinfo, data)
+        self.names.add(arcname)
+
+    def add_file(self, arcname: str, file_path: str):
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        zinfo.compress_type = compress_type_for(file_path)
+        with open(file_path, 'rb') as src, self._zip.open(zinfo, 'w') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        self.names.add(arcname)
+
+    def add_files(self, members: Iterable[Tuple[str, str]]):
+        members = list(dict((arcname, file_path) for arcname, file_path in members if arcname not in self.names).items())
+        deflated = sum(1 for _, file_path in members if compress_type_for(file_path) == zipfile.ZIP_DEFLATED)
+        if self.workers <= 1 or deflated < 2 or not self._supports_raw_members():
+            for arcname, file_path in members:
+                self.add_file(arcname, file_path)
+            return
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            window = deque()
+            for arcname, file_path in members:
+                future = None
+                if compress_type_for(file_path) == zipfile.ZIP_DEFLATED:
+                    future = pool.submit(_deflate_file, file_path)
+                window.append((arcname, file_path, future))
+                if len(window) > self.workers * 2:
+                    self._write_member(*window.popleft())
+            while window:
+                self._write_member(*window.popleft())
+
+    def _supports_raw_members(self) -> bool:
+        return _RAW_MEMBER_WRITES and all(hasattr(self._zip, name) for name in _ZIPFILE_INTERNALS)
+
+    def _write_member(self, arcname: str, file_path: str, future):
+        if future is None:
+            self.add_file(arcname, file_path)
+            return
+        
+        member = future.result()
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.CRC = member.crc
+        zinfo.file_size = member.file_size
+        zinfo.compress_size = sum(len(chunk) for chunk in member.chunks)
+        zip64 = max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT
+        
+        zf = self._zip
+        with zf._lock:
+            if zf._writing:
+                raise ValueError("Can't write to the ZIP file while there is another write handle open on it.")
+            zf.fp.seek(zf.start_dir)
+            zinfo.header_offset = zf.fp.tell()
+            zf.fp.write(zinfo.FileHeader(zip64))
+            for chunk in member.chunks:
+                zf.fp.write(chunk)
+            zf.start_dir = zf.fp.tell()
+            zf.filelist.append(zinfo)
+            zf.NameToInfo[arcname] = zinfo
+            zf._didModify = True
+        self.names.add(arcname)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._file.close()
+            self._zip = None
+
+def remove_archive(path: Optional[str]):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def archive_reader(path: str) -> Callable[[], bytes]:
+    def read() -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
@@ -0,0 +1,146 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Optional, Tuple
+import database as db
+
+HASH_CHUNK_SIZE = 1024 * 1024
+GC_GRACE_SECONDS = 3600
+OWNER_FILE = '.owner'
+
+CHECKIN = 'checkin'
+
+_verified_stores = set()
+
+def blobs_dir() -> str:
+    db_path = os.path.abspath(db.DB_PATH)
+    path = os.path.splitext(db_path)[0] + '.blobs'
+    if (path, db_path) in _verified_stores:
+        return path
+
+    store_id = db.get_attachment_store_id()
+    owner_file = os.path.join(path, OWNER_FILE)
+    try:
+        with open(owner_file, encoding='utf-8') as f:
+            owner = f.read().strip()
+    except FileNotFoundError:
+        os.makedirs(path, exist_ok=True)
+        with open(owner_file, 'w', encoding='utf-8') as f:
+            f.write(store_id)
+        owner = store_id
+    if owner != store_id:
+        raise ValueError(f'附件存储 {path} 属于另一个数据库（{owner}），不能与 {db_path}（{store_id}）共用')
+
+    _verified_stores.add((path, db_path))
+    return path
+
+def blob_path(digest: str) -> str:
+    return os.path.join(blobs_dir(), digest[:2], digest)
+
+def _hash_stream(source: BinaryIO) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+        digest.update(block)
+        size += len(block)
+    return digest.hexdigest(), size
+
+def _has_blob(digest: str) -> bool:
+    try:
+        os.utime(blob_path(digest))
+    except FileNotFoundError:
+        return False
+    return True
+
+def _publish_blob(source: BinaryIO, digest: str) -> str:
+    path = blob_path(digest)
+    if _has_blob(digest):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(source, f, HASH_CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def put_file(file_path: str) -> Tuple[str, int]:
+    with open(file_path, 'rb') as f:
+        digest, size = _hash_stream(f)
+        if not _has_blob(digest):
+            f.seek(0)
+            _publish_blob(f, digest)
+    return digest, size
+
+def put_stream(source: BinaryIO) -> Tuple[str, int]:
+    if source.seekable():
+        source.seek(0)
+        digest, size = _hash_stream(source)
+        if not _has_blob(digest):
+            source.seek(0)
+            _publish_blob(source, digest)
+        return digest, size
+
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=blobs_dir())
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb') as f:
+            for block in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+                f.write(block)
+        with open(tmp_path, 'rb') as f:
+            _publish_blob(f, digest.hexdigest())
+    finally:
+        os.remove(tmp_path)
+    return digest.hexdigest(), size
+
+def attach_file(month_folder: str, file_path: str, kind: str, file_name: Optional[str] = None,
+                replace: bool = False) -> str:
+    digest, size = put_file(file_path)
+    return db.save_attachment(month_folder, file_name or os.path.basename(file_path), digest, size, kind, replace)
+
+def attach_stream(month_folder: str, file_name: str, source: BinaryIO, kind: str, replace: bool = False) -> str:
+    digest, size = put_stream(source)
+    return db.save_attachment(month_folder, file_name, digest, size, kind, replace)
+
+def month_attachments(month_folder: str, month_upload_dir: Optional[str] = None) -> Dict[str, str]:
+    files = {}
+    if month_upload_dir and os.path.isdir(month_upload_dir):
+        files = {entry.name: entry.path for entry in os.scandir(month_upload_dir) if entry.is_file()}
+    for attachment in db.get_attachments(month_folder):
+        path = blob_path(attachment.sha256)
+        if os.path.exists(path):
+            files[attachment.file_name] = path
+    return files
+
+def collect_garbage(grace: float = GC_GRACE_SECONDS) -> Dict[str, int]:
+    store = blobs_dir()
+    cutoff = time.time() - grace
+    created_before = datetime.fromtimestamp(cutoff, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    rows = db.delete_unreferenced_attachments(created_before)
+
+    removed = 0
+    freed = 0
+    live = db.get_attachment_digests()
+    for shard in os.scandir(store):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            stat = entry.stat()
+            if entry.name in live or stat.st_mtime > cutoff:
+                continue
+            os.remove(entry.path)
+            removed += 1
+            freed += stat.st_size
+
+    return {'attachments': rows, 'blobs': removed, 'bytes': freed}
@@ -1,8 +1,21 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+import copy
+import re
+import threading
+import uuid
+import time
+import functools
+from bisect import bisect_right
+from collections import OrderedDict
+import pandas as pd
+from datetime import datetime, date
+from typing import List, Dict, Optional, Any, Iterator, Tuple
+from models import CheckinRecord, InvoiceRecord, ReimburseRecord, IngestedFile, Attachment
+from rules import DEFAULT_REIMBURSE_RULES, policy_from_rules, policy_digest, evaluate
+from validation import validate_taxi_invoices
+from work_calendar import get_expense_month_range
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
@@ -17,9 +30,44 @@ for dir_path in [DB_DIR, CONFIG_DIR, UPLOADS_DIR, OUTPUT_DIR]:
 DB_PATH = os.path.join(DB_DIR, 'reimburse.db')
 CONFIG_PATH = os.path.join(CONFIG_DIR, 'config.json')
 
+_data_version = 0
+_data_version_lock = threading.Lock()
+
+_read_cache = OrderedDict()
+_read_cache_lock = threading.Lock()
+_read_cache_state = {'version': None, 'external_version': None, 'checked_at': None}
+READ_CACHE_SIZE = 256
+EXTERNAL_CHECK_INTERVAL = 1.0
+
+_config_cache = {}
+_config_cache_lock = threading.Lock()
+_config_watch = {'conn': None, 'data_version': None, 'lock': threading.Lock()}
+
+_RULE_VERSIONS_KEY = ('rule_versions',)
+INITIAL_RULE_VERSION = '00_00'
+RULE_CONFIG_KEYS = ('reimburse_rules', 'reimburse_policy')
+
+REIMBURSE_KINDS = {'meal': ('dinner', 'night'), 'taxi': ('taxi',)}
+KIND_POLICY_KEYS = {
+    'meal': ('dinner', 'night', 'multipliers', 'holidays', 'workdays'),
+    'taxi': ('taxi', 'taxi_caps', 'holidays', 'workdays')
+}
+ALL_DATES = '*'
+
+_refresh_lock = threading.Lock()
+_refresh_state = {'clean_version': None}
+
+SCHEMA_VERSION = 2
+DATED_TABLES = ('checkin_records', 'invoice_records', 'reimburse_records')
+
 def get_connection():
     return sqlite3.connect(DB_PATH)
 
+def _bump_data_version():
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+
 def init_db():
     conn = get_connection()
     cursor = conn.cursor()
@@ -94,24 +142,91 @@ def init_db():
         )
     ''')
     
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rule_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            valid_from TEXT UNIQUE NOT NULL,
+            policy TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reimburse_dirty (
+            month_folder TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            date TEXT NOT NULL,
+            PRIMARY KEY (month_folder, kind, date)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            month_folder TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(month_folder, file_name)
+        )
+    ''')
+    
+    cursor.execute('CREATE TABLE IF NOT EXISTS attachment_store (store_id TEXT PRIMARY KEY)')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            month_folder TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            stored_name TEXT,
+            ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    try:
+        cursor.execute('ALTER TABLE ingested_files ADD COLUMN stored_name TEXT')
+    except:
+        pass
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_checkin_records_date_id ON checkin_records(date, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoice_records_date_id ON invoice_records(date, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_checkin_records_month_date ON checkin_records(month_folder, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_invoice_records_month_type_date ON invoice_records(month_folder, invoice_type, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reimburse_records_month_type_date ON reimburse_records(month_folder, reimburse_type, date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attachments_sha256 ON attachments(sha256)')
+    
     init_default_config(cursor)
     
+    schema_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    if schema_version < 2:
+        _normalize_stored_dates(cursor)
+    
     conn.commit()
+    _bump_data_version()
     conn.close()
+    
+    if schema_version < SCHEMA_VERSION:
+        _mark_months_dirty([(month_folder, kind) for month_folder in get_month_folders() for kind in REIMBURSE_KINDS])
+        conn = get_connection()
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.close()
+
+def _normalize_stored_dates(cursor):
+    for table in DATED_TABLES:
+        cursor.execute(f'''
+            UPDATE OR IGNORE {table} SET date = substr(date, 1, 10)
+            WHERE date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]?*'
+        ''')
 
 def init_default_config(cursor):
     default_config = {
-        'reimburse_rules': json.dumps({
-            'night_meal': {
-                'dinner_threshold': 9.5,
-                'dinner_amount': 18,
-                'night_threshold': 12,
-                'night_amount': 20
-            },
-            'taxi': {
-                'threshold': 11.0
-            }
-        }),
+        'reimburse_rules': json.dumps(DEFAULT_REIMBURSE_RULES),
         'output': json.dumps({
             'default_name': '姓名',
             'night_meal_template': '{name}_晚餐、夜宵报销明细表_{month}月.xls',
@@ -130,21 +245,100 @@ def init_default_config(cursor):
             (key, value)
         )
 
-def get_config(key: str) -> Optional[Any]:
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT value FROM config WHERE key = ?', (key,))
-    result = cursor.fetchone()
-    conn.close()
+def _external_data_version() -> int:
+    with _config_watch['lock']:
+        if _config_watch['conn'] is None:
+            _config_watch['conn'] = sqlite3.connect(DB_PATH, check_same_thread=False)
+        return _config_watch['conn'].execute('PRAGMA data_version').fetchone()[0]
+
+def _current_data_version() -> Tuple[int, int]:
+    now = time.monotonic()
+    checked_at = _read_cache_state['checked_at']
+    if checked_at is None or now - checked_at >= EXTERNAL_CHECK_INTERVAL:
+        _read_cache_state['external_version'] = _external_data_version()
+        _read_cache_state['checked_at'] = now
+    return _data_version, _read_cache_state['external_version']
+
+def _read_cache_key(name: str, args: tuple, kwargs: Dict) -> Optional[tuple]:
+    key = (name,) + tuple(tuple(a) if isinstance(a, list) else a for a in args) + tuple(
+        (k, tuple(v) if isinstance(v, list) else v) for k, v in sorted(kwargs.items())
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def _copy_result(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, (list, dict)):
+        return copy.deepcopy(value)
+    return value
+
+def cached_read(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = _read_cache_key(func.__name__, args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        
+        version = _current_data_version()
+        with _read_cache_lock:
+            if _read_cache_state['version'] != version:
+                _read_cache.clear()
+                _read_cache_state['version'] = version
+            elif key in _read_cache:
+                _read_cache.move_to_end(key)
+                return _copy_result(_read_cache[key])
+        
+        value = func(*args, **kwargs)
+        
+        with _read_cache_lock:
+            if _read_cache_state['version'] == version:
+                _read_cache[key] = value
+                while len(_read_cache) > READ_CACHE_SIZE:
+                    _read_cache.popitem(last=False)
+        
+        return _copy_result(value)
     
-    if result:
-        try:
-            return json.loads(result[0])
-        except:
-            return result[0]
-    return None
+    return wrapper
+
+def clear_read_cache():
+    with _read_cache_lock:
+        _read_cache.clear()
+        _read_cache_state['version'] = None
+        _read_cache_state['checked_at'] = None
+
+def _sync_config_cache():
+    version = _current_data_version()
+    if version != _config_watch['data_version']:
+        _config_cache.clear()
+        _config_watch['data_version'] = version
+
+def _decode_config_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except:
+        return value
+
+def get_config(key: str) -> Optional[Any]:
+    with _config_cache_lock:
+        _sync_config_cache()
+        if key not in _config_cache:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT value FROM config WHERE key = ?', (key,))
+            result = cursor.fetchone()
+            conn.close()
+            
+            _config_cache[key] = _decode_config_value(result[0]) if result else None
+        
+        return copy.deepcopy(_config_cache[key])
 
 def set_config(key: str, value: Any):
+    month_policies = _snapshot_month_policies() if key in RULE_CONFIG_KEYS else None
+    
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -157,7 +351,128 @@ def set_config(key: str, value: Any):
     )
     
     conn.commit()
+    _bump_data_version()
+    conn.close()
+    
+    with _config_cache_lock:
+        _config_cache.pop(key, None)
+    
+    if month_policies is not None:
+        _mark_changed_months(month_policies)
+
+def delete_config(key: str):
+    month_policies = _snapshot_month_policies() if key in RULE_CONFIG_KEYS else None
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM config WHERE key = ?', (key,))
+    conn.commit()
+    _bump_data_version()
     conn.close()
+    
+    with _config_cache_lock:
+        _config_cache.pop(key, None)
+    
+    if month_policies is not None:
+        _mark_changed_months(month_policies)
+
+def get_reimburse_rules() -> Dict[str, Any]:
+    return get_config('reimburse_rules') or copy.deepcopy(DEFAULT_REIMBURSE_RULES)
+
+def _get_rule_version_index() -> Dict[str, Any]:
+    with _config_cache_lock:
+        _sync_config_cache()
+        index = _config_cache.get(_RULE_VERSIONS_KEY)
+        if index is None:
+            conn = get_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT valid_from, policy FROM rule_versions ORDER BY valid_from')
+            results = cursor.fetchall()
+            conn.close()
+            
+            index = {
+                'valid_from': [row[0] for row in results],
+                'policies': [json.loads(row[1]) for row in results],
+                'by_month': {}
+            }
+            _config_cache[_RULE_VERSIONS_KEY] = index
+        
+        return index
+
+def _lookup_rule_version(index: Dict[str, Any], month_folder: str) -> int:
+    by_month = index['by_month']
+    if month_folder not in by_month:
+        by_month[month_folder] = bisect_right(index['valid_from'], month_folder) - 1
+    return by_month[month_folder]
+
+def get_rule_version(month_folder: str) -> Optional[str]:
+    index = _get_rule_version_index()
+    pos = _lookup_rule_version(index, month_folder)
+    return index['valid_from'][pos] if pos >= 0 else None
+
+@cached_read
+def get_rule_versions() -> List[Dict]:
+    index = _get_rule_version_index()
+    return [
+        {'valid_from': valid_from, 'policy': copy.deepcopy(policy)}
+        for valid_from, policy in zip(index['valid_from'], index['policies'])
+    ]
+
+def get_reimburse_policy(month_folder: Optional[str] = None) -> Dict[str, Any]:
+    if month_folder is not None:
+        index = _get_rule_version_index()
+        pos = _lookup_rule_version(index, month_folder)
+        if pos >= 0:
+            return copy.deepcopy(index['policies'][pos])
+    
+    return get_config('reimburse_policy') or policy_from_rules(get_reimburse_rules())
+
+def validate_rule_version(valid_from: str):
+    if not re.fullmatch(r'\d{2}_\d{2}', valid_from or ''):
+        raise ValueError('生效月份格式应为 YY_MM，例如 25_05')
+
+def save_rule_version(valid_from: str, policy: Dict[str, Any], previous_policy: Optional[Dict[str, Any]] = None):
+    validate_rule_version(valid_from)
+    month_policies = _snapshot_month_policies()
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT COUNT(*) FROM rule_versions')
+    if cursor.fetchone()[0] == 0 and previous_policy is not None and valid_from != INITIAL_RULE_VERSION:
+        cursor.execute(
+            'INSERT INTO rule_versions (valid_from, policy) VALUES (?, ?)',
+            (INITIAL_RULE_VERSION, json.dumps(previous_policy, ensure_ascii=False))
+        )
+    
+    cursor.execute(
+        'INSERT OR REPLACE INTO rule_versions (valid_from, policy, created_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+        (valid_from, json.dumps(policy, ensure_ascii=False))
+    )
+    
+    conn.commit()
+    _bump_data_version()
+    conn.close()
+    
+    with _config_cache_lock:
+        _config_cache.pop(_RULE_VERSIONS_KEY, None)
+    
+    _mark_changed_months(month_policies)
+
+def delete_rule_version(valid_from: str):
+    month_policies = _snapshot_month_policies()
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM rule_versions WHERE valid_from = ?', (valid_from,))
+    conn.commit()
+    _bump_data_version()
+    conn.close()
+    
+    with _config_cache_lock:
+        _config_cache.pop(_RULE_VERSIONS_KEY, None)
+    
+    _mark_changed_months(month_policies)
 
 def get_all_config() -> Dict[str, Any]:
     conn = get_connection()
@@ -168,10 +483,7 @@ def get_all_config() -> Dict[str, Any]:
     
     config = {}
     for key, value in results:
-        try:
-            config[key] = json.loads(value)
-        except:
-            config[key] = value
+        config[key] = _decode_config_value(value)
     
     return config
 
@@ -179,22 +491,29 @@ def save_checkin_records(records: List[Dict], month_folder: str, source_file: st
     conn = get_connection()
     cursor = conn.cursor()
     
+    dates = []
     for record in records:
+        date_val = _to_date_str(record['date'])
+        dates.append(date_val)
         cursor.execute('''
             INSERT OR REPLACE INTO checkin_records 
             (date, work_hours, month_folder, source_file)
             VALUES (?, ?, ?, ?)
         ''', (
-            record['date'].strftime('%Y-%m-%d') if isinstance(record['date'], datetime) else record['date'],
+            date_val,
             record['work_hours'],
             month_folder,
             source_file
         ))
     
+    _mark_dirty(cursor, [(month_folder, date_str) for date_str in dates])
+    
     conn.commit()
+    _bump_data_version()
     conn.close()
 
-def get_checkin_records(month_folder: Optional[str] = None) -> List[Dict]:
+@cached_read
+def get_checkin_records(month_folder: Optional[str] = None) -> Tuple[CheckinRecord, ...]:
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -215,14 +534,7 @@ def get_checkin_records(month_folder: Optional[str] = None) -> List[Dict]:
     results = cursor.fetchall()
     conn.close()
     
-    return [{
-        'id': r[0],
-        'date': r[1],
-        'work_hours': r[2],
-        'month_folder': r[3],
-        'source_file': r[4],
-        'created_at': r[5]
-    } for r in results]
+    return tuple(CheckinRecord._make(r) for r in results)
 
 def update_checkin_record(record_id: int, work_hours: float):
     conn = get_connection()
@@ -231,24 +543,29 @@ def update_checkin_record(record_id: int, work_hours: float):
         'UPDATE checkin_records SET work_hours = ? WHERE id = ?',
         (work_hours, record_id)
     )
+    _mark_dirty(cursor, _lookup_record_dates(cursor, 'checkin_records', [record_id]))
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 def delete_checkin_record(record_id: int):
     conn = get_connection()
     cursor = conn.cursor()
+    affected = _lookup_record_dates(cursor, 'checkin_records', [record_id])
     cursor.execute('DELETE FROM checkin_records WHERE id = ?', (record_id,))
+    _mark_dirty(cursor, affected)
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 def save_invoice_records(records: List[Dict], month_folder: str):
     conn = get_connection()
     cursor = conn.cursor()
     
+    dates = []
     for record in records:
-        date_val = record.get('date', datetime.now())
-        if isinstance(date_val, datetime):
-            date_val = date_val.strftime('%Y-%m-%d')
+        date_val = _to_date_str(record.get('date', datetime.now()))
+        dates.append(date_val)
         
         cursor.execute('''
             INSERT INTO invoice_records 
@@ -266,10 +583,14 @@ def save_invoice_records(records: List[Dict], month_folder: str):
             month_folder
         ))
     
+    _mark_dirty(cursor, [(month_folder, date_str) for date_str in dates], ('taxi',))
+    
     conn.commit()
+    _bump_data_version()
     conn.close()
 
-def get_invoice_records(month_folder: Optional[str] = None, invoice_type: Optional[str] = None) -> List[Dict]:
+@cached_read
+def get_invoice_records(month_folder: Optional[str] = None, invoice_type: Optional[str] = None) -> Tuple[InvoiceRecord, ...]:
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -294,19 +615,28 @@ def get_invoice_records(month_folder: Optional[str] = None, invoice_type: Option
     results = cursor.fetchall()
     conn.close()
     
-    return [{
-        'id': r[0],
-        'invoice_type': r[1],
-        'date': r[2],
-        'amount': r[3],
-        'start_location': r[4],
-        'end_location': r[5],
-        'company': r[6],
-        'source_file': r[7],
-        'invoice_file': r[8],
-        'month_folder': r[9],
-        'created_at': r[10]
-    } for r in results]
+    return tuple(InvoiceRecord._make(r) for r in results)
+
+@cached_read
+def get_expense_month_invoices(month_folder: str, invoice_type: str = 'taxi') -> Tuple[InvoiceRecord, ...]:
+    expense_filter = _expense_month_filter(month_folder)
+    if expense_filter is None:
+        return ()
+    range_clause, range_params = expense_filter
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        SELECT {', '.join(InvoiceRecord._fields)}
+        FROM invoice_records
+        WHERE month_folder = ? AND invoice_type = ? AND {range_clause}
+        ORDER BY date
+    ''', [month_folder, invoice_type] + range_params)
+    results = cursor.fetchall()
+    conn.close()
+    
+    return tuple(InvoiceRecord._make(r) for r in results)
 
 def update_invoice_record(record_id: int, **kwargs):
     conn = get_connection()
@@ -316,34 +646,39 @@ def update_invoice_record(record_id: int, **kwargs):
     values = []
     
     for key, value in kwargs.items():
-        if key in ['amount', 'start_location', 'end_location', 'company', 'date']:
+        if key in ['amount', 'start_location', 'end_location', 'company', 'date', 'invoice_file']:
             update_fields.append(f'{key} = ?')
-            if key == 'date' and isinstance(value, datetime):
-                value = value.strftime('%Y-%m-%d')
+            if key == 'date':
+                value = _to_date_str(value)
             values.append(value)
     
     if update_fields:
+        affected = _lookup_record_dates(cursor, 'invoice_records', [record_id])
         values.append(record_id)
         query = f"UPDATE invoice_records SET {', '.join(update_fields)} WHERE id = ?"
         cursor.execute(query, values)
+        affected += _lookup_record_dates(cursor, 'invoice_records', [record_id])
+        _mark_dirty(cursor, affected, ('taxi',))
         conn.commit()
+        _bump_data_version()
     
     conn.close()
 
 def delete_invoice_record(record_id: int):
     conn = get_connection()
     cursor = conn.cursor()
+    affected = _lookup_record_dates(cursor, 'invoice_records', [record_id])
     cursor.execute('DELETE FROM invoice_records WHERE id = ?', (record_id,))
+    _mark_dirty(cursor, affected, ('taxi',))
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 def save_reimburse_record(record: Dict):
     conn = get_connection()
     cursor = conn.cursor()
     
-    date_val = record.get('date', datetime.now())
-    if isinstance(date_val, datetime):
-        date_val = date_val.strftime('%Y-%m-%d')
+    date_val = _to_date_str(record.get('date', datetime.now()))
     
     cursor.execute('''
         INSERT INTO reimburse_records 
@@ -362,9 +697,13 @@ def save_reimburse_record(record: Dict):
     ))
     
     conn.commit()
+    _bump_data_version()
     conn.close()
 
-def get_reimburse_records(month_folder: Optional[str] = None) -> List[Dict]:
+@cached_read
+def get_reimburse_records(month_folder: Optional[str] = None) -> Tuple[ReimburseRecord, ...]:
+    refresh_reimburse_records(month_folder)
+    
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -385,19 +724,206 @@ def get_reimburse_records(month_folder: Optional[str] = None) -> List[Dict]:
     results = cursor.fetchall()
     conn.close()
     
-    return [{
-        'id': r[0],
-        'month_folder': r[1],
-        'reimburse_type': r[2],
-        'date': r[3],
-        'amount': r[4],
-        'work_hours': r[5],
-        'start_location': r[6],
-        'end_location': r[7],
-        'company': r[8],
-        'notes': r[9],
-        'created_at': r[10]
-    } for r in results]
+    return tuple(ReimburseRecord._make(r) for r in results)
+
+def _materialize_reimburse_records(cursor, month_folder: str, dates: Optional[List[str]] = None,
+                                   kinds: Tuple[str, ...] = tuple(REIMBURSE_KINDS)):
+    date_filter = ''
+    params = [month_folder]
+    if dates is not None:
+        dates = sorted(set(dates))
+        if not dates:
+            return
+        date_filter = f" AND date IN ({','.join('?' * len(dates))})"
+        params += dates
+    
+    reimburse_types = [t for kind in kinds for t in REIMBURSE_KINDS[kind]]
+    type_filter = f" AND reimburse_type IN ({','.join('?' * len(reimburse_types))})"
+    cursor.execute(f'DELETE FROM reimburse_records WHERE month_folder = ?{date_filter}{type_filter}', params + reimburse_types)
+    
+    cursor.execute(f'''
+        SELECT {', '.join(CheckinRecord._fields)}
+        FROM checkin_records
+        WHERE month_folder = ?{date_filter}
+        ORDER BY date
+    ''', params)
+    checkins = [CheckinRecord._make(r) for r in cursor.fetchall()]
+    
+    invoices = []
+    expense_filter = _expense_month_filter(month_folder)
+    if 'taxi' in kinds and expense_filter:
+        range_clause, range_params = expense_filter
+        cursor.execute(f'''
+            SELECT {', '.join(InvoiceRecord._fields)}
+            FROM invoice_records
+            WHERE month_folder = ? AND invoice_type = 'taxi' AND {range_clause}{date_filter}
+            ORDER BY date
+        ''', [month_folder] + range_params + params[1:])
+        invoices = [InvoiceRecord._make(r) for r in cursor.fetchall()]
+    
+    if not checkins and not invoices:
+        return
+    
+    policy = get_reimburse_policy(month_folder)
+    rows = []
+    
+    if checkins and 'meal' in kinds:
+        eligibility = evaluate([c.work_hours for c in checkins], policy, [c.date for c in checkins])
+        for reimburse_type in REIMBURSE_KINDS['meal']:
+            amounts = getattr(eligibility, f'{reimburse_type}_amount').tolist()
+            reasons = eligibility.reasons(reimburse_type)
+            for checkin, eligible, amount, reason in zip(checkins, eligibility.mask(reimburse_type).tolist(), amounts, reasons):
+                if eligible:
+                    rows.append((month_folder, reimburse_type, checkin.date, amount, checkin.work_hours, '', '', '', reason))
+    
+    if invoices:
+        for result in validate_taxi_invoices(invoices, checkins, policy).valid:
+            invoice = result.invoice
+            rows.append((month_folder, 'taxi', invoice.date, result.reimburse_amount, result.work_hours,
+                         invoice.start_location, invoice.end_location, invoice.company, result.reason))
+    
+    cursor.executemany('''
+        INSERT INTO reimburse_records
+        (month_folder, reimburse_type, date, amount, work_hours, start_location, end_location, company, notes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+def _lookup_record_dates(cursor, table: str, record_ids: List[int]) -> List[Tuple[str, str]]:
+    if not record_ids:
+        return []
+    placeholders = ','.join('?' * len(record_ids))
+    cursor.execute(f'SELECT month_folder, date FROM {table} WHERE id IN ({placeholders})', list(record_ids))
+    return cursor.fetchall()
+
+def _mark_dirty(cursor, month_dates: List[Tuple[str, str]], kinds: Tuple[str, ...] = tuple(REIMBURSE_KINDS)):
+    cursor.executemany(
+        'INSERT OR IGNORE INTO reimburse_dirty (month_folder, kind, date) VALUES (?, ?, ?)',
+        [(month_folder, kind, date_str) for month_folder, date_str in set(month_dates) if month_folder for kind in kinds]
+    )
+
+def _mark_months_dirty(month_kinds: List[Tuple[str, str]]):
+    if not month_kinds:
+        return
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        'INSERT OR IGNORE INTO reimburse_dirty (month_folder, kind, date) VALUES (?, ?, ?)',
+        [(month_folder, kind, ALL_DATES) for month_folder, kind in month_kinds]
+    )
+    conn.commit()
+    _bump_data_version()
+    conn.close()
+
+def refresh_reimburse_records(month_folder: Optional[str] = None) -> int:
+    with _refresh_lock:
+        external_version = _external_data_version()
+        if _refresh_state['clean_version'] == external_version:
+            return 0
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        if month_folder:
+            cursor.execute('SELECT 1 FROM reimburse_dirty WHERE month_folder = ? LIMIT 1', (month_folder,))
+        else:
+            cursor.execute('SELECT 1 FROM reimburse_dirty LIMIT 1')
+        if cursor.fetchone() is None:
+            conn.close()
+            if month_folder is None:
+                _refresh_state['clean_version'] = external_version
+            return 0
+        
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        if month_folder:
+            cursor.execute('SELECT month_folder, kind, date FROM reimburse_dirty WHERE month_folder = ?', (month_folder,))
+        else:
+            cursor.execute('SELECT month_folder, kind, date FROM reimburse_dirty')
+        dirty = cursor.fetchall()
+        
+        if not dirty:
+            conn.rollback()
+            conn.close()
+            if month_folder is None:
+                _refresh_state['clean_version'] = external_version
+            return 0
+        
+        dates_by_key = {}
+        for folder, kind, date_str in dirty:
+            dates_by_key.setdefault((folder, kind), set()).add(date_str)
+        
+        for (folder, kind), dates in dates_by_key.items():
+            _materialize_reimburse_records(cursor, folder, None if ALL_DATES in dates else list(dates), (kind,))
+        
+        if month_folder:
+            cursor.execute('DELETE FROM reimburse_dirty WHERE month_folder = ?', (month_folder,))
+        else:
+            cursor.execute('DELETE FROM reimburse_dirty')
+        
+        conn.commit()
+        _bump_data_version()
+        conn.close()
+        
+        return len(dates_by_key)
+
+def refresh_reimburse_records_in_background() -> threading.Thread:
+    thread = threading.Thread(target=refresh_reimburse_records, name='reimburse-refresh', daemon=True)
+    thread.start()
+    return thread
+
+def _kind_policy_digests(month_folder: str) -> Dict[str, str]:
+    policy = get_reimburse_policy(month_folder)
+    return {kind: policy_digest({key: policy.get(key) for key in keys}) for kind, keys in KIND_POLICY_KEYS.items()}
+
+def _snapshot_month_policies() -> Dict[str, Dict[str, str]]:
+    return {month_folder: _kind_policy_digests(month_folder) for month_folder in get_month_folders()}
+
+def _mark_changed_months(month_policies: Dict[str, Dict[str, str]]):
+    changed = []
+    for month_folder, digests in month_policies.items():
+        current = _kind_policy_digests(month_folder)
+        changed += [(month_folder, kind) for kind in REIMBURSE_KINDS if current[kind] != digests[kind]]
+    _mark_months_dirty(changed)
+
+@cached_read
+def get_meal_reimbursements(month_folder: str) -> pd.DataFrame:
+    refresh_reimburse_records(month_folder)
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT date, MAX(work_hours),
+               MAX(reimburse_type = 'dinner'), MAX(reimburse_type = 'night'),
+               SUM(CASE WHEN reimburse_type = 'dinner' THEN amount ELSE 0 END),
+               SUM(CASE WHEN reimburse_type = 'night' THEN amount ELSE 0 END)
+        FROM reimburse_records
+        WHERE month_folder = ? AND reimburse_type IN ('dinner', 'night')
+        GROUP BY date
+        ORDER BY date
+    ''', (month_folder,))
+    results = cursor.fetchall()
+    conn.close()
+    
+    df = pd.DataFrame(results, columns=['date', 'work_hours', 'dinner', 'night', 'dinner_amount', 'night_amount'])
+    return df.astype({'work_hours': 'float64', 'dinner': 'bool', 'night': 'bool',
+                      'dinner_amount': 'float64', 'night_amount': 'float64'})
+
+@cached_read
+def get_reimburse_summary() -> pd.DataFrame:
+    refresh_reimburse_records()
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT month_folder, reimburse_type, COUNT(*), COALESCE(SUM(amount), 0)
+        FROM reimburse_records
+        GROUP BY month_folder, reimburse_type
+    ''')
+    results = cursor.fetchall()
+    conn.close()
+    
+    return pd.DataFrame(results, columns=['month_folder', 'reimburse_type', 'count', 'amount'])
 
 def save_export_history(month_folder: str, export_type: str, file_path: str, record_count: int, total_amount: float):
     conn = get_connection()
@@ -410,8 +936,155 @@ def save_export_history(month_folder: str, export_type: str, file_path: str, rec
     ''', (month_folder, export_type, file_path, record_count, total_amount))
     
     conn.commit()
+    _bump_data_version()
+    conn.close()
+
+def _unique_file_name(cursor, month_folder: str, file_name: str) -> str:
+    stem, ext = os.path.splitext(file_name)
+    n = 2
+    while cursor.execute(
+        'SELECT 1 FROM attachments WHERE month_folder = ? AND file_name = ?', (month_folder, file_name)
+    ).fetchone():
+        file_name = f'{stem} ({n}){ext}'
+        n += 1
+    return file_name
+
+def get_attachment_store_id() -> str:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'INSERT INTO attachment_store (store_id) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM attachment_store)',
+        (uuid.uuid4().hex,)
+    )
+    conn.commit()
+    store_id = cursor.execute('SELECT store_id FROM attachment_store').fetchone()[0]
+    conn.close()
+    return store_id
+
+def save_attachment(month_folder: str, file_name: str, sha256: str, size: int, kind: str, replace: bool = False) -> str:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    row = cursor.execute(
+        'SELECT sha256 FROM attachments WHERE month_folder = ? AND file_name = ?', (month_folder, file_name)
+    ).fetchone()
+    if row is not None and row[0] == sha256:
+        conn.close()
+        return file_name
+    
+    if row is not None and not replace:
+        existing = cursor.execute(
+            'SELECT file_name FROM attachments WHERE month_folder = ? AND sha256 = ? AND kind = ? ORDER BY id LIMIT 1',
+            (month_folder, sha256, kind)
+        ).fetchone()
+        if existing is not None:
+            conn.close()
+            return existing[0]
+        file_name = _unique_file_name(cursor, month_folder, file_name)
+    
+    cursor.execute('''
+        INSERT OR REPLACE INTO attachments (month_folder, file_name, sha256, size, kind)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (month_folder, file_name, sha256, size, kind))
+    
+    conn.commit()
+    _bump_data_version()
+    conn.close()
+    return file_name
+
+@cached_read
+def get_attachments(month_folder: str, kind: Optional[str] = None) -> Tuple[Attachment, ...]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    query = f'SELECT {", ".join(Attachment._fields)} FROM attachments WHERE month_folder = ?'
+    params = [month_folder]
+    if kind:
+        query += ' AND kind = ?'
+        params.append(kind)
+    
+    cursor.execute(query + ' ORDER BY file_name', params)
+    results = cursor.fetchall()
+    conn.close()
+    
+    return tuple(Attachment._make(r) for r in results)
+
+def get_attachment_digests() -> set:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT DISTINCT sha256 FROM attachments')
+    results = {r[0] for r in cursor.fetchall()}
+    conn.close()
+    
+    return results
+
+def delete_unreferenced_attachments(created_before: str) -> int:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        DELETE FROM attachments
+        WHERE created_at < ?
+        AND NOT EXISTS (
+            SELECT 1 FROM invoice_records i
+            WHERE i.month_folder = attachments.month_folder
+            AND (i.source_file = attachments.file_name OR i.invoice_file = attachments.file_name)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM checkin_records c
+            WHERE c.month_folder = attachments.month_folder AND c.source_file = attachments.file_name
+        )
+    ''', (created_before,))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    if deleted:
+        _bump_data_version()
+    conn.close()
+    
+    return deleted
+
+@cached_read
+def get_ingested_files(month_folder: Optional[str] = None) -> Tuple[IngestedFile, ...]:
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    query = f'SELECT {", ".join(IngestedFile._fields)} FROM ingested_files'
+    params = []
+    if month_folder:
+        query += ' WHERE month_folder = ?'
+        params.append(month_folder)
+    
+    cursor.execute(query + ' ORDER BY path', params)
+    results = cursor.fetchall()
+    conn.close()
+    
+    return tuple(IngestedFile._make(r) for r in results)
+
+def save_ingested_files(files: List[Dict]):
+    if not files:
+        return
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany('''
+        INSERT OR REPLACE INTO ingested_files
+        (path, month_folder, size, mtime_ns, sha256, status, message, stored_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (f['path'], f['month_folder'], f['size'], f['mtime_ns'], f['sha256'], f['status'], f.get('message', ''),
+         f.get('stored_name'))
+        for f in files
+    ])
+    
+    conn.commit()
+    _bump_data_version()
     conn.close()
 
+@cached_read
 def get_export_history(limit: int = 20) -> List[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
@@ -436,7 +1109,196 @@ def get_export_history(limit: int = 20) -> List[Dict]:
         'created_at': r[6]
     } for r in results]
 
-def get_month_folders() -> List[str]:
+CHECKIN_SCHEMA = {
+    'table': 'checkin_records',
+    'columns': list(CheckinRecord._fields),
+    'dtypes': {'id': 'int64', 'work_hours': 'float64', 'month_folder': 'category'},
+    'date_columns': ['date', 'created_at']
+}
+
+INVOICE_SCHEMA = {
+    'table': 'invoice_records',
+    'columns': list(InvoiceRecord._fields),
+    'dtypes': {'id': 'int64', 'invoice_type': 'category', 'amount': 'float64', 'company': 'category', 'month_folder': 'category'},
+    'date_columns': ['date', 'created_at']
+}
+
+REIMBURSE_SCHEMA = {
+    'table': 'reimburse_records',
+    'columns': list(ReimburseRecord._fields),
+    'dtypes': {'id': 'int64', 'month_folder': 'category', 'reimburse_type': 'category', 'amount': 'float64', 'work_hours': 'float64', 'company': 'category'},
+    'date_columns': ['date', 'created_at']
+}
+
+EXPORT_HISTORY_SCHEMA = {
+    'table': 'export_history',
+    'columns': ['id', 'month_folder', 'export_type', 'file_path', 'record_count', 'total_amount', 'created_at'],
+    'dtypes': {'id': 'int64', 'month_folder': 'category', 'export_type': 'category', 'total_amount': 'float64'},
+    'date_columns': ['created_at']
+}
+
+def _to_date_str(value) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and re.match(r'\d{4}-\d{2}-\d{2}[ T]', value):
+        return value[:10]
+    return value
+
+def _expense_month_filter(month_folder: str) -> Optional[Tuple[str, List]]:
+    start_date, end_date = get_expense_month_range(month_folder)
+    if not start_date or not end_date:
+        return None
+    return 'date BETWEEN ? AND ?', [_to_date_str(start_date), _to_date_str(end_date)]
+
+def _rows_to_dataframe(rows: List[tuple], schema: Dict, columns: List[str]) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    
+    for col in schema['date_columns']:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    return df.astype({col: dtype for col, dtype in schema['dtypes'].items() if col in df.columns})
+
+def _read_dataframe(query: str, params: List, schema: Dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return _rows_to_dataframe(rows, schema, columns or schema['columns'])
+
+@cached_read
+def get_checkin_dataframe(month_folder: Optional[str] = None) -> pd.DataFrame:
+    query = f"SELECT {', '.join(CHECKIN_SCHEMA['columns'])} FROM checkin_records"
+    params = []
+    
+    if month_folder:
+        query += ' WHERE month_folder = ?'
+        params.append(month_folder)
+    
+    query += ' ORDER BY date'
+    
+    return _read_dataframe(query, params, CHECKIN_SCHEMA)
+
+@cached_read
+def get_invoice_dataframe(month_folder: Optional[str] = None, invoice_type: Optional[str] = None) -> pd.DataFrame:
+    query = f"SELECT {', '.join(INVOICE_SCHEMA['columns'])} FROM invoice_records WHERE 1=1"
+    params = []
+    
+    if month_folder:
+        query += ' AND month_folder = ?'
+        params.append(month_folder)
+    
+    if invoice_type:
+        query += ' AND invoice_type = ?'
+        params.append(invoice_type)
+    
+    query += ' ORDER BY date'
+    
+    return _read_dataframe(query, params, INVOICE_SCHEMA)
+
+@cached_read
+def get_reimburse_dataframe(month_folder: Optional[str] = None) -> pd.DataFrame:
+    refresh_reimburse_records(month_folder)
+    
+    query = f"SELECT {', '.join(REIMBURSE_SCHEMA['columns'])} FROM reimburse_records"
+    params = []
+    
+    if month_folder:
+        query += ' WHERE month_folder = ?'
+        params.append(month_folder)
+    
+    query += ' ORDER BY date'
+    
+    return _read_dataframe(query, params, REIMBURSE_SCHEMA)
+
+@cached_read
+def get_export_history_dataframe(limit: int = 20) -> pd.DataFrame:
+    query = f"SELECT {', '.join(EXPORT_HISTORY_SCHEMA['columns'])} FROM export_history ORDER BY created_at DESC LIMIT ?"
+    
+    return _read_dataframe(query, [limit], EXPORT_HISTORY_SCHEMA)
+
+def _query_page(schema: Dict, filters: List[Tuple[str, List]], columns: Optional[List[str]],
+                after: Optional[Tuple[str, int]], page_size: int) -> Tuple[pd.DataFrame, Optional[Tuple[str, int]]]:
+    columns = list(columns) if columns else list(schema['columns'])
+    unknown = [col for col in columns if col not in schema['columns']]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}")
+    
+    selected = ['id', 'date'] + [col for col in columns if col not in ('id', 'date')]
+    
+    query = f"SELECT {', '.join(selected)} FROM {schema['table']} WHERE 1=1"
+    params = []
+    
+    for clause, clause_params in filters:
+        query += f' AND {clause}'
+        params.extend(clause_params)
+    
+    if after:
+        query += ' AND (date, id) > (?, ?)'
+        params.extend([_to_date_str(after[0]), after[1]])
+    
+    query += ' ORDER BY date, id LIMIT ?'
+    params.append(page_size)
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+    
+    next_cursor = (rows[-1][1], rows[-1][0]) if len(rows) == page_size else None
+    
+    return _rows_to_dataframe(rows, schema, selected)[columns], next_cursor
+
+def _range_filters(start_date, end_date, month_folder: Optional[str]) -> List[Tuple[str, List]]:
+    filters = []
+    if start_date:
+        filters.append(('date >= ?', [_to_date_str(start_date)]))
+    if end_date:
+        filters.append(('date <= ?', [_to_date_str(end_date)]))
+    if month_folder:
+        filters.append(('month_folder = ?', [month_folder]))
+    return filters
+
+def query_checkin_page(start_date=None, end_date=None, month_folder: Optional[str] = None,
+                       columns: Optional[List[str]] = None, after: Optional[Tuple[str, int]] = None,
+                       page_size: int = 500) -> Tuple[pd.DataFrame, Optional[Tuple[str, int]]]:
+    filters = _range_filters(start_date, end_date, month_folder)
+    return _query_page(CHECKIN_SCHEMA, filters, columns, after, page_size)
+
+def query_invoice_page(start_date=None, end_date=None, month_folder: Optional[str] = None,
+                       companies: Optional[List[str]] = None, invoice_type: Optional[str] = None,
+                       columns: Optional[List[str]] = None, after: Optional[Tuple[str, int]] = None,
+                       page_size: int = 500) -> Tuple[pd.DataFrame, Optional[Tuple[str, int]]]:
+    filters = _range_filters(start_date, end_date, month_folder)
+    if companies:
+        filters.append((f"company IN ({','.join('?' * len(companies))})", list(companies)))
+    if invoice_type:
+        filters.append(('invoice_type = ?', [invoice_type]))
+    return _query_page(INVOICE_SCHEMA, filters, columns, after, page_size)
+
+def iter_checkin_pages(**kwargs) -> Iterator[pd.DataFrame]:
+    after = kwargs.pop('after', None)
+    while True:
+        df, after = query_checkin_page(after=after, **kwargs)
+        if not df.empty:
+            yield df
+        if after is None:
+            break
+
+def iter_invoice_pages(**kwargs) -> Iterator[pd.DataFrame]:
+    after = kwargs.pop('after', None)
+    while True:
+        df, after = query_invoice_page(after=after, **kwargs)
+        if not df.empty:
+            yield df
+        if after is None:
+            break
+
+@cached_read
+def get_month_folders() -> Tuple[str, ...]:
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -454,40 +1316,40 @@ def get_month_folders() -> List[str]:
     results = cursor.fetchall()
     conn.close()
     
-    return [r[0] for r in results if r[0]]
+    return tuple(r[0] for r in results if r[0])
 
+@cached_read
 def get_statistics() -> Dict:
+    refresh_reimburse_records()
+    
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT COUNT(*) FROM checkin_records')
-    total_checkin = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COUNT(*) FROM invoice_records')
-    total_invoice = cursor.fetchone()[0]
-    
-    cursor.execute('SELECT COALESCE(SUM(amount), 0) FROM invoice_records')
-    total_invoice_amount = cursor.fetchone()[0]
-    
     cursor.execute('''
-        SELECT reimburse_type, COALESCE(SUM(amount), 0) 
-        FROM reimburse_records 
-        GROUP BY reimburse_type
+        SELECT
+            (SELECT COUNT(*) FROM checkin_records),
+            (SELECT COUNT(*) FROM invoice_records),
+            (SELECT COALESCE(SUM(amount), 0) FROM invoice_records),
+            (SELECT json_group_object(reimburse_type, total) FROM (
+                SELECT reimburse_type, COALESCE(SUM(amount), 0) AS total
+                FROM reimburse_records
+                GROUP BY reimburse_type
+            )),
+            (SELECT COUNT(*) FROM export_history)
     ''')
-    reimburse_by_type = {r[0]: r[1] for r in cursor.fetchall()}
-    
-    cursor.execute('SELECT COUNT(*) FROM export_history')
-    total_exports = cursor.fetchone()[0]
+    total_checkin, total_invoice, total_invoice_amount, reimburse_json, total_exports = cursor.fetchone()
     
     conn.close()
     
-    return {
+    stats = {
         'total_checkin_records': total_checkin,
         'total_invoice_records': total_invoice,
         'total_invoice_amount': total_invoice_amount,
-        'reimburse_by_type': reimburse_by_type,
+        'reimburse_by_type': json.loads(reimburse_json) if reimburse_json else {},
         'total_exports': total_exports
     }
+    
+    return stats
 
 def clear_month_data(month_folder: str):
     conn = get_connection()
@@ -496,8 +1358,11 @@ def clear_month_data(month_folder: str):
     cursor.execute('DELETE FROM checkin_records WHERE month_folder = ?', (month_folder,))
     cursor.execute('DELETE FROM invoice_records WHERE month_folder = ?', (month_folder,))
     cursor.execute('DELETE FROM reimburse_records WHERE month_folder = ?', (month_folder,))
+    cursor.execute('DELETE FROM reimburse_dirty WHERE month_folder = ?', (month_folder,))
+    cursor.execute('DELETE FROM ingested_files WHERE month_folder = ?', (month_folder,))
     
     conn.commit()
+    _bump_data_version()
     conn.close()
 
 def clear_all_data():
@@ -507,11 +1372,16 @@ def clear_all_data():
     cursor.execute('DELETE FROM checkin_records')
     cursor.execute('DELETE FROM invoice_records')
     cursor.execute('DELETE FROM reimburse_records')
+    cursor.execute('DELETE FROM reimburse_dirty')
     cursor.execute('DELETE FROM export_history')
+    cursor.execute('DELETE FROM ingested_files')
+    cursor.execute('DELETE FROM attachments')
     
     conn.commit()
+    _bump_data_version()
     conn.close()
 
+@cached_read
 def get_duplicate_checkin_records(month_folder: str) -> List[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
@@ -537,6 +1407,7 @@ def get_duplicate_checkin_records(month_folder: str) -> List[Dict]:
         'count': r[6]
     } for r in results]
 
+@cached_read
 def get_duplicate_invoice_records(month_folder: str) -> List[Dict]:
     conn = get_connection()
     cursor = conn.cursor()
@@ -594,8 +1465,11 @@ def delete_duplicate_invoice_records(month_folder: str) -> int:
     
     if ids_to_delete:
         placeholders = ','.join('?' * len(ids_to_delete))
+        affected = _lookup_record_dates(cursor, 'invoice_records', ids_to_delete)
         cursor.execute(f'DELETE FROM invoice_records WHERE id IN ({placeholders})', ids_to_delete)
+        _mark_dirty(cursor, affected, ('taxi',))
         conn.commit()
+        _bump_data_version()
     
     conn.close()
     return len(ids_to_delete)
@@ -0,0 +1,449 @@
+import os
+import json
+import hashlib
+import itertools
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import xlwt
+import openpyxl
+from openpyxl.utils import get_column_letter
+import database as db
+import rules
+import archive
+import attachments
+import work_calendar
+from models import ValidationResult
+from validation import validate_taxi_invoices
+
+ARTIFACTS_DIR = os.path.join(db.OUTPUT_DIR, 'artifacts')
+ARTIFACT_CACHE_BYTES = 512 * 1024 * 1024
+BATCH_WORKERS = os.cpu_count() or 1
+EXPORT_FORMAT_VERSION = 1
+EXPORT_FORMATS = ('xls', 'xlsx')
+REPORT_TYPES = ('night_meal', 'taxi')
+
+_eviction = threading.local()
+
+REPORT_FILE_LABELS = {
+    'night_meal': ('晚餐、夜宵报销明细表', '晚餐夜宵报销'),
+    'taxi': ('加班打车报销明细表', '打车报销')
+}
+
+EXCEL_MIME_TYPES = {
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+class ExportResult(NamedTuple):
+    path: str
+    record_count: int
+    total_amount: float
+    cached: bool
+
+class MonthExport(NamedTuple):
+    month_folder: str
+    night_meal: Optional[ExportResult]
+    night_meal_zip: Optional[ExportResult]
+    taxi: Optional[ExportResult]
+    taxi_zip: Optional[ExportResult]
+
+class ReportSheet(NamedTuple):
+    name: str
+    title: str
+    header: List[str]
+    column_width: int
+    rows: Iterator[list]
+    footer: Callable[[], List[list]]
+    summary: Dict[str, float]
+
+def night_meal_sheet(meal_records, month_folder: str, name: str = '晚餐夜宵报销') -> ReportSheet:
+    policy = db.get_reimburse_policy(month_folder)
+    
+    dinner_tier = (policy.get('dinner') or [{}])[-1]
+    night_tier = (policy.get('night') or [{}])[-1]
+    
+    header = [
+        '月份',
+        '日期',
+        f"晚餐报销{dinner_tier.get('amount', 0)}元（工作时长{dinner_tier.get('threshold', '-')}小时）",
+        f"夜宵报销{night_tier.get('amount', 0)}元（工作时长{night_tier.get('threshold', '-')}小时）"
+    ]
+    summary = {'record_count': 0, 'dinner': 0.0, 'night': 0.0}
+    
+    def rows():
+        weekday_names = work_calendar.weekday_names(meal_records['date']).tolist()
+        for date_str, weekday_str, dinner_value, night_value in zip(meal_records['date'].tolist(),
+                                                                    weekday_names,
+                                                                    meal_records['dinner_amount'].tolist(),
+                                                                    meal_records['night_amount'].tolist()):
+            summary['record_count'] += 1
+            summary['dinner'] += dinner_value
+            summary['night'] += night_value
+            yield [f"{date_str[5:7]}月", f"{date_str.replace('-', '/')} {weekday_str}", dinner_value or '', night_value or '']
+    
+    def footer():
+        summary['total_amount'] = summary['dinner'] + summary['night']
+        return [
+            ['', '合计', summary['dinner'], summary['night']],
+            ['', '最终总计', '', summary['total_amount']]
+        ]
+    
+    return ReportSheet(name, '晚餐、夜宵报销明细', header, 20, rows(), footer, summary)
+
+def taxi_sheet(validated_records: Iterable[ValidationResult], month_folder: str, name: str = '加班打车报销') -> ReportSheet:
+    policy = db.get_reimburse_policy(month_folder)
+    taxi_threshold = min((tier['threshold'] for tier in policy.get('taxi') or []), default='-')
+    
+    header = ['月份', '日期', '出发地', '到达地', '金额', '工作时长']
+    summary = {'record_count': 0, 'total_amount': 0.0}
+    
+    def rows():
+        for record in validated_records:
+            invoice = record.invoice
+            date_str = invoice.date
+            
+            try:
+                dt = datetime.strptime(date_str, '%Y-%m-%d')
+                month_str = dt.strftime('%m月')
+                date_display = dt.strftime('%Y-%m-%d')
+            except:
+                month_str = month_folder[-2:] + '月'
+                date_display = date_str
+            
+            summary['record_count'] += 1
+            summary['total_amount'] += record.reimburse_amount
+            yield [month_str, date_display, invoice.start_location, invoice.end_location,
+                   record.reimburse_amount, f'{record.work_hours:.1f}h']
+    
+    def footer():
+        return [['合计', '', '', '', summary['total_amount'], '']]
+    
+    return ReportSheet(name, f'打车报销明细（工作时长≥{taxi_threshold}小时）', header, 15, rows(), footer, summary)
+
+def _footer_rows(footer: Callable[[], List[list]]) -> Iterator[list]:
+    yield from footer()
+
+def write_xls(sheets: Iterable[ReportSheet], target):
+    workbook = xlwt.Workbook(encoding='utf-8')
+    
+    for sheet in sheets:
+        worksheet = workbook.add_sheet(sheet.name)
+        for i in range(len(sheet.header)):
+            worksheet.col(i).width = 256 * sheet.column_width
+        
+        worksheet.write(0, 0, sheet.title)
+        row = 1
+        for values in itertools.chain([sheet.header], sheet.rows, _footer_rows(sheet.footer)):
+            for col, value in enumerate(values):
+                worksheet.write(row, col, value)
+            row += 1
+    
+    workbook.save(target)
+
+def write_xlsx(sheets: Iterable[ReportSheet], target):
+    workbook = openpyxl.Workbook(write_only=True)
+    
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(sheet.name[:31])
+        for i in range(len(sheet.header)):
+            worksheet.column_dimensions[get_column_letter(i + 1)].width = sheet.column_width
+        
+        worksheet.append([sheet.title])
+        for values in itertools.chain([sheet.header], sheet.rows, _footer_rows(sheet.footer)):
+            worksheet.append(values)
+    
+    workbook.save(target)
+
+def artifact_key(*parts: Any) -> str:
+    canonical = json.dumps([EXPORT_FORMAT_VERSION] + list(parts), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def _artifact_path(key: str, ext: str) -> str:
+    return os.path.join(ARTIFACTS_DIR, f'{key}{ext}')
+
+def _lookup_artifact(key: str, ext: str) -> Optional[str]:
+    path = _artifact_path(key, ext)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+def _publish_artifact(tmp_path: str, key: str, ext: str) -> str:
+    path = _artifact_path(key, ext)
+    os.replace(tmp_path, path)
+    if not getattr(_eviction, 'deferred', False):
+        evict_artifacts(keep=(path,))
+    return path
+
+def _write_artifact(key: str, ext: str, write: Callable[[Any], None]) -> str:
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=ext, prefix='.tmp_', dir=ARTIFACTS_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+    except BaseException:
+        archive.remove_archive(tmp_path)
+        raise
+    return _publish_artifact(tmp_path, key, ext)
+
+def evict_artifacts(max_bytes: int = ARTIFACT_CACHE_BYTES, keep: Iterable[str] = ()) -> int:
+    if not os.path.isdir(ARTIFACTS_DIR):
+        return 0
+    
+    entries = []
+    for entry in os.scandir(ARTIFACTS_DIR):
+        if entry.is_file() and not entry.name.startswith('.tmp_'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    
+    keep = set(keep)
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        archive.remove_archive(path)
+        total -= size
+        removed += 1
+    return removed
+
+def _output_config() -> dict:
+    return db.get_config('output') or {'default_name': '姓名'}
+
+def report_file_name(report_type: str, month_folder: str, ext: str = '.xls') -> str:
+    return f"{_output_config()['default_name']}_{REPORT_FILE_LABELS[report_type][0]}_{month_folder[-2:]}月{ext}"
+
+def bundle_file_name(report_type: str, month_folder: str) -> str:
+    return f"{_output_config()['default_name']}_{REPORT_FILE_LABELS[report_type][1]}_{month_folder[-2:]}月.zip"
+
+def _meal_rows(meal_records) -> List[Tuple]:
+    return list(zip(meal_records['date'].tolist(),
+                    meal_records['dinner_amount'].tolist(),
+                    meal_records['night_amount'].tolist()))
+
+def _taxi_rows(validated_records: List[ValidationResult]) -> List[Tuple]:
+    return [tuple(record.invoice) + (record.work_hours, record.reimburse_amount) for record in validated_records]
+
+def _attachment_versions(members: List[Tuple[str, str]]) -> List[Tuple[str, int, int]]:
+    versions = []
+    for arcname, file_path in members:
+        stat = os.stat(file_path)
+        versions.append((arcname, stat.st_size, stat.st_mtime_ns))
+    return versions
+
+def _policy_version(month_folder: str) -> Tuple[Optional[str], str]:
+    return db.get_rule_version(month_folder), rules.policy_digest(db.get_reimburse_policy(month_folder))
+
+def _writer_for(fmt: str) -> Callable[[Iterable[ReportSheet], Any], None]:
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+    return write_xlsx if fmt == 'xlsx' else write_xls
+
+def excel_mime(path: str) -> str:
+    return EXCEL_MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+
+def export_night_meal_excel(meal_records, month_folder: str, fmt: str = 'xls') -> ExportResult:
+    rows = _meal_rows(meal_records)
+    record_count = len(rows)
+    total_amount = float(meal_records['dinner_amount'].sum()) + float(meal_records['night_amount'].sum())
+    
+    write = _writer_for(fmt)
+    key = artifact_key('night_meal_excel', fmt, month_folder, _policy_version(month_folder), _output_config(), rows)
+    path = _lookup_artifact(key, f'.{fmt}')
+    cached = path is not None
+    if not cached:
+        path = _write_artifact(key, f'.{fmt}', lambda f: write([night_meal_sheet(meal_records, month_folder)], f))
+    
+    db.save_export_history(month_folder, 'night_meal', path, record_count, total_amount)
+    return ExportResult(path, record_count, total_amount, cached)
+
+def export_taxi_excel(validated_records: List[ValidationResult], month_folder: str, fmt: str = 'xls') -> ExportResult:
+    rows = _taxi_rows(validated_records)
+    record_count = len(rows)
+    total_amount = sum(record.reimburse_amount for record in validated_records)
+    
+    write = _writer_for(fmt)
+    key = artifact_key('taxi_excel', fmt, month_folder, _policy_version(month_folder), _output_config(), rows)
+    path = _lookup_artifact(key, f'.{fmt}')
+    cached = path is not None
+    if not cached:
+        path = _write_artifact(key, f'.{fmt}', lambda f: write([taxi_sheet(validated_records, month_folder)], f))
+    
+    db.save_export_history(month_folder, 'taxi', path, record_count, total_amount)
+    return ExportResult(path, record_count, total_amount, cached)
+
+def valid_taxi_records(month_folder: str) -> List[ValidationResult]:
+    invoices = db.get_expense_month_invoices(month_folder)
+    if not invoices:
+        return []
+    return validate_taxi_invoices(invoices, db.get_checkin_records(month_folder), db.get_reimburse_policy(month_folder)).valid
+
+def _month_sheets(report_type: str, month_folders: List[str]) -> Iterator[ReportSheet]:
+    for month_folder in month_folders:
+        if report_type == 'night_meal':
+            yield night_meal_sheet(db.get_meal_reimbursements(month_folder), month_folder, name=f'{month_folder} 晚餐夜宵')
+        else:
+            yield taxi_sheet(valid_taxi_records(month_folder), month_folder, name=f'{month_folder} 打车')
+
+def _month_report_version(report_type: str, month_folder: str) -> Tuple[str, int, float]:
+    if report_type == 'night_meal':
+        rows = _meal_rows(db.get_meal_reimbursements(month_folder))
+        total_amount = sum(dinner + night for _, dinner, night in rows)
+    else:
+        rows = _taxi_rows(valid_taxi_records(month_folder))
+        total_amount = sum(row[-1] for row in rows)
+    return artifact_key(_policy_version(month_folder), rows), len(rows), float(total_amount)
+
+def export_report_xlsx(report_type: str, month_folders: List[str]) -> ExportResult:
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f'未知报表类型: {report_type}')
+    month_folders = sorted(set(month_folders))
+    
+    versions = [_month_report_version(report_type, month_folder) for month_folder in month_folders]
+    record_count = sum(count for _, count, _ in versions)
+    total_amount = sum(amount for _, _, amount in versions)
+    
+    key = artifact_key(f'{report_type}_report', month_folders, _output_config(), [digest for digest, _, _ in versions])
+    path = _lookup_artifact(key, '.xlsx')
+    cached = path is not None
+    if not cached:
+        path = _write_artifact(key, '.xlsx', lambda f: write_xlsx(_month_sheets(report_type, month_folders), f))
+    
+    label = month_folders[0] if len(month_folders) == 1 else f'{month_folders[0]}~{month_folders[-1]}'
+    db.save_export_history(label, f'{report_type}_report', path, record_count, total_amount)
+    return ExportResult(path, record_count, total_amount, cached)
+
+def _export_bundle(export_type: str, excel: ExportResult, month_folder: str, file_name: str,
+                   members: List[Tuple[str, str]]) -> ExportResult:
+    key = artifact_key(export_type, excel.path, file_name, _attachment_versions(members))
+    path = _lookup_artifact(key, '.zip')
+    cached = path is not None
+    if not cached:
+        os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+        with archive.ArchiveWriter(ARTIFACTS_DIR, prefix='.tmp_') as zf:
+            zf.add_file(file_name, excel.path)
+            zf.add_files(members)
+        path = _publish_artifact(zf.path, key, '.zip')
+    
+    db.save_export_history(month_folder, export_type, path, excel.record_count, excel.total_amount)
+    return ExportResult(path, excel.record_count, excel.total_amount, cached)
+
+def export_night_meal_zip(excel: ExportResult, month_folder: str, file_name: str, month_upload_dir: str) -> ExportResult:
+    files = attachments.month_attachments(month_folder, month_upload_dir)
+    checkins = {attachment.file_name for attachment in db.get_attachments(month_folder, attachments.CHECKIN)}
+    members = [
+        (f"附件/{file}", files[file])
+        for file in sorted(files)
+        if file in checkins or ('打卡' in file and (file.endswith('.xlsx') or file.endswith('.xls')))
+    ]
+    return _export_bundle('night_meal_zip', excel, month_folder, file_name, members)
+
+def export_taxi_zip(excel: ExportResult, month_folder: str, file_name: str, validated_records: List[ValidationResult],
+                    month_upload_dir: str) -> ExportResult:
+    files = attachments.month_attachments(month_folder, month_upload_dir)
+    members = list(dict.fromkeys(
+        (f"附件/{attachment}", files[attachment])
+        for record in validated_records
+        for attachment in (record.invoice.source_file, record.invoice.invoice_file)
+        if attachment in files
+    ))
+    return _export_bundle('taxi_zip', excel, month_folder, file_name, members)
+
+def export_month(month_folder: str, uploads_dir: str, fmt: str = 'xls') -> MonthExport:
+    month_upload_dir = os.path.join(uploads_dir, month_folder)
+    night_meal = night_meal_zip = taxi = taxi_zip = None
+    
+    meal_records = db.get_meal_reimbursements(month_folder)
+    if not meal_records.empty:
+        night_meal = export_night_meal_excel(meal_records, month_folder, fmt)
+        night_meal_zip = export_night_meal_zip(
+            night_meal, month_folder, report_file_name('night_meal', month_folder, f'.{fmt}'), month_upload_dir
+        )
+    
+    valid_records = valid_taxi_records(month_folder)
+    if valid_records:
+        taxi = export_taxi_excel(valid_records, month_folder, fmt)
+        taxi_zip = export_taxi_zip(
+            taxi, month_folder, report_file_name('taxi', month_folder, f'.{fmt}'), valid_records, month_upload_dir
+        )
+    
+    return MonthExport(month_folder, night_meal, night_meal_zip, taxi, taxi_zip)
+
+def _export_month_in_worker(db_path: str, artifacts_dir: str, month_folder: str, uploads_dir: str, fmt: str) -> MonthExport:
+    global ARTIFACTS_DIR
+    db.DB_PATH = db_path
+    ARTIFACTS_DIR = artifacts_dir
+    _eviction.deferred = True
+    return export_month(month_folder, uploads_dir, fmt)
+
+def _batch_members(exports: List[MonthExport]) -> List[Tuple[str, str]]:
+    members = []
+    for export in exports:
+        month_folder = export.month_folder
+        for report_type, excel, bundle in (('night_meal', export.night_meal, export.night_meal_zip),
+                                           ('taxi', export.taxi, export.taxi_zip)):
+            if excel is not None:
+                ext = os.path.splitext(excel.path)[1]
+                members.append((f'{month_folder}/{report_file_name(report_type, month_folder, ext)}', excel.path))
+            if bundle is not None:
+                members.append((f'{month_folder}/{bundle_file_name(report_type, month_folder)}', bundle.path))
+    return members
+
+def export_batch(month_folders: List[str], uploads_dir: str = db.UPLOADS_DIR, fmt: str = 'xls',
+                 workers: int = BATCH_WORKERS) -> Tuple[ExportResult, List[MonthExport]]:
+    _writer_for(fmt)
+    month_folders = sorted(set(month_folders))
+    if not month_folders:
+        raise ValueError('未选择导出月份')
+    
+    db.refresh_reimburse_records()
+    workers = max(1, min(workers, len(month_folders)))
+    _eviction.deferred = True
+    try:
+        exports, path, cached = _build_batch(month_folders, uploads_dir, fmt, workers)
+    finally:
+        _eviction.deferred = False
+    
+    members = _batch_members(exports)
+    evict_artifacts(keep=[file_path for _, file_path in members] + [path])
+    
+    excels = [excel for export in exports for excel in (export.night_meal, export.taxi) if excel is not None]
+    record_count = sum(excel.record_count for excel in excels)
+    total_amount = sum(excel.total_amount for excel in excels)
+    
+    label = month_folders[0] if len(month_folders) == 1 else f'{month_folders[0]}~{month_folders[-1]}'
+    db.save_export_history(label, 'batch_zip', path, record_count, total_amount)
+    return ExportResult(path, record_count, total_amount, cached), exports
+
+def _build_batch(month_folders: List[str], uploads_dir: str, fmt: str,
+                 workers: int) -> Tuple[List[MonthExport], str, bool]:
+    if workers == 1:
+        exports = [export_month(month_folder, uploads_dir, fmt) for month_folder in month_folders]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            exports = list(pool.map(
+                _export_month_in_worker,
+                itertools.repeat(db.DB_PATH), itertools.repeat(ARTIFACTS_DIR), month_folders,
+                itertools.repeat(uploads_dir), itertools.repeat(fmt)
+            ))
+        db.clear_read_cache()
+    
+    members = _batch_members(exports)
+    if not members:
+        raise ValueError('所选月份没有可导出的报销明细')
+    key = artifact_key('batch_zip', members)
+    path = _lookup_artifact(key, '.zip')
+    cached = path is not None
+    if not cached:
+        os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+        with archive.ArchiveWriter(ARTIFACTS_DIR, prefix='.tmp_') as zf:
+            zf.add_files(members)
+        path = _publish_artifact(zf.path, key, '.zip')
+    return exports, path, cached
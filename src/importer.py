@@ -0,0 +1,281 @@
+import os
+import re
+import zipfile
+import functools
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import database as db
+import utils
+import pairing
+import attachments
+from work_calendar import get_expense_month_range
+
+CHECKIN_EXTENSIONS = ('.xlsx', '.xls')
+INVOICE_EXTENSIONS = ('.pdf',)
+PARSE_WORKERS = os.cpu_count() or 1
+ZIP_UTF8_FLAG = 0x800
+ARCHIVE_SAMPLE_SIZE = 10
+MAX_ARCHIVE_MEMBER_SIZE = 20 * 1024 * 1024
+MAX_ARCHIVE_MEMBER_RATIO = 100
+
+DEFAULT_FILE_PATHS = {
+    'month_folder_pattern': '\\d{2}_\\d{2}',
+    'checkin_file_pattern': '打卡',
+    'invoice_folder_name': '发票'
+}
+
+class MonthSource(NamedTuple):
+    month_folder: str
+    path: str
+    checkin_files: List[str]
+    invoice_files: List[str]
+
+class InvoiceImport(NamedTuple):
+    imported: List[Dict]
+    duplicates: List[Dict]
+    invalid: List[Dict]
+    failed: List[str]
+    pairing_report: Optional[pairing.PairingReport] = None
+
+def file_paths_config() -> dict:
+    return {**DEFAULT_FILE_PATHS, **(db.get_config('file_paths') or {})}
+
+def is_checkin_file(file_name: str, config: Optional[dict] = None) -> bool:
+    config = config or file_paths_config()
+    return config['checkin_file_pattern'] in file_name and file_name.lower().endswith(CHECKIN_EXTENSIONS)
+
+def is_invoice_file(file_name: str) -> bool:
+    return file_name.lower().endswith(INVOICE_EXTENSIONS) and pairing.file_role(file_name) is not None
+
+def is_itinerary_file(file_name: str) -> bool:
+    return pairing.file_role(file_name) == pairing.ITINERARY
+
+def scan_month_source(month_folder: str, path: str, config: Optional[dict] = None) -> MonthSource:
+    config = config or file_paths_config()
+    file_names = sorted(os.listdir(path))
+    checkin_files = [os.path.join(path, f) for f in file_names if is_checkin_file(f, config)]
+
+    invoice_dir = os.path.join(path, config['invoice_folder_name'])
+    if not os.path.isdir(invoice_dir):
+        invoice_dir = path
+    invoice_files = [os.path.join(invoice_dir, f) for f in sorted(os.listdir(invoice_dir)) if is_invoice_file(f)]
+
+    return MonthSource(month_folder, path, checkin_files, invoice_files)
+
+def scan_sources(root: str, month_folders: Optional[Iterable[str]] = None) -> List[MonthSource]:
+    config = file_paths_config()
+    pattern = re.compile(config['month_folder_pattern'])
+    wanted = set(month_folders) if month_folders else None
+
+    sources = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path) or not pattern.fullmatch(name):
+            continue
+        if wanted is not None and name not in wanted:
+            continue
+        sources.append(scan_month_source(name, path, config))
+    return sources
+
+def pair_invoice_files(file_names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+    return pairing.PairingIndex(file_names).report().as_import_pairs()
+
+def validate_invoice_for_import(invoice_record, month_folder):
+    result = {
+        'valid': False,
+        'reason': ''
+    }
+
+    start_date, end_date = get_expense_month_range(month_folder)
+    if not start_date or not end_date:
+        result['reason'] = '无法确定费用月份范围'
+        return result
+
+    invoice_date = invoice_record.get('date')
+    if not invoice_date:
+        result['reason'] = '无法提取发票日期'
+        return result
+
+    if isinstance(invoice_date, datetime):
+        invoice_date = invoice_date.date()
+    elif isinstance(invoice_date, str):
+        try:
+            invoice_date = datetime.strptime(invoice_date, '%Y-%m-%d').date()
+        except:
+            result['reason'] = '日期格式错误'
+            return result
+
+    if invoice_date < start_date or invoice_date > end_date:
+        result['reason'] = f'日期{invoice_date}不在费用月份范围({start_date}~{end_date})'
+        return result
+
+    result['valid'] = True
+    result['reason'] = '符合条件'
+    return result
+
+def parse_checkin_files(paths: List[str], workers: int = PARSE_WORKERS) -> Dict[str, Tuple[List[Dict], str]]:
+    return dict(zip(paths, _parallel_map(utils.parse_checkin_excel, paths, workers)))
+
+def parse_taxi_pdfs(paths: List[str], workers: int = PARSE_WORKERS) -> Dict[str, Optional[Dict]]:
+    return dict(zip(paths, _parallel_map(utils.parse_taxi_pdf, paths, workers)))
+
+def _parallel_map(func, paths: List[str], workers: int) -> List:
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        return [func(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+def store_attachment(file_path: str, month_folder: str, kind: str, replace: bool = False,
+                     file_name: Optional[str] = None) -> str:
+    return attachments.attach_file(month_folder, file_path, kind, file_name, replace)
+
+def write_attachment(file_name: str, source: BinaryIO, month_folder: str, kind: str, replace: bool = False) -> str:
+    return attachments.attach_stream(month_folder, file_name, source, kind, replace)
+
+def file_store(file_paths: Dict[str, str], month_folder: str) -> Callable[[str, str], str]:
+    return lambda file_name, kind: store_attachment(file_paths[file_name], month_folder, kind)
+
+def _member_name(info: zipfile.ZipInfo) -> str:
+    name = info.filename
+    if not info.flag_bits & ZIP_UTF8_FLAG:
+        try:
+            name = name.encode('cp437').decode('gbk')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return name
+
+class InvoiceArchive:
+    def __init__(self, archive_file):
+        self._zip = zipfile.ZipFile(archive_file)
+        self.members = {}
+        self.skipped = []
+        for info in self._zip.infolist():
+            name = _member_name(info)
+            file_name = os.path.basename(name)
+            if info.is_dir() or '__MACOSX' in name or file_name.startswith('.') or not is_invoice_file(file_name):
+                continue
+            if file_name in self.members:
+                self.skipped.append(f"{name} - 压缩包内存在同名文件，已忽略")
+                continue
+            if info.file_size > MAX_ARCHIVE_MEMBER_SIZE:
+                self.skipped.append(f"{name} - 文件超过 {MAX_ARCHIVE_MEMBER_SIZE // (1024 * 1024)} MB，已忽略")
+                continue
+            if info.file_size > max(info.compress_size, 1) * MAX_ARCHIVE_MEMBER_RATIO:
+                self.skipped.append(f"{name} - 压缩比异常，已忽略")
+                continue
+            self.members[file_name] = info
+
+    def __enter__(self) -> 'InvoiceArchive':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def itineraries(self) -> List[str]:
+        return [name for name in self.members if is_itinerary_file(name)]
+
+    def parse(self, file_name: str) -> Optional[Dict]:
+        with self._zip.open(self.members[file_name]) as f:
+            return utils.parse_taxi_pdf(BytesIO(f.read()), file_name)
+
+    def store(self, file_name: str, month_folder: str, kind: str) -> str:
+        with self._zip.open(self.members[file_name]) as f:
+            return write_attachment(file_name, f, month_folder, kind)
+
+    def close(self):
+        self._zip.close()
+
+def import_checkin_files(parsed: Dict[str, Tuple[List[Dict], str]], month_folder: str) -> Tuple[int, List[str]]:
+    imported = 0
+    failed = []
+    for file_path, (records, error) in parsed.items():
+        file_name = os.path.basename(file_path)
+        if not records:
+            failed.append(f"{file_name} - {error or '没有可导入的打卡记录'}")
+            continue
+        file_name = store_attachment(file_path, month_folder, attachments.CHECKIN, replace=True)
+        db.save_checkin_records(records, month_folder, file_name)
+        imported += len(records)
+    return imported, failed
+
+def import_invoice_pairs(pairs: Dict[str, Dict[str, str]], parse: Callable[[str], Optional[Dict]], month_folder: str,
+                         store: Callable[[str, str], str],
+                         progress: Optional[Callable[[int, int, str], None]] = None) -> InvoiceImport:
+    imported = []
+    duplicates = []
+    invalid = []
+    failed = []
+    seen = set()
+
+    for i, (base_name, pair_files) in enumerate(pairs.items()):
+        if progress is not None:
+            progress(i + 1, len(pairs), base_name)
+
+        itinerary_file = pair_files.get('itinerary')
+        invoice_file = pair_files.get('invoice')
+
+        if not itinerary_file:
+            failed.append(f"{base_name} - 缺少行程单，无法解析数据")
+            continue
+
+        record = parse(itinerary_file)
+        if not record or record.get('amount', 0) <= 0:
+            failed.append(f"{itinerary_file} - 解析失败")
+            continue
+
+        record = dict(record, source_file=itinerary_file, invoice_file=invoice_file or '')
+
+        validation = validate_invoice_for_import(record, month_folder)
+        if not validation['valid']:
+            invalid.append({
+                'base_name': base_name,
+                'itinerary_file': itinerary_file,
+                'invoice_file': invoice_file,
+                'date': record['date'],
+                'amount': record['amount'],
+                'reason': validation['reason']
+            })
+            continue
+
+        date_str = record['date'].strftime('%Y-%m-%d') if hasattr(record['date'], 'strftime') else str(record['date'])
+        key = (date_str, record['amount'])
+        if key in seen or db.invoice_exists(date_str, record['amount'], month_folder):
+            record['duplicate_reason'] = '重复记录（同日期同金额已存在）'
+            duplicates.append(record)
+            continue
+
+        seen.add(key)
+        record['source_file'] = store(itinerary_file, pairing.ITINERARY)
+        if invoice_file:
+            record['invoice_file'] = store(invoice_file, pairing.INVOICE)
+        imported.append(record)
+
+    if imported:
+        db.save_invoice_records(imported, month_folder)
+
+    return InvoiceImport(imported, duplicates, invalid, failed)
+
+def import_invoice_files(file_names: Iterable[str], parse: Callable[[str], Optional[Dict]], month_folder: str,
+                         store: Callable[[str, str], str],
+                         progress: Optional[Callable[[int, int, str], None]] = None) -> InvoiceImport:
+    parse = functools.lru_cache(maxsize=None)(parse)
+    report = pairing.PairingIndex(file_names).report(parse)
+    result = import_invoice_pairs(report.as_import_pairs(), parse, month_folder, store, progress)
+    return result._replace(pairing_report=report)
+
+def import_invoice_archive(archive_file, month_folder: str,
+                           progress: Optional[Callable[[int, int, str], None]] = None) -> InvoiceImport:
+    with InvoiceArchive(archive_file) as bundle:
+        result = import_invoice_files(
+            bundle.members, bundle.parse, month_folder,
+            lambda file_name, kind: bundle.store(file_name, month_folder, kind), progress
+        )
+        return result._replace(failed=bundle.skipped + result.failed)
+
+def detect_archive_months(archive_file, sample_size: int = ARCHIVE_SAMPLE_SIZE) -> List[datetime]:
+    with InvoiceArchive(archive_file) as bundle:
+        records = [bundle.parse(file_name) for file_name in bundle.itineraries()[:sample_size]]
+    return [record['date'] for record in records if record and record.get('date')]
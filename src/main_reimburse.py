@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC_DIR)
+
+import database as db
+import attachments
+import exporter
+import importer
+import utils
+from validation import validate_taxi_invoices
+
+def process_month(source: importer.MonthSource, parsed_checkins: Dict, parsed_invoices: Dict) -> Dict:
+    checkin_count, checkin_failed = importer.import_checkin_files(
+        {path: parsed_checkins[path] for path in source.checkin_files}, source.month_folder
+    )
+
+    file_paths = {os.path.basename(path): path for path in source.invoice_files}
+    parsed = {os.path.basename(path): parsed_invoices[path] for path in source.invoice_files if path in parsed_invoices}
+    invoice_import = importer.import_invoice_files(
+        file_paths,
+        lambda name: parsed[name] if name in parsed else utils.parse_taxi_pdf(file_paths[name]),
+        source.month_folder,
+        importer.file_store(file_paths, source.month_folder)
+    )
+    report = invoice_import.pairing_report
+
+    return {
+        'checkin_files': len(source.checkin_files),
+        'checkin_records': checkin_count,
+        'invoice_files': len(source.invoice_files),
+        'pairing': report.summary(),
+        'unmatched_itineraries': report.unmatched_itineraries,
+        'unmatched_invoices': report.unmatched_invoices,
+        'suggested_pairs': [[pair.itinerary, pair.invoice] for pair in report.suggestions],
+        'invoices_imported': len(invoice_import.imported),
+        'invoices_duplicate': len(invoice_import.duplicates),
+        'invoices_invalid': len(invoice_import.invalid),
+        'failed': checkin_failed + invoice_import.failed
+    }
+
+def validate_month(month_folder: str) -> Dict:
+    meal_records = db.get_meal_reimbursements(month_folder)
+    report = validate_taxi_invoices(
+        db.get_invoice_records(month_folder), db.get_checkin_records(month_folder), db.get_reimburse_policy(month_folder)
+    )
+    return {
+        'dinner_days': int(meal_records['dinner'].sum()),
+        'night_days': int(meal_records['night'].sum()),
+        'meal_amount': float(meal_records['dinner_amount'].sum() + meal_records['night_amount'].sum()),
+        'taxi_valid': len(report.valid),
+        'taxi_invalid': len(report.results) - len(report.valid),
+        'taxi_amount': float(report.valid_amount)
+    }
+
+def run(args) -> Dict:
+    timings = {}
+    started = time.perf_counter()
+
+    def lap(name: str, since: float) -> float:
+        now = time.perf_counter()
+        timings[name] = round(now - since, 3)
+        return now
+
+    db.init_db()
+
+    sources = importer.scan_sources(args.root, args.months)
+    mark = lap('scan', started)
+
+    checkin_paths = [path for source in sources for path in source.checkin_files]
+    invoice_paths = [path for source in sources for path in source.invoice_files if importer.is_itinerary_file(os.path.basename(path))]
+    parsed_checkins = importer.parse_checkin_files(checkin_paths, args.workers)
+    parsed_invoices = importer.parse_taxi_pdfs(invoice_paths, args.workers)
+    mark = lap('parse', mark)
+
+    months = {source.month_folder: process_month(source, parsed_checkins, parsed_invoices) for source in sources}
+    mark = lap('import', mark)
+
+    for month_folder in months:
+        months[month_folder].update(validate_month(month_folder))
+    mark = lap('validate', mark)
+
+    exports = None
+    export_months = [month_folder for month_folder, summary in months.items()
+                     if summary['dinner_days'] or summary['night_days'] or summary['taxi_valid']]
+    if export_months and not args.skip_export:
+        batch, month_exports = exporter.export_batch(export_months, args.uploads_dir, args.format, args.workers)
+        exports = {
+            'batch': batch.path,
+            'months': {
+                export.month_folder: {
+                    name: result.path
+                    for name, result in export._asdict().items()
+                    if name != 'month_folder' and result is not None
+                }
+                for export in month_exports
+            }
+        }
+        mark = lap('export', mark)
+
+    garbage = None
+    if args.gc:
+        garbage = attachments.collect_garbage()
+        mark = lap('gc', mark)
+
+    timings['total'] = round(mark - started, 3)
+
+    return {
+        'root': os.path.abspath(args.root),
+        'files': {'checkin': len(checkin_paths), 'itinerary': len(invoice_paths)},
+        'months': months,
+        'exports': exports,
+        'garbage': garbage,
+        'timings': timings
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='按月份目录批量导入打卡与行程单、校验并生成报销明细')
+    parser.add_argument('root', help='包含月份文件夹（如 25_05）的根目录')
+    parser.add_argument('--months', nargs='+', help='只处理指定月份')
+    parser.add_argument('--workers', type=int, default=importer.PARSE_WORKERS, help='解析与导出的进程数')
+    parser.add_argument('--format', choices=exporter.EXPORT_FORMATS, default='xls', help='明细表格式')
+    parser.add_argument('--uploads-dir', default=db.UPLOADS_DIR, help='旧版附件目录（导出时补充未入库的历史附件）')
+    parser.add_argument('--skip-export', action='store_true', help='只导入和校验，不生成明细表')
+    parser.add_argument('--gc', action='store_true', help='清理不再被任何记录引用的附件')
+    parser.add_argument('--db', help='数据库文件路径')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.DB_PATH = os.path.abspath(args.db)
+
+    if not os.path.isdir(args.root):
+        print(json.dumps({'error': f'目录不存在: {args.root}'}, ensure_ascii=False), file=sys.stderr)
+        return 2
+
+    result = run(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result['months'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+from typing import NamedTuple, Iterable
+import pandas as pd
+
+class CheckinRecord(NamedTuple):
+    id: int
+    date: str
+    work_hours: float
+    month_folder: str
+    source_file: str
+    created_at: str
+
+class InvoiceRecord(NamedTuple):
+    id: int
+    invoice_type: str
+    date: str
+    amount: float
+    start_location: str
+    end_location: str
+    company: str
+    source_file: str
+    invoice_file: str
+    month_folder: str
+    created_at: str
+
+class ReimburseRecord(NamedTuple):
+    id: int
+    month_folder: str
+    reimburse_type: str
+    date: str
+    amount: float
+    work_hours: float
+    start_location: str
+    end_location: str
+    company: str
+    notes: str
+    created_at: str
+
+class Attachment(NamedTuple):
+    id: int
+    month_folder: str
+    file_name: str
+    sha256: str
+    size: int
+    kind: str
+    created_at: str
+
+class IngestedFile(NamedTuple):
+    path: str
+    month_folder: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    status: str
+    message: str
+    stored_name: str
+    ingested_at: str
+
+class ValidationResult(NamedTuple):
+    invoice: InvoiceRecord
+    valid: bool
+    reason: str
+    work_hours: float
+    reimburse_amount: float = 0.0
+
+def validation_results_to_dataframe(results: Iterable[ValidationResult]) -> pd.DataFrame:
+    rows = [result.invoice + (result.valid, result.reason, result.work_hours, result.reimburse_amount) for result in results]
+    return pd.DataFrame.from_records(rows, columns=InvoiceRecord._fields + ('valid', 'reason', 'work_hours', 'reimburse_amount'))
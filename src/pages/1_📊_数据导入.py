@@ -1,7 +1,8 @@
 import streamlit as st
 import os
 import sys
-from datetime import datetime, date
+import zipfile
+from datetime import datetime
 import pandas as pd
 
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,9 +11,12 @@ sys.path.insert(0, SRC_DIR)
 
 import database as db
 import utils
-
-DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
-UPLOADS_DIR = os.path.join(DATA_DIR, 'uploads')
+import importer
+import attachments
+from models import validation_results_to_dataframe
+from validation import validate_taxi_invoices
+from work_calendar import get_expense_month_range
+import work_calendar
 
 st.set_page_config(
     page_title="数据导入 - 报销管理系统",
@@ -24,64 +28,7 @@ st.markdown("# 📊 数据导入")
 st.markdown("---")
 
 def get_reimburse_month_from_date(date_obj):
-    if date_obj.month == 12:
-        return f"{str(date_obj.year + 1)[-2:]}_01"
-    else:
-        return f"{str(date_obj.year)[-2:]}_{str(date_obj.month + 1).zfill(2)}"
-
-def get_expense_month_range(month_folder):
-    try:
-        year = 2000 + int(month_folder[:2])
-        month = int(month_folder[3:5])
-        
-        expense_month = month - 1
-        expense_year = year
-        if expense_month == 0:
-            expense_month = 12
-            expense_year = year - 1
-        
-        start_date = date(expense_year, expense_month, 1)
-        if expense_month == 12:
-            end_date = date(expense_year + 1, 1, 1) - pd.Timedelta(days=1)
-        else:
-            end_date = date(expense_year, expense_month + 1, 1) - pd.Timedelta(days=1)
-        
-        return start_date, end_date
-    except:
-        return None, None
-
-def validate_invoice_for_import(invoice_record, month_folder):
-    result = {
-        'valid': False,
-        'reason': ''
-    }
-    
-    start_date, end_date = get_expense_month_range(month_folder)
-    if not start_date or not end_date:
-        result['reason'] = '无法确定费用月份范围'
-        return result
-    
-    invoice_date = invoice_record.get('date')
-    if not invoice_date:
-        result['reason'] = '无法提取发票日期'
-        return result
-    
-    if isinstance(invoice_date, datetime):
-        invoice_date = invoice_date.date()
-    elif isinstance(invoice_date, str):
-        try:
-            invoice_date = datetime.strptime(invoice_date, '%Y-%m-%d').date()
-        except:
-            result['reason'] = '日期格式错误'
-            return result
-    
-    if invoice_date < start_date or invoice_date > end_date:
-        result['reason'] = f'日期{invoice_date}不在费用月份范围({start_date}~{end_date})'
-        return result
-    
-    result['valid'] = True
-    result['reason'] = '符合条件'
-    return result
+    return work_calendar.reimburse_month(date_obj)
 
 def detect_month_from_checkin_file(file_path):
     try:
@@ -95,21 +42,23 @@ def detect_month_from_checkin_file(file_path):
         pass
     return None
 
-def detect_month_from_invoice_files(files, temp_dir):
+def detect_month_from_invoice_files(files):
     detected_months = []
     
     for file in files:
-        temp_path = utils.save_uploaded_file(file, temp_dir)
-        record = utils.parse_taxi_pdf(temp_path)
+        if file.name.lower().endswith('.zip'):
+            try:
+                dates = importer.detect_archive_months(file)
+            except zipfile.BadZipFile:
+                dates = []
+            detected_months.extend(get_reimburse_month_from_date(d) for d in dates)
+            continue
+        
+        record = utils.parse_taxi_pdf(file, file.name)
         
         if record and record.get('date'):
             month = get_reimburse_month_from_date(record['date'])
             detected_months.append(month)
-        
-        try:
-            os.remove(temp_path)
-        except:
-            pass
     
     if detected_months:
         from collections import Counter
@@ -133,8 +82,8 @@ with col_file1:
 with col_file2:
     st.markdown("#### 发票文件")
     invoice_files = st.file_uploader(
-        "选择发票 PDF 文件（支持多选）",
-        type=['pdf'],
+        "选择发票 PDF 文件或 ZIP 压缩包（支持多选）",
+        type=['pdf', 'zip'],
         accept_multiple_files=True,
         key='invoice_uploader'
     )
@@ -161,7 +110,7 @@ if checkin_file is not None:
         pass
 
 if invoice_files and auto_detected_month is None:
-    detected = detect_month_from_invoice_files(invoice_files, temp_dir)
+    detected = detect_month_from_invoice_files(invoice_files)
     if detected:
         auto_detected_month = detected
         detection_source = "发票文件"
@@ -225,13 +174,10 @@ with col_import1:
                 records, error = utils.parse_checkin_excel(temp_path)
                 
                 if records:
-                    db.save_checkin_records(records, current_month, checkin_file.name)
-                    
-                    month_upload_dir = os.path.join(UPLOADS_DIR, current_month)
-                    os.makedirs(month_upload_dir, exist_ok=True)
-                    saved_path = os.path.join(month_upload_dir, checkin_file.name)
-                    with open(saved_path, 'wb') as f:
-                        f.write(checkin_file.getbuffer())
+                    file_name = importer.write_attachment(
+                        checkin_file.name, checkin_file, current_month, attachments.CHECKIN, replace=True
+                    )
+                    db.save_checkin_records(records, current_month, file_name)
                     
                     st.success(f"成功导入 {len(records)} 条打卡记录到 {current_month}！")
                     
@@ -255,107 +201,65 @@ with col_import2:
     start_date, end_date = get_expense_month_range(current_month)
     expense_month_str = f"{start_date} ~ {end_date}" if start_date else "未知"
     st.caption(f"费用月份范围: {expense_month_str}")
-    st.caption("💡 提示：请同时上传行程单和发票PDF，系统会自动配对")
+    st.caption("💡 提示：请同时上传行程单和发票PDF（或打包成一个 ZIP），系统会自动配对")
     
     if invoice_files:
         st.info(f"已选择 {len(invoice_files)} 个文件")
         
         if st.button("解析并导入发票数据", type="primary", key='import_invoice_btn'):
             with st.spinner("正在配对和解析发票文件..."):
-                file_dict = {}
-                for file in invoice_files:
-                    file_dict[file.name] = file
-                
-                pairs = {}
-                for filename in file_dict:
-                    if '行程单' in filename:
-                        base_name = filename.replace('行程单', '')
-                        if base_name not in pairs:
-                            pairs[base_name] = {}
-                        pairs[base_name]['itinerary'] = filename
-                    elif '发票' in filename:
-                        base_name = filename.replace('发票', '')
-                        if base_name not in pairs:
-                            pairs[base_name] = {}
-                        pairs[base_name]['invoice'] = filename
-                
-                valid_records = []
-                invalid_pairs = []
-                duplicate_records = []
-                parse_failed = []
+                pdf_files = [file for file in invoice_files if not file.name.lower().endswith('.zip')]
+                archive_files = [file for file in invoice_files if file.name.lower().endswith('.zip')]
+                file_dict = {file.name: file for file in pdf_files}
                 
                 progress_bar = st.progress(0)
                 status_text = st.empty()
                 
-                month_upload_dir = os.path.join(UPLOADS_DIR, current_month)
-                os.makedirs(month_upload_dir, exist_ok=True)
-                
-                pair_items = list(pairs.items())
-                for i, (base_name, pair_files) in enumerate(pair_items):
+                def show_progress(done, total, base_name):
                     status_text.text(f"正在处理: {base_name}")
-                    progress_bar.progress((i + 1) / len(pair_items))
-                    
-                    itinerary_file = pair_files.get('itinerary')
-                    invoice_file = pair_files.get('invoice')
-                    
-                    if not itinerary_file:
-                        parse_failed.append(f"{base_name} - 缺少行程单，无法解析数据")
-                        continue
-                    
-                    itinerary_data = file_dict[itinerary_file]
-                    temp_path = utils.save_uploaded_file(itinerary_data, temp_dir)
-                    
-                    record = utils.parse_taxi_pdf(temp_path)
-                    
+                    progress_bar.progress(done / total)
+                
+                results = []
+                if file_dict:
+                    results.append(importer.import_invoice_files(
+                        file_dict,
+                        lambda name: utils.parse_taxi_pdf(file_dict[name], name),
+                        current_month,
+                        lambda name, kind: importer.write_attachment(name, file_dict[name], current_month, kind),
+                        show_progress
+                    ))
+                for archive_file in archive_files:
                     try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-                    
-                    if not record or record.get('amount', 0) <= 0:
-                        parse_failed.append(f"{itinerary_file} - 解析失败")
-                        continue
-                    
-                    record['source_file'] = itinerary_file
-                    record['invoice_file'] = invoice_file if invoice_file else ''
-                    
-                    validation = validate_invoice_for_import(record, current_month)
-                    
-                    if validation['valid']:
-                        date_str = record['date'].strftime('%Y-%m-%d') if hasattr(record['date'], 'strftime') else str(record['date'])
-                        
-                        if db.invoice_exists(date_str, record['amount'], current_month):
-                            record['duplicate_reason'] = '重复记录（同日期同金额已存在）'
-                            duplicate_records.append(record)
-                        else:
-                            valid_records.append(record)
-                            
-                            saved_path = os.path.join(month_upload_dir, itinerary_file)
-                            with open(saved_path, 'wb') as f:
-                                f.write(itinerary_data.getbuffer())
-                            
-                            if invoice_file:
-                                invoice_data = file_dict[invoice_file]
-                                saved_path = os.path.join(month_upload_dir, invoice_file)
-                                with open(saved_path, 'wb') as f:
-                                    f.write(invoice_data.getbuffer())
-                    else:
-                        invalid_pairs.append({
-                            'base_name': base_name,
-                            'itinerary_file': itinerary_file,
-                            'invoice_file': invoice_file,
-                            'date': record['date'],
-                            'amount': record['amount'],
-                            'reason': validation['reason']
-                        })
+                        results.append(importer.import_invoice_archive(archive_file, current_month, show_progress))
+                    except zipfile.BadZipFile:
+                        results.append(importer.InvoiceImport([], [], [], [f"{archive_file.name} - 不是有效的 ZIP 压缩包"]))
+                
+                valid_records = [r for result in results for r in result.imported]
+                duplicate_records = [r for result in results for r in result.duplicates]
+                invalid_pairs = [p for result in results for p in result.invalid]
+                parse_failed = [msg for result in results for msg in result.failed]
+                pairing_reports = [result.pairing_report for result in results if result.pairing_report is not None]
                 
                 progress_bar.empty()
                 status_text.empty()
                 
                 if valid_records:
-                    db.save_invoice_records(valid_records, current_month)
                     st.success(f"✅ 成功导入 {len(valid_records)} 条发票记录（含配对的行程单+发票单）！")
                 
+                if pairing_reports:
+                    content_pairs = [pair for report in pairing_reports for pair in report.pairs if pair.method != 'name']
+                    unmatched_itineraries = [name for report in pairing_reports for name in report.unmatched_itineraries]
+                    unmatched_invoices = [name for report in pairing_reports for name in report.unmatched_invoices]
+                    suggested_pairs = [pair for report in pairing_reports for pair in report.suggestions]
+                    if content_pairs or unmatched_itineraries or unmatched_invoices:
+                        with st.expander(f"查看配对报告（按内容配对 {len(content_pairs)} 对，未配对行程单 {len(unmatched_itineraries)} 个，未配对发票 {len(unmatched_invoices)} 个）"):
+                            method_names = {'order_number': '订单号', 'amount_date': '金额+日期'}
+                            rows = [{'行程单': pair.itinerary, '发票单': pair.invoice, '配对方式': method_names[pair.method]} for pair in content_pairs]
+                            rows += [{'行程单': pair.itinerary, '发票单': pair.invoice, '配对方式': '仅金额相同（未导入，请确认后改名重新上传）'} for pair in suggested_pairs]
+                            rows += [{'行程单': name, '发票单': '无', '配对方式': '未配对'} for name in unmatched_itineraries]
+                            rows += [{'行程单': '无', '发票单': name, '配对方式': '未配对'} for name in unmatched_invoices]
+                            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+                
                 if duplicate_records:
                     st.warning(f"⚠️ {len(duplicate_records)} 条重复记录已跳过")
                     with st.expander("查看重复记录"):
@@ -398,7 +302,7 @@ with col_import2:
                         } for r in valid_records])
                         st.dataframe(df, use_container_width=True, hide_index=True)
                 
-                if not valid_records and not invalid_records and not duplicate_records:
+                if not valid_records and not invalid_pairs and not duplicate_records:
                     st.error("所有文件解析失败，请检查文件格式")
     else:
         st.info("请先上传发票文件")
@@ -413,27 +317,26 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown("#### 打卡记录")
-    checkin_records = db.get_checkin_records(current_month)
-    if checkin_records:
-        df_checkin = pd.DataFrame(checkin_records)
-        df_checkin['date'] = pd.to_datetime(df_checkin['date']).dt.strftime('%Y-%m-%d')
+    df_checkin = db.get_checkin_dataframe(current_month)
+    if not df_checkin.empty:
+        df_checkin['date'] = df_checkin['date'].dt.strftime('%Y-%m-%d')
         df_checkin = df_checkin[['date', 'work_hours', 'source_file']]
         df_checkin.columns = ['日期', '工作时长', '来源文件']
         st.dataframe(df_checkin, use_container_width=True, hide_index=True)
-        st.info(f"共 {len(checkin_records)} 条记录")
+        st.info(f"共 {len(df_checkin)} 条记录")
     else:
         st.info("暂无打卡记录")
 
 with col2:
     st.markdown("#### 发票记录")
-    invoice_records = db.get_invoice_records(current_month)
-    if invoice_records:
-        df_invoice = pd.DataFrame(invoice_records)
-        df_invoice['date'] = pd.to_datetime(df_invoice['date']).dt.strftime('%Y-%m-%d')
+    df_invoice = db.get_invoice_dataframe(current_month)
+    if not df_invoice.empty:
+        total_invoice_amount = df_invoice['amount'].sum()
+        df_invoice['date'] = df_invoice['date'].dt.strftime('%Y-%m-%d')
         df_invoice = df_invoice[['date', 'amount', 'company', 'source_file', 'invoice_file']]
         df_invoice.columns = ['日期', '金额', '服务商', '行程单', '发票单']
         st.dataframe(df_invoice, use_container_width=True, hide_index=True)
-        st.info(f"共 {len(invoice_records)} 条记录，总金额: ¥{sum(r['amount'] for r in invoice_records):.2f}")
+        st.info(f"共 {len(df_invoice)} 条记录，总金额: ¥{total_invoice_amount:.2f}")
     else:
         st.info("暂无发票记录")
 
@@ -451,6 +354,7 @@ with col_del2:
     if st.session_state.get('confirm_delete', False):
         if st.button("确认删除", type="primary", key='confirm_delete_btn'):
             db.clear_month_data(current_month)
+            attachments.collect_garbage()
             st.success(f"已清空 {current_month} 的所有数据")
             st.session_state['confirm_delete'] = False
             st.rerun()
@@ -469,71 +373,17 @@ with col_check1:
         invoice_records = db.get_invoice_records(current_month)
         checkin_records = db.get_checkin_records(current_month)
         
-        config = db.get_config('reimburse_rules') or {'taxi': {'threshold': 11.0}}
-        taxi_threshold = config['taxi']['threshold']
-        
-        invalid_records = []
-        
-        for invoice in invoice_records:
-            invoice_date_str = invoice['date'] if isinstance(invoice['date'], str) else invoice['date'].strftime('%Y-%m-%d')
-            
-            start_date, end_date = get_expense_month_range(current_month)
-            
-            try:
-                invoice_date = datetime.strptime(invoice_date_str, '%Y-%m-%d').date()
-            except:
-                invalid_records.append({
-                    'id': invoice['id'],
-                    'date': invoice_date_str,
-                    'amount': invoice['amount'],
-                    'reason': '日期格式错误'
-                })
-                continue
-            
-            if start_date and end_date:
-                if invoice_date < start_date or invoice_date > end_date:
-                    invalid_records.append({
-                        'id': invoice['id'],
-                        'date': invoice_date_str,
-                        'amount': invoice['amount'],
-                        'reason': f'日期不在费用月份范围({start_date}~{end_date})'
-                    })
-                    continue
-            
-            matching_checkin = None
-            for checkin in checkin_records:
-                checkin_date_str = checkin['date'] if isinstance(checkin['date'], str) else checkin['date'].strftime('%Y-%m-%d')
-                if checkin_date_str == invoice_date_str:
-                    matching_checkin = checkin
-                    break
-            
-            if not matching_checkin:
-                invalid_records.append({
-                    'id': invoice['id'],
-                    'date': invoice_date_str,
-                    'amount': invoice['amount'],
-                    'reason': '无对应打卡记录'
-                })
-                continue
-            
-            work_hours = matching_checkin['work_hours']
-            if work_hours < taxi_threshold:
-                invalid_records.append({
-                    'id': invoice['id'],
-                    'date': invoice_date_str,
-                    'amount': invoice['amount'],
-                    'reason': f'工作时长{work_hours}h未达到{taxi_threshold}h阈值'
-                })
+        invalid_records = validate_taxi_invoices(invoice_records, checkin_records, db.get_reimburse_policy(current_month)).invalid
         
         if invalid_records:
             st.warning(f"发现 {len(invalid_records)} 条不符合条件的发票记录")
             
-            df_invalid = pd.DataFrame(invalid_records)
+            df_invalid = validation_results_to_dataframe(invalid_records)
             df_invalid = df_invalid[['date', 'amount', 'reason']]
             df_invalid.columns = ['日期', '金额', '原因']
             st.dataframe(df_invalid, use_container_width=True, hide_index=True)
             
-            st.session_state['invalid_invoice_ids'] = [r['id'] for r in invalid_records]
+            st.session_state['invalid_invoice_ids'] = [r.invoice.id for r in invalid_records]
             
             if st.button("🗑️ 删除不符合条件的记录", type="primary", key='delete_invalid_btn'):
                 for record_id in st.session_state['invalid_invoice_ids']:
@@ -575,6 +425,7 @@ with col_check3:
         with col_confirm1:
             if st.button("✅ 确认初始化", type="primary", key='confirm_init_btn'):
                 db.clear_all_data()
+                attachments.collect_garbage(grace=0)
                 st.success("系统已初始化，所有数据已清除")
                 st.session_state['confirm_init'] = False
                 st.rerun()
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 import sys
 import pandas as pd
+import numpy as np
 
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SRC_DIR)
@@ -9,6 +10,8 @@ sys.path.insert(0, SRC_DIR)
 
 import database as db
 import utils
+import rules
+import work_calendar
 
 st.set_page_config(
     page_title="数据预览 - 报销管理系统",
@@ -35,16 +38,16 @@ with col_select:
     )
 
 with col_info:
-    checkin_records = db.get_checkin_records(selected_month)
-    invoice_records = db.get_invoice_records(selected_month)
+    df_checkin = db.get_checkin_dataframe(selected_month)
+    df_invoice = db.get_invoice_dataframe(selected_month)
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("打卡记录", f"{len(checkin_records)} 条")
+        st.metric("打卡记录", f"{len(df_checkin)} 条")
     with col2:
-        st.metric("发票记录", f"{len(invoice_records)} 条")
+        st.metric("发票记录", f"{len(df_invoice)} 条")
     with col3:
-        total_amount = sum(r['amount'] for r in invoice_records)
+        total_amount = df_invoice['amount'].sum()
         st.metric("发票总金额", f"¥{total_amount:.2f}")
 
 st.markdown("---")
@@ -54,11 +57,9 @@ tab1, tab2, tab3 = st.tabs(["📋 打卡记录", "🧾 发票记录", "✅ 报
 with tab1:
     st.markdown("### 打卡记录列表")
     
-    if checkin_records:
-        df_checkin = pd.DataFrame(checkin_records)
-        df_checkin['date'] = pd.to_datetime(df_checkin['date'])
+    if not df_checkin.empty:
         df_checkin = df_checkin.sort_values('date')
-        df_checkin['weekday'] = df_checkin['date'].apply(lambda x: utils.get_weekday_name(x.strftime('%Y-%m-%d')))
+        df_checkin['weekday'] = work_calendar.weekday_names(df_checkin['date'])
         df_checkin['date_str'] = df_checkin['date'].dt.strftime('%Y-%m-%d')
         
         df_display = df_checkin[['date_str', 'weekday', 'work_hours', 'source_file']].copy()
@@ -115,9 +116,7 @@ with tab1:
 with tab2:
     st.markdown("### 发票记录列表")
     
-    if invoice_records:
-        df_invoice = pd.DataFrame(invoice_records)
-        df_invoice['date'] = pd.to_datetime(df_invoice['date'])
+    if not df_invoice.empty:
         df_invoice = df_invoice.sort_values('date')
         df_invoice['date_str'] = df_invoice['date'].dt.strftime('%Y-%m-%d')
         
@@ -188,65 +187,45 @@ with tab2:
 with tab3:
     st.markdown("### 报销资格检查")
     
-    if checkin_records:
-        config = db.get_config('reimburse_rules') or {
-            'night_meal': {
-                'dinner_threshold': 9.5,
-                'dinner_amount': 18,
-                'night_threshold': 12,
-                'night_amount': 20
-            },
-            'taxi': {
-                'threshold': 11.0
-            }
-        }
+    if not df_checkin.empty:
+        policy = db.get_reimburse_policy(selected_month)
+        rule_version = utils.format_rule_version(db.get_rule_version(selected_month))
         
-        dinner_threshold = config['night_meal']['dinner_threshold']
-        night_threshold = config['night_meal']['night_threshold']
-        taxi_threshold = config['taxi']['threshold']
-        
-        st.markdown(f"""
-        **当前报销规则：**
-        - 晚餐报销：工作时长 ≥ {dinner_threshold} 小时，金额 ¥18
-        - 夜宵报销：工作时长 ≥ {night_threshold} 小时，金额 ¥20
-        - 打车报销：工作时长 > {taxi_threshold} 小时
-        """)
+        st.markdown(f"**报销规则（{rule_version}）：**\n" + "\n".join(f"- {line}" for line in rules.describe_policy(policy)))
         
         st.markdown("---")
         
-        check_results = []
+        df_reimburse = db.get_reimburse_dataframe(selected_month)
+        reimburse_groups = {
+            reimburse_type: df_reimburse[df_reimburse['reimburse_type'].astype(str) == reimburse_type]
+            for reimburse_type in rules.REIMBURSE_TYPES
+        }
+        masks = {
+            reimburse_type: df_checkin['date'].isin(df_type['date']).to_numpy()
+            for reimburse_type, df_type in reimburse_groups.items()
+        }
         
-        for record in checkin_records:
-            work_hours = record['work_hours']
-            date_str = record['date'] if isinstance(record['date'], str) else record['date'].strftime('%Y-%m-%d')
-            
-            dinner_eligible, dinner_amount, dinner_reason = utils.check_reimburse_eligibility(work_hours, 'dinner')
-            night_eligible, night_amount, night_reason = utils.check_reimburse_eligibility(work_hours, 'night')
-            taxi_eligible, _, taxi_reason = utils.check_reimburse_eligibility(work_hours, 'taxi')
-            
-            check_results.append({
-                '日期': date_str,
-                '工作时长': f"{work_hours:.1f}h",
-                '晚餐报销': '✅' if dinner_eligible else '❌',
-                '夜宵报销': '✅' if night_eligible else '❌',
-                '打车报销': '✅' if taxi_eligible else '❌',
-                '备注': dinner_reason if dinner_eligible else taxi_reason
-            })
+        eligibility = rules.evaluate(df_checkin['work_hours'].to_numpy(), policy, df_checkin['date'])
         
-        df_results = pd.DataFrame(check_results)
+        df_results = pd.DataFrame({
+            '日期': df_checkin['date'].dt.strftime('%Y-%m-%d').to_numpy(),
+            '工作时长': [f"{h:.1f}h" for h in df_checkin['work_hours'].tolist()],
+            '晚餐报销': np.where(masks['dinner'], '✅', '❌'),
+            '夜宵报销': np.where(masks['night'], '✅', '❌'),
+            '打车报销': np.where(eligibility.taxi, '✅', '❌'),
+            '打车发票': np.where(masks['taxi'], '✅', '—'),
+            '备注': np.where(eligibility.dinner, eligibility.reasons('dinner'), eligibility.reasons('taxi'))
+        })
         st.dataframe(df_results, use_container_width=True, hide_index=True)
         
-        eligible_dinner = sum(1 for r in check_results if r['晚餐报销'] == '✅')
-        eligible_night = sum(1 for r in check_results if r['夜宵报销'] == '✅')
-        eligible_taxi = sum(1 for r in check_results if r['打车报销'] == '✅')
-        
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("符合晚餐报销", f"{eligible_dinner} 天", f"¥{eligible_dinner * 18}")
+            st.metric("符合晚餐报销", f"{int(masks['dinner'].sum())} 天", f"¥{reimburse_groups['dinner']['amount'].sum():.0f}")
         with col2:
-            st.metric("符合夜宵报销", f"{eligible_night} 天", f"¥{eligible_night * 20}")
+            st.metric("符合夜宵报销", f"{int(masks['night'].sum())} 天", f"¥{reimburse_groups['night']['amount'].sum():.0f}")
         with col3:
-            st.metric("符合打车报销", f"{eligible_taxi} 天")
+            st.metric("符合打车报销", f"{int(eligibility.taxi.sum())} 天", f"¥{reimburse_groups['taxi']['amount'].sum():.2f}")
+            st.caption(f"其中 {int(masks['taxi'].sum())} 天已有有效打车发票")
             
     else:
         st.info("该月份暂无打卡记录，无法检查报销资格")
@@ -255,32 +234,28 @@ st.markdown("---")
 
 st.markdown("### 📊 数据统计")
 
-if checkin_records or invoice_records:
+if not df_checkin.empty or not df_invoice.empty:
     col_stat1, col_stat2 = st.columns(2)
     
     with col_stat1:
-        if checkin_records:
+        if not df_checkin.empty:
             st.markdown("#### 工作时长分布")
-            df_hours = pd.DataFrame(checkin_records)
-            df_hours['work_hours'] = pd.to_numeric(df_hours['work_hours'])
             
-            avg_hours = df_hours['work_hours'].mean()
-            max_hours = df_hours['work_hours'].max()
-            min_hours = df_hours['work_hours'].min()
+            avg_hours = df_checkin['work_hours'].mean()
+            max_hours = df_checkin['work_hours'].max()
+            min_hours = df_checkin['work_hours'].min()
             
             st.write(f"- 平均工作时长: **{avg_hours:.1f}** 小时")
             st.write(f"- 最长工作时长: **{max_hours:.1f}** 小时")
             st.write(f"- 最短工作时长: **{min_hours:.1f}** 小时")
     
     with col_stat2:
-        if invoice_records:
+        if not df_invoice.empty:
             st.markdown("#### 发票金额分布")
-            df_amount = pd.DataFrame(invoice_records)
-            df_amount['amount'] = pd.to_numeric(df_amount['amount'])
             
-            avg_amount = df_amount['amount'].mean()
-            max_amount = df_amount['amount'].max()
-            min_amount = df_amount['amount'].min()
+            avg_amount = df_invoice['amount'].mean()
+            max_amount = df_invoice['amount'].max()
+            min_amount = df_invoice['amount'].min()
             
             st.write(f"- 平均发票金额: **¥{avg_amount:.2f}**")
             st.write(f"- 最高发票金额: **¥{max_amount:.2f}**")
@@ -8,6 +8,9 @@ PROJECT_ROOT = os.path.dirname(SRC_DIR)
 sys.path.insert(0, SRC_DIR)
 
 import database as db
+import utils
+import rules
+from rules import DEFAULT_REIMBURSE_RULES
 
 st.set_page_config(
     page_title="配置管理 - 报销管理系统",
@@ -20,20 +23,27 @@ st.markdown("---")
 
 tab1, tab2, tab3 = st.tabs(["💰 报销规则", "📝 输出设置", "📁 文件路径"])
 
+def save_reimburse_setting(valid_from, apply_change):
+    db.validate_rule_version(valid_from)
+    previous_policy = db.get_reimburse_policy()
+    apply_change()
+    db.save_rule_version(valid_from, db.get_reimburse_policy(), previous_policy)
+    db.refresh_reimburse_records_in_background()
+
 with tab1:
     st.markdown("### 报销规则配置")
     
-    config = db.get_config('reimburse_rules') or {
-        'night_meal': {
-            'dinner_threshold': 9.5,
-            'dinner_amount': 18,
-            'night_threshold': 12,
-            'night_amount': 20
-        },
-        'taxi': {
-            'threshold': 11.0
-        }
-    }
+    config = db.get_reimburse_rules()
+    advanced_policy = db.get_config('reimburse_policy')
+    
+    if advanced_policy:
+        st.warning("当前已启用高级规则，以下基础规则不会生效。如需使用基础规则，请在下方清除高级规则。")
+    
+    valid_from = st.text_input(
+        "生效月份",
+        value=utils.generate_month_folder_name(),
+        help="格式 YY_MM，与月份文件夹一致。保存后该月份及之后的月份使用新规则，之前的月份仍按原规则计算"
+    )
     
     st.markdown("#### 晚餐报销设置")
     
@@ -91,7 +101,7 @@ with tab1:
         max_value=24.0,
         value=float(config['taxi']['threshold']),
         step=0.5,
-        help="工作时长超过此阈值可报销打车费用"
+        help="工作时长达到此阈值可报销打车费用"
     )
     
     st.markdown("---")
@@ -111,25 +121,20 @@ with tab1:
                     'threshold': taxi_threshold
                 }
             }
-            db.set_config('reimburse_rules', new_config)
-            st.success("报销规则已保存！")
+            try:
+                save_reimburse_setting(valid_from, lambda: db.set_config('reimburse_rules', new_config))
+                st.success(f"报销规则已保存，自 {valid_from} 起生效！")
+            except ValueError as e:
+                st.error(str(e))
     
     with col_reset:
         if st.button("🔄 恢复默认值", type="secondary", use_container_width=True):
-            default_config = {
-                'night_meal': {
-                    'dinner_threshold': 9.5,
-                    'dinner_amount': 18,
-                    'night_threshold': 12,
-                    'night_amount': 20
-                },
-                'taxi': {
-                    'threshold': 11.0
-                }
-            }
-            db.set_config('reimburse_rules', default_config)
-            st.success("已恢复默认值！")
-            st.rerun()
+            try:
+                save_reimburse_setting(valid_from, lambda: db.set_config('reimburse_rules', DEFAULT_REIMBURSE_RULES))
+                st.success("已恢复默认值！")
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
     
     st.markdown("---")
     
@@ -144,9 +149,86 @@ with tab1:
     - 注意：达到夜宵阈值时，晚餐和夜宵可同时报销
     
     **打车报销规则：**
-    - 工作时长 > {taxi_threshold} 小时，可报销打车费用
+    - 工作时长 ≥ {taxi_threshold} 小时，可报销打车费用
     - 打车金额按实际发票金额计算
     """)
+    
+    st.markdown("---")
+    
+    st.markdown("### 🧩 高级规则")
+    
+    st.markdown("""
+    高级规则使用 JSON 描述，可按工作日/周末/节假日设置分档阈值与金额、节假日金额倍数以及按城市的打车单次限额。
+    每类报销按顺序匹配，命中的第一档生效；`days` 可选值为 `workday`、`weekend`、`holiday`，`holidays` 为节假日，`workdays` 为调休上班日。
+    """)
+    
+    policy_example = {
+        'dinner': [
+            {'threshold': 4, 'amount': 18, 'days': ['weekend', 'holiday']},
+            {'threshold': dinner_threshold, 'amount': dinner_amount}
+        ],
+        'night': [{'threshold': night_threshold, 'amount': night_amount}],
+        'taxi': [
+            {'threshold': 6, 'days': ['weekend', 'holiday']},
+            {'threshold': taxi_threshold}
+        ],
+        'multipliers': {'holiday': 2},
+        'holidays': ['2025-05-01', '2025-05-02'],
+        'workdays': ['2025-04-27'],
+        'taxi_caps': {'default': None, 'cities': {'上海': 100}}
+    }
+    
+    policy_text = st.text_area(
+        "高级规则 JSON",
+        value=json.dumps(advanced_policy or policy_example, ensure_ascii=False, indent=2),
+        height=360
+    )
+    
+    col_policy_save, col_policy_clear = st.columns([1, 1])
+    
+    with col_policy_save:
+        if st.button("💾 保存高级规则", type="primary", use_container_width=True):
+            try:
+                new_policy = json.loads(policy_text)
+                rules.compile_policy(new_policy)
+                save_reimburse_setting(valid_from, lambda: db.set_config('reimburse_policy', new_policy))
+                st.success(f"高级规则已保存，自 {valid_from} 起生效！")
+                st.rerun()
+            except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+                st.error(f"高级规则格式错误: {e}")
+    
+    with col_policy_clear:
+        if st.button("🗑️ 清除高级规则", type="secondary", use_container_width=True, disabled=not advanced_policy):
+            try:
+                save_reimburse_setting(valid_from, lambda: db.delete_config('reimburse_policy'))
+                st.success("已清除高级规则，恢复使用基础规则！")
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+    
+    if advanced_policy:
+        st.info("**生效中的高级规则：**\n" + "\n".join(f"- {line}" for line in rules.describe_policy(advanced_policy)))
+    
+    st.markdown("---")
+    
+    st.markdown("### 🕒 规则版本")
+    
+    rule_versions = db.get_rule_versions()
+    
+    if rule_versions:
+        st.markdown("各月份按其生效月份之前最近的一个规则版本计算报销，修改规则不会影响更早月份的统计与导出。")
+        
+        for version in reversed(rule_versions):
+            with st.expander(f"📌 {utils.format_rule_version(version['valid_from'])}"):
+                st.markdown("\n".join(f"- {line}" for line in rules.describe_policy(version['policy'])))
+                
+                if version['valid_from'] != db.INITIAL_RULE_VERSION:
+                    if st.button("🗑️ 删除此版本", key=f"delete_rule_version_{version['valid_from']}"):
+                        db.delete_rule_version(version['valid_from'])
+                        st.success("规则版本已删除！")
+                        st.rerun()
+    else:
+        st.info("暂无规则版本，所有月份均按当前规则计算。保存规则后将按生效月份记录版本。")
 
 with tab2:
     st.markdown("### 输出设置配置")
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 import sys
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
@@ -11,6 +12,9 @@ PROJECT_ROOT = os.path.dirname(SRC_DIR)
 sys.path.insert(0, SRC_DIR)
 
 import database as db
+import utils
+import rules
+import simulator
 
 st.set_page_config(
     page_title="统计分析 - 报销管理系统",
@@ -43,7 +47,7 @@ with col4:
 
 st.markdown("---")
 
-tab1, tab2, tab3 = st.tabs(["📊 月度统计", "🧾 发票分析", "📋 历史记录"])
+tab1, tab2, tab3, tab4 = st.tabs(["📊 月度统计", "🧾 发票分析", "📋 历史记录", "🧪 规则模拟"])
 
 with tab1:
     st.markdown("### 月度报销统计")
@@ -51,41 +55,31 @@ with tab1:
     month_folders = db.get_month_folders()
     
     if month_folders:
-        monthly_data = []
-        
-        for month in month_folders:
-            checkin_records = db.get_checkin_records(month)
-            invoice_records = db.get_invoice_records(month)
-            reimburse_records = db.get_reimburse_records(month)
-            
-            config = db.get_config('reimburse_rules') or {
-                'night_meal': {
-                    'dinner_threshold': 9.5,
-                    'dinner_amount': 18,
-                    'night_threshold': 12,
-                    'night_amount': 20
-                }
-            }
-            
-            dinner_count = sum(1 for r in checkin_records if r['work_hours'] >= config['night_meal']['dinner_threshold'])
-            night_count = sum(1 for r in checkin_records if r['work_hours'] >= config['night_meal']['night_threshold'])
-            
-            dinner_amount = dinner_count * config['night_meal']['dinner_amount']
-            night_amount = night_count * config['night_meal']['night_amount']
-            taxi_amount = sum(r['amount'] for r in invoice_records)
-            
-            monthly_data.append({
-                '月份': month,
-                '打卡天数': len(checkin_records),
-                '晚餐报销天数': dinner_count,
-                '夜宵报销天数': night_count,
-                '晚餐金额': dinner_amount,
-                '夜宵金额': night_amount,
-                '打车金额': taxi_amount,
-                '总金额': dinner_amount + night_amount + taxi_amount
-            })
-        
-        df_monthly = pd.DataFrame(monthly_data)
+        rule_versions = {month_folder: db.get_rule_version(month_folder) for month_folder in month_folders}
+        
+        checkin_days = [
+            page['month_folder'].astype(str).value_counts()
+            for page in db.iter_checkin_pages(columns=['month_folder'], page_size=5000)
+        ]
+        
+        df_summary = db.get_reimburse_summary()
+        counts = df_summary.pivot(index='month_folder', columns='reimburse_type', values='count')
+        amounts = df_summary.pivot(index='month_folder', columns='reimburse_type', values='amount')
+        counts = counts.reindex(index=month_folders, columns=list(rules.REIMBURSE_TYPES)).fillna(0).astype(int)
+        amounts = amounts.reindex(index=month_folders, columns=list(rules.REIMBURSE_TYPES)).fillna(0.0)
+        
+        df_monthly = pd.DataFrame({
+            '打卡天数': pd.concat(checkin_days).groupby(level=0).sum().reindex(month_folders, fill_value=0) if checkin_days else 0,
+            '晚餐报销天数': counts['dinner'],
+            '夜宵报销天数': counts['night'],
+            '晚餐金额': amounts['dinner'],
+            '夜宵金额': amounts['night'],
+            '打车金额': amounts['taxi']
+        }, index=month_folders)
+        
+        df_monthly['总金额'] = df_monthly['晚餐金额'] + df_monthly['夜宵金额'] + df_monthly['打车金额']
+        df_monthly['规则版本'] = [utils.format_rule_version(rule_versions[m]) for m in month_folders]
+        df_monthly = df_monthly.rename_axis('月份').reset_index()
         
         st.dataframe(
             df_monthly,
@@ -141,20 +135,21 @@ with tab1:
 with tab2:
     st.markdown("### 发票数据分析")
     
-    all_invoices = db.get_invoice_records()
+    company_pages = []
+    amount_chunks = []
+    
+    for page in db.iter_invoice_pages(columns=['company', 'amount'], page_size=5000):
+        company_pages.append(page.groupby('company', observed=True)['amount'].agg(['count', 'sum']))
+        amount_chunks.append(page['amount'].to_numpy())
     
-    if all_invoices:
-        df_invoices = pd.DataFrame(all_invoices)
-        df_invoices['date'] = pd.to_datetime(df_invoices['date'])
+    if amount_chunks:
+        df_invoices = pd.DataFrame({'amount': np.concatenate(amount_chunks)})
         
         st.markdown("#### 服务商分布")
         
-        company_stats = df_invoices.groupby('company').agg({
-            'amount': ['count', 'sum', 'mean']
-        }).round(2)
-        
-        company_stats.columns = ['次数', '总金额', '平均金额']
-        company_stats = company_stats.reset_index()
+        company_stats = pd.concat(company_pages).groupby(level=0).sum()
+        company_stats['mean'] = company_stats['sum'] / company_stats['count']
+        company_stats = company_stats.round(2).reset_index()
         company_stats.columns = ['服务商', '次数', '总金额', '平均金额']
         
         col_chart1, col_chart2 = st.columns([1, 1])
@@ -209,11 +204,9 @@ with tab2:
 with tab3:
     st.markdown("### 导出历史记录")
     
-    export_history = db.get_export_history(50)
+    df_history = db.get_export_history_dataframe(50)
     
-    if export_history:
-        df_history = pd.DataFrame(export_history)
-        df_history['created_at'] = pd.to_datetime(df_history['created_at'])
+    if not df_history.empty:
         df_history = df_history.sort_values('created_at', ascending=False)
         
         df_display = df_history[['month_folder', 'export_type', 'record_count', 'total_amount', 'created_at']].copy()
@@ -248,6 +241,141 @@ with tab3:
     else:
         st.info("暂无导出历史记录")
 
+with tab4:
+    st.markdown("### 规则调整模拟")
+    st.markdown("基于全部历史打卡与打车发票，按各月份适用的规则（含分档、节假日倍数与打车限额）估算调整报销阈值或金额后的报销总额变化（不会修改当前配置）。")
+    
+    current_policy = db.get_reimburse_policy()
+    current_tiers = {
+        reimburse_type: simulator.base_tier(current_policy, reimburse_type)
+        for reimburse_type in rules.REIMBURSE_TYPES
+    }
+    default_tiers = {
+        reimburse_type: simulator.base_tier(rules.DEFAULT_REIMBURSE_RULES, reimburse_type)
+        for reimburse_type in rules.REIMBURSE_TYPES
+    }
+    
+    def current_value(reimburse_type, field):
+        return current_tiers[reimburse_type].get(field, default_tiers[reimburse_type].get(field, 0))
+    
+    col_sim1, col_sim2, col_sim3, col_sim4, col_sim5 = st.columns(5)
+    
+    with col_sim1:
+        sim_dinner_threshold = st.number_input(
+            "晚餐阈值（小时）", min_value=0.0, max_value=24.0, step=0.5,
+            value=float(current_value('dinner', 'threshold')), key='sim_dinner_threshold'
+        )
+    with col_sim2:
+        sim_dinner_amount = st.number_input(
+            "晚餐金额（元）", min_value=0, max_value=100, step=1,
+            value=int(current_value('dinner', 'amount')), key='sim_dinner_amount'
+        )
+    with col_sim3:
+        sim_night_threshold = st.number_input(
+            "夜宵阈值（小时）", min_value=0.0, max_value=24.0, step=0.5,
+            value=float(current_value('night', 'threshold')), key='sim_night_threshold'
+        )
+    with col_sim4:
+        sim_night_amount = st.number_input(
+            "夜宵金额（元）", min_value=0, max_value=100, step=1,
+            value=int(current_value('night', 'amount')), key='sim_night_amount'
+        )
+    with col_sim5:
+        sim_taxi_threshold = st.number_input(
+            "打车阈值（小时）", min_value=0.0, max_value=24.0, step=0.5,
+            value=float(current_value('taxi', 'threshold')), key='sim_taxi_threshold'
+        )
+    
+    sim_values = {
+        'dinner': {'threshold': sim_dinner_threshold, 'amount': sim_dinner_amount},
+        'night': {'threshold': sim_night_threshold, 'amount': sim_night_amount},
+        'taxi': {'threshold': sim_taxi_threshold}
+    }
+    candidate_overrides = {
+        reimburse_type: {
+            field: value for field, value in values.items()
+            if float(value) != float(current_value(reimburse_type, field))
+        }
+        for reimburse_type, values in sim_values.items()
+    }
+    
+    payout_index = simulator.PayoutIndex(
+        db.get_checkin_records(), db.get_invoice_records(invoice_type='taxi'), db.get_reimburse_policy
+    )
+    df_sim = payout_index.simulate({'当前规则': {}, '模拟规则': candidate_overrides})
+    
+    if not df_sim.empty:
+        df_totals = df_sim.pivot(index='month_folder', columns='candidate', values='total')
+        df_totals['差额'] = df_totals['模拟规则'] - df_totals['当前规则']
+        
+        current_total = df_totals['当前规则'].sum()
+        candidate_total = df_totals['模拟规则'].sum()
+        
+        col_m1, col_m2, col_m3 = st.columns(3)
+        with col_m1:
+            st.metric("当前规则总额", f"¥{current_total:.2f}")
+        with col_m2:
+            st.metric("模拟规则总额", f"¥{candidate_total:.2f}", f"{candidate_total - current_total:+.2f}")
+        with col_m3:
+            change = (candidate_total - current_total) / current_total if current_total else 0
+            st.metric("变化幅度", f"{change:+.1%}")
+        
+        fig_delta = go.Figure(go.Bar(
+            x=df_totals.index,
+            y=df_totals['差额'],
+            marker_color=np.where(df_totals['差额'] >= 0, '#d62728', '#2ca02c')
+        ))
+        fig_delta.update_layout(
+            title='各月份报销差额（模拟 - 当前）',
+            xaxis_title='月份',
+            yaxis_title='差额（元）',
+            height=360
+        )
+        st.plotly_chart(fig_delta, use_container_width=True)
+        
+        st.markdown("#### 阈值敏感度")
+        
+        sweep_thresholds = np.arange(6.0, 14.01, 0.5)
+        
+        col_sweep1, col_sweep2 = st.columns(2)
+        
+        with col_sweep1:
+            df_sweep = pd.concat([
+                payout_index.sweep('dinner', sweep_thresholds, sim_dinner_amount).assign(类型='晚餐'),
+                payout_index.sweep('night', sweep_thresholds, sim_night_amount).assign(类型='夜宵')
+            ])
+            fig_sweep = px.line(
+                df_sweep, x='threshold', y='total', color='类型', markers=True,
+                title='餐补总额随阈值变化',
+                labels={'threshold': '阈值（小时）', 'total': '总额（元）'}
+            )
+            st.plotly_chart(fig_sweep, use_container_width=True)
+        
+        with col_sweep2:
+            df_taxi_sweep = payout_index.sweep('taxi', sweep_thresholds)
+            fig_taxi_sweep = px.line(
+                df_taxi_sweep, x='threshold', y='total', markers=True,
+                title='打车报销总额随阈值变化',
+                labels={'threshold': '阈值（小时）', 'total': '总额（元）'}
+            )
+            fig_taxi_sweep.add_vline(x=sim_taxi_threshold, line_dash='dash')
+            st.plotly_chart(fig_taxi_sweep, use_container_width=True)
+        
+        df_sim_display = df_totals.reset_index()
+        df_sim_display.columns = ['月份', '当前规则', '模拟规则', '差额']
+        st.dataframe(
+            df_sim_display,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "当前规则": st.column_config.NumberColumn("当前规则", format="¥%.2f"),
+                "模拟规则": st.column_config.NumberColumn("模拟规则", format="¥%.2f"),
+                "差额": st.column_config.NumberColumn("差额", format="¥%.2f"),
+            }
+        )
+    else:
+        st.info("暂无可用于模拟的数据")
+
 st.markdown("---")
 
 st.markdown("### 📊 综合统计")
@@ -261,7 +389,7 @@ with col_stat1:
     
     if reimburse_by_type:
         df_type = pd.DataFrame([
-            {'类型': k, '金额': v}
+            {'类型': rules.REIMBURSE_TYPE_NAMES.get(k, k), '金额': v}
             for k, v in reimburse_by_type.items()
         ])
         
@@ -278,33 +406,30 @@ with col_stat1:
 with col_stat2:
     st.markdown("#### 数据统计摘要")
     
-    all_checkin = db.get_checkin_records()
+    total_days = 0
+    total_hours = 0.0
+    max_hours = None
+    min_hours = None
     
-    if all_checkin:
-        df_checkin = pd.DataFrame(all_checkin)
-        df_checkin['work_hours'] = pd.to_numeric(df_checkin['work_hours'])
-        
-        st.write(f"- **总打卡天数**: {len(df_checkin)} 天")
-        st.write(f"- **平均工作时长**: {df_checkin['work_hours'].mean():.1f} 小时")
-        st.write(f"- **最长工作时长**: {df_checkin['work_hours'].max():.1f} 小时")
-        st.write(f"- **最短工作时长**: {df_checkin['work_hours'].min():.1f} 小时")
-        
-        config = db.get_config('reimburse_rules') or {
-            'night_meal': {
-                'dinner_threshold': 9.5,
-                'night_threshold': 12
-            },
-            'taxi': {
-                'threshold': 11.0
-            }
-        }
-        
-        dinner_threshold = config['night_meal']['dinner_threshold']
-        night_threshold = config['night_meal']['night_threshold']
-        taxi_threshold = config['taxi']['threshold']
-        
-        st.write(f"- **符合晚餐报销**: {len(df_checkin[df_checkin['work_hours'] >= dinner_threshold])} 天")
-        st.write(f"- **符合夜宵报销**: {len(df_checkin[df_checkin['work_hours'] >= night_threshold])} 天")
-        st.write(f"- **符合打车报销**: {len(df_checkin[df_checkin['work_hours'] > taxi_threshold])} 天")
+    for page in db.iter_checkin_pages(columns=['work_hours'], page_size=5000):
+        hours = page['work_hours'].to_numpy()
+        total_days += len(hours)
+        total_hours += hours.sum()
+        max_hours = hours.max() if max_hours is None else max(max_hours, hours.max())
+        min_hours = hours.min() if min_hours is None else min(min_hours, hours.min())
+    
+    reimburse_days = db.get_reimburse_summary().groupby('reimburse_type')['count'].sum()
+    dinner_days = int(reimburse_days.get('dinner', 0))
+    night_days = int(reimburse_days.get('night', 0))
+    taxi_days = int(reimburse_days.get('taxi', 0))
+    
+    if total_days:
+        st.write(f"- **总打卡天数**: {total_days} 天")
+        st.write(f"- **平均工作时长**: {total_hours / total_days:.1f} 小时")
+        st.write(f"- **最长工作时长**: {max_hours:.1f} 小时")
+        st.write(f"- **最短工作时长**: {min_hours:.1f} 小时")
+        st.write(f"- **符合晚餐报销**: {dinner_days} 天")
+        st.write(f"- **符合夜宵报销**: {night_days} 天")
+        st.write(f"- **符合打车报销**: {taxi_days} 天")
     else:
         st.info("暂无打卡数据")
@@ -2,10 +2,7 @@ import streamlit as st
 import os
 import sys
 import pandas as pd
-import xlwt
-import zipfile
-from io import BytesIO
-from datetime import datetime, date
+import numpy as np
 
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SRC_DIR)
@@ -13,6 +10,11 @@ sys.path.insert(0, SRC_DIR)
 
 import database as db
 import utils
+import rules
+import archive
+import exporter
+from validation import validate_taxi_invoices
+from work_calendar import get_expense_month_range
 
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 UPLOADS_DIR = os.path.join(DATA_DIR, 'uploads')
@@ -41,6 +43,12 @@ with col_select:
         options=month_folders,
         index=0
     )
+    export_format = st.radio(
+        "明细表格式",
+        options=exporter.EXPORT_FORMATS,
+        format_func=lambda fmt: {'xls': 'xls（财务模板）', 'xlsx': 'xlsx（大数据量）'}[fmt],
+        horizontal=True
+    )
 
 with col_info:
     checkin_records = db.get_checkin_records(selected_month)
@@ -52,309 +60,27 @@ with col_info:
     with col2:
         st.metric("发票记录", f"{len(invoice_records)} 条")
     with col3:
-        total_amount = sum(r['amount'] for r in invoice_records)
+        total_amount = sum(r.amount for r in invoice_records)
         st.metric("发票总金额", f"¥{total_amount:.2f}")
 
 st.markdown("---")
 
-def get_expense_month_range(month_folder):
-    try:
-        year = 2000 + int(month_folder[:2])
-        month = int(month_folder[3:5])
-        
-        expense_month = month - 1
-        expense_year = year
-        if expense_month == 0:
-            expense_month = 12
-            expense_year = year - 1
-        
-        start_date = date(expense_year, expense_month, 1)
-        if expense_month == 12:
-            end_date = date(expense_year + 1, 1, 1) - pd.Timedelta(days=1)
-        else:
-            end_date = date(expense_year, expense_month + 1, 1) - pd.Timedelta(days=1)
-        
-        return start_date, end_date
-    except:
-        return None, None
-
-def validate_taxi_invoice(invoice_record, checkin_records, month_folder):
-    result = {
-        'valid': False,
-        'reason': '',
-        'work_hours': 0
-    }
-    
-    config = db.get_config('reimburse_rules') or {'taxi': {'threshold': 11.0}}
-    taxi_threshold = config['taxi']['threshold']
-    
-    start_date, end_date = get_expense_month_range(month_folder)
-    if not start_date or not end_date:
-        result['reason'] = '无法确定费用月份范围'
-        return result
-    
-    invoice_date_str = invoice_record['date'] if isinstance(invoice_record['date'], str) else invoice_record['date'].strftime('%Y-%m-%d')
-    try:
-        invoice_date = datetime.strptime(invoice_date_str, '%Y-%m-%d').date()
-    except:
-        result['reason'] = '发票日期格式错误'
-        return result
-    
-    if invoice_date < start_date or invoice_date > end_date:
-        result['reason'] = f'日期不在费用月份范围内({start_date.strftime("%Y-%m-%d")}~{end_date.strftime("%Y-%m-%d")})'
-        return result
-    
-    matching_checkin = None
-    for checkin in checkin_records:
-        checkin_date_str = checkin['date'] if isinstance(checkin['date'], str) else checkin['date'].strftime('%Y-%m-%d')
-        try:
-            checkin_date = datetime.strptime(checkin_date_str, '%Y-%m-%d').date()
-            if checkin_date == invoice_date:
-                matching_checkin = checkin
-                break
-        except:
-            continue
-    
-    if not matching_checkin:
-        result['reason'] = '无对应打卡记录'
-        return result
-    
-    work_hours = matching_checkin['work_hours']
-    result['work_hours'] = work_hours
-    
-    if work_hours < taxi_threshold:
-        result['reason'] = f'工作时长{work_hours}h未达到{taxi_threshold}h阈值'
-        return result
-    
-    result['valid'] = True
-    result['reason'] = f'工作时长{work_hours}h，符合条件'
-    return result
-
-def generate_night_meal_excel(checkin_records, month_folder):
-    output = BytesIO()
-    workbook = xlwt.Workbook(encoding='utf-8')
-    worksheet = workbook.add_sheet('晚餐夜宵报销')
-    
-    for i in range(4):
-        worksheet.col(i).width = 256 * 20
-    
-    config = db.get_config('reimburse_rules') or {
-        'night_meal': {
-            'dinner_threshold': 9.5,
-            'dinner_amount': 18,
-            'night_threshold': 12,
-            'night_amount': 20
-        }
-    }
-    
-    dinner_threshold = config['night_meal']['dinner_threshold']
-    dinner_amount = config['night_meal']['dinner_amount']
-    night_threshold = config['night_meal']['night_threshold']
-    night_amount = config['night_meal']['night_amount']
-    
-    output_config = db.get_config('output') or {'default_name': '姓名'}
-    default_name = output_config['default_name']
-    
-    worksheet.write(0, 0, '晚餐、夜宵报销明细')
-    
-    worksheet.write(1, 0, '月份')
-    worksheet.write(1, 1, '日期')
-    worksheet.write(1, 2, f'晚餐报销{dinner_amount}元（工作时长{dinner_threshold}小时）')
-    worksheet.write(1, 3, f'夜宵报销{night_amount}元（工作时长{night_threshold}小时）')
-    
-    row = 2
-    total_dinner = 0
-    total_night = 0
-    
-    eligible_records = []
-    
-    for record in checkin_records:
-        work_hours = record['work_hours']
-        
-        if work_hours >= dinner_threshold:
-            eligible_records.append(record)
-            
-            date_str = record['date'] if isinstance(record['date'], str) else record['date'].strftime('%Y-%m-%d')
-            
-            try:
-                dt = datetime.strptime(date_str, '%Y-%m-%d')
-                month_str = dt.strftime('%m月')
-                weekday_map = {0: '星期一', 1: '星期二', 2: '星期三', 3: '星期四', 4: '星期五', 5: '星期六', 6: '星期日'}
-                weekday_str = weekday_map[dt.weekday()]
-                date_display = f"{dt.strftime('%Y/%m/%d')} {weekday_str}"
-            except:
-                month_str = month_folder[-2:] + '月'
-                date_display = date_str
-            
-            worksheet.write(row, 0, month_str)
-            worksheet.write(row, 1, date_display)
-            
-            if work_hours >= night_threshold:
-                worksheet.write(row, 2, dinner_amount)
-                worksheet.write(row, 3, night_amount)
-                total_dinner += dinner_amount
-                total_night += night_amount
-            else:
-                worksheet.write(row, 2, dinner_amount)
-                worksheet.write(row, 3, '')
-                total_dinner += dinner_amount
-            
-            row += 1
-    
-    total_all = total_dinner + total_night
-    worksheet.write(row, 0, '')
-    worksheet.write(row, 1, '合计')
-    worksheet.write(row, 2, total_dinner)
-    worksheet.write(row, 3, total_night)
-    
-    row += 1
-    worksheet.write(row, 0, '')
-    worksheet.write(row, 1, '最终总计')
-    worksheet.write(row, 2, '')
-    worksheet.write(row, 3, total_all)
-    
-    workbook.save(output)
-    output.seek(0)
-    
-    return output, len(eligible_records), total_all
-
-def generate_taxi_excel(validated_records, month_folder):
-    output = BytesIO()
-    workbook = xlwt.Workbook(encoding='utf-8')
-    worksheet = workbook.add_sheet('加班打车报销')
-    
-    for i in range(7):
-        worksheet.col(i).width = 256 * 15
-    
-    config = db.get_config('reimburse_rules') or {'taxi': {'threshold': 11.0}}
-    taxi_threshold = config['taxi']['threshold']
-    
-    output_config = db.get_config('output') or {'default_name': '姓名'}
-    default_name = output_config['default_name']
-    
-    worksheet.write(0, 0, f'打车报销明细（工作时长≥{taxi_threshold}小时）')
-    
-    worksheet.write(1, 0, '月份')
-    worksheet.write(1, 1, '日期')
-    worksheet.write(1, 2, '出发地')
-    worksheet.write(1, 3, '到达地')
-    worksheet.write(1, 4, '金额')
-    worksheet.write(1, 5, '工作时长')
-    
-    row = 2
-    total_amount = 0
-    
-    for record in validated_records:
-        invoice = record['invoice']
-        work_hours = record['work_hours']
-        
-        date_str = invoice['date'] if isinstance(invoice['date'], str) else invoice['date'].strftime('%Y-%m-%d')
-        
-        try:
-            dt = datetime.strptime(date_str, '%Y-%m-%d')
-            month_str = dt.strftime('%m月')
-            date_display = dt.strftime('%Y-%m-%d')
-        except:
-            month_str = month_folder[-2:] + '月'
-            date_display = date_str
-        
-        worksheet.write(row, 0, month_str)
-        worksheet.write(row, 1, date_display)
-        worksheet.write(row, 2, invoice.get('start_location', ''))
-        worksheet.write(row, 3, invoice.get('end_location', ''))
-        worksheet.write(row, 4, invoice['amount'])
-        worksheet.write(row, 5, f'{work_hours:.1f}h')
-        
-        total_amount += invoice['amount']
-        row += 1
-    
-    worksheet.write(row, 0, '合计')
-    worksheet.write(row, 1, '')
-    worksheet.write(row, 2, '')
-    worksheet.write(row, 3, '')
-    worksheet.write(row, 4, total_amount)
-    worksheet.write(row, 5, '')
-    
-    workbook.save(output)
-    output.seek(0)
-    
-    return output, len(validated_records), total_amount
-
-def create_night_meal_zip(excel_data, month_folder, file_name):
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr(file_name, excel_data.getvalue())
-        
-        month_upload_dir = os.path.join(UPLOADS_DIR, month_folder)
-        
-        if os.path.exists(month_upload_dir):
-            for file in os.listdir(month_upload_dir):
-                if '打卡' in file and (file.endswith('.xlsx') or file.endswith('.xls')):
-                    file_path = os.path.join(month_upload_dir, file)
-                    with open(file_path, 'rb') as f:
-                        zf.writestr(f"附件/{file}", f.read())
-    
-    zip_buffer.seek(0)
-    return zip_buffer
-
-def create_taxi_zip(excel_data, month_folder, file_name, validated_records):
-    zip_buffer = BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr(file_name, excel_data.getvalue())
-        
-        month_upload_dir = os.path.join(UPLOADS_DIR, month_folder)
-        
-        if os.path.exists(month_upload_dir):
-            added_files = set()
-            
-            for record in validated_records:
-                invoice = record['invoice']
-                source_file = invoice.get('source_file', '')
-                invoice_file = invoice.get('invoice_file', '')
-                
-                if source_file and source_file not in added_files:
-                    file_path = os.path.join(month_upload_dir, source_file)
-                    if os.path.exists(file_path):
-                        with open(file_path, 'rb') as f:
-                            zf.writestr(f"附件/{source_file}", f.read())
-                        added_files.add(source_file)
-                
-                if invoice_file and invoice_file not in added_files:
-                    file_path = os.path.join(month_upload_dir, invoice_file)
-                    if os.path.exists(file_path):
-                        with open(file_path, 'rb') as f:
-                            zf.writestr(f"附件/{invoice_file}", f.read())
-                        added_files.add(invoice_file)
-    
-    zip_buffer.seek(0)
-    return zip_buffer
-
 tab1, tab2 = st.tabs(["🍽️ 晚餐夜宵报销", "🚗 打车报销"])
 
 with tab1:
     st.markdown("### 晚餐夜宵报销明细")
     
-    config = db.get_config('reimburse_rules') or {
-        'night_meal': {
-            'dinner_threshold': 9.5,
-            'dinner_amount': 18,
-            'night_threshold': 12,
-            'night_amount': 20
-        }
-    }
+    policy = db.get_reimburse_policy(selected_month)
     
-    dinner_threshold = config['night_meal']['dinner_threshold']
-    night_threshold = config['night_meal']['night_threshold']
+    meal_records = db.get_meal_reimbursements(selected_month)
     
-    eligible_count = sum(1 for r in checkin_records if r['work_hours'] >= dinner_threshold)
-    night_count = sum(1 for r in checkin_records if r['work_hours'] >= night_threshold)
+    eligible_count = int(meal_records['dinner'].sum())
+    night_count = int(meal_records['night'].sum())
+    rule_lines = '\n'.join(f'    - {line}' for line in rules.describe_policy(policy, ('dinner', 'night')))
     
     st.info(f"""
     **报销规则说明：**
-    - 工作时长 ≥ {dinner_threshold} 小时：可报销晚餐 ¥{config['night_meal']['dinner_amount']}
-    - 工作时长 ≥ {night_threshold} 小时：可报销晚餐+夜宵 ¥{config['night_meal']['dinner_amount'] + config['night_meal']['night_amount']}
+{rule_lines}
     
     **当前月份符合条件：**
     - 符合晚餐报销：{eligible_count} 天
@@ -364,26 +90,15 @@ with tab1:
     if checkin_records:
         st.markdown("#### 数据预览")
         
-        preview_data = []
-        for record in checkin_records:
-            work_hours = record['work_hours']
-            if work_hours >= dinner_threshold:
-                date_str = record['date'] if isinstance(record['date'], str) else record['date'].strftime('%Y-%m-%d')
-                
-                dinner_eligible = work_hours >= dinner_threshold
-                night_eligible = work_hours >= night_threshold
-                
-                preview_data.append({
-                    '日期': date_str,
-                    '工作时长': f"{work_hours:.1f}h",
-                    '晚餐': '✅' if dinner_eligible else '❌',
-                    '夜宵': '✅' if night_eligible else '❌',
-                    '晚餐金额': config['night_meal']['dinner_amount'] if dinner_eligible else 0,
-                    '夜宵金额': config['night_meal']['night_amount'] if night_eligible else 0
-                })
-        
-        if preview_data:
-            df_preview = pd.DataFrame(preview_data)
+        if not meal_records.empty:
+            df_preview = pd.DataFrame({
+                '日期': meal_records['date'],
+                '工作时长': [f"{h:.1f}h" for h in meal_records['work_hours'].tolist()],
+                '晚餐': np.where(meal_records['dinner'], '✅', '❌'),
+                '夜宵': np.where(meal_records['night'], '✅', '❌'),
+                '晚餐金额': meal_records['dinner_amount'],
+                '夜宵金额': meal_records['night_amount']
+            })
             st.dataframe(df_preview, use_container_width=True, hide_index=True)
         
         st.markdown("---")
@@ -392,51 +107,44 @@ with tab1:
         
         with col_gen:
             if st.button("📊 生成报销明细", type="primary", use_container_width=True, key='gen_night_meal'):
-                excel_data, record_count, total_amount = generate_night_meal_excel(checkin_records, selected_month)
+                result = exporter.export_night_meal_excel(meal_records, selected_month, export_format)
                 
-                st.session_state['night_meal_excel'] = excel_data
-                st.session_state['night_meal_count'] = record_count
-                st.session_state['night_meal_amount'] = total_amount
+                st.session_state['night_meal_excel'] = result
                 
-                st.success(f"生成成功！共 {record_count} 条记录，总金额 ¥{total_amount}")
+                st.success(f"生成成功！共 {result.record_count} 条记录，总金额 ¥{result.total_amount:.2f}")
         
         with col_down:
-            if 'night_meal_excel' in st.session_state:
-                output_config = db.get_config('output') or {'default_name': '姓名'}
-                default_name = output_config['default_name']
-                month_num = selected_month[-2:]
-                file_name = f"{default_name}_晚餐、夜宵报销明细表_{month_num}月.xls"
+            if 'night_meal_excel' in st.session_state and os.path.exists(st.session_state['night_meal_excel'].path):
+                file_name = exporter.report_file_name('night_meal', selected_month, os.path.splitext(st.session_state['night_meal_excel'].path)[1])
                 
                 st.download_button(
                     label="📥 下载明细表",
-                    data=st.session_state['night_meal_excel'],
+                    data=archive.archive_reader(st.session_state['night_meal_excel'].path),
                     file_name=file_name,
-                    mime="application/vnd.ms-excel",
+                    mime=exporter.excel_mime(st.session_state['night_meal_excel'].path),
                     use_container_width=True,
                     key='download_night_meal'
                 )
         
         with col_zip:
-            if 'night_meal_excel' in st.session_state:
-                output_config = db.get_config('output') or {'default_name': '姓名'}
-                default_name = output_config['default_name']
-                month_num = selected_month[-2:]
-                file_name = f"{default_name}_晚餐、夜宵报销明细表_{month_num}月.xls"
-                zip_name = f"{default_name}_晚餐夜宵报销_{month_num}月.zip"
+            if 'night_meal_excel' in st.session_state and os.path.exists(st.session_state['night_meal_excel'].path):
+                file_name = exporter.report_file_name('night_meal', selected_month, os.path.splitext(st.session_state['night_meal_excel'].path)[1])
+                zip_name = exporter.bundle_file_name('night_meal', selected_month)
                 
                 if st.button("📦 打包下载(含打卡文件)", use_container_width=True, key='zip_night_meal'):
-                    zip_data = create_night_meal_zip(
+                    zip_result = exporter.export_night_meal_zip(
                         st.session_state['night_meal_excel'],
                         selected_month,
-                        file_name
+                        file_name,
+                        os.path.join(UPLOADS_DIR, selected_month)
                     )
-                    st.session_state['night_meal_zip'] = zip_data
+                    st.session_state['night_meal_zip'] = zip_result.path
                     st.session_state['night_meal_zip_name'] = zip_name
                 
-                if 'night_meal_zip' in st.session_state:
+                if 'night_meal_zip' in st.session_state and os.path.exists(st.session_state['night_meal_zip']):
                     st.download_button(
                         label=f"📥 下载 {st.session_state['night_meal_zip_name']}",
-                        data=st.session_state['night_meal_zip'],
+                        data=archive.archive_reader(st.session_state['night_meal_zip']),
                         file_name=st.session_state['night_meal_zip_name'],
                         mime="application/zip",
                         use_container_width=True,
@@ -448,31 +156,24 @@ with tab1:
 with tab2:
     st.markdown("### 打车报销明细")
     
-    config = db.get_config('reimburse_rules') or {'taxi': {'threshold': 11.0}}
-    taxi_threshold = config['taxi']['threshold']
+    policy = db.get_reimburse_policy(selected_month)
     
     start_date, end_date = get_expense_month_range(selected_month)
     expense_month_str = f"{start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}" if start_date else "未知"
     
-    validated_records = []
-    for invoice in invoice_records:
-        validation = validate_taxi_invoice(invoice, checkin_records, selected_month)
-        validated_records.append({
-            'invoice': invoice,
-            'valid': validation['valid'],
-            'reason': validation['reason'],
-            'work_hours': validation['work_hours']
-        })
+    validation_report = validate_taxi_invoices(invoice_records, checkin_records, policy)
+    validated_records = validation_report.results
     
-    valid_count = sum(1 for r in validated_records if r['valid'])
-    valid_amount = sum(r['invoice']['amount'] for r in validated_records if r['valid'])
-    total_invoice_amount = sum(r['invoice']['amount'] for r in validated_records)
+    valid_count = len(validation_report.valid)
+    valid_amount = validation_report.valid_amount
+    total_invoice_amount = validation_report.total_amount
+    taxi_rule_lines = '\n'.join(f'    - 该日期{line}' for line in rules.describe_policy(policy, ('taxi',)))
     
     st.info(f"""
     **报销规则说明：**
     - 发票日期必须在费用月份范围内：{expense_month_str}
     - 发票日期必须有对应的打卡记录
-    - 该日期工作时长 ≥ {taxi_threshold} 小时
+{taxi_rule_lines}
     
     **校验结果：**
     - 发票总数：{len(invoice_records)} 张
@@ -486,20 +187,19 @@ with tab2:
         
         preview_data = []
         for record in validated_records:
-            invoice = record['invoice']
-            date_str = invoice['date'] if isinstance(invoice['date'], str) else invoice['date'].strftime('%Y-%m-%d')
+            invoice = record.invoice
             
             preview_data.append({
-                '日期': date_str,
-                '服务商': invoice.get('company', '未知'),
-                '起点': invoice.get('start_location', ''),
-                '终点': invoice.get('end_location', ''),
-                '金额': f"¥{invoice['amount']:.2f}",
-                '行程单': invoice.get('source_file', ''),
-                '发票单': invoice.get('invoice_file', ''),
-                '工作时长': f"{record['work_hours']:.1f}h" if record['work_hours'] > 0 else '-',
-                '状态': '✅' if record['valid'] else '❌',
-                '原因': record['reason']
+                '日期': invoice.date,
+                '服务商': invoice.company,
+                '起点': invoice.start_location,
+                '终点': invoice.end_location,
+                '金额': f"¥{invoice.amount:.2f}",
+                '行程单': invoice.source_file,
+                '发票单': invoice.invoice_file,
+                '工作时长': f"{record.work_hours:.1f}h" if record.work_hours > 0 else '-',
+                '状态': '✅' if record.valid else '❌',
+                '原因': record.reason
             })
         
         df_preview = pd.DataFrame(preview_data)
@@ -514,55 +214,48 @@ with tab2:
             
             with col_gen:
                 if st.button("📊 生成报销明细", type="primary", use_container_width=True, key='gen_taxi'):
-                    valid_records = [r for r in validated_records if r['valid']]
-                    excel_data, record_count, total_amount = generate_taxi_excel(valid_records, selected_month)
+                    valid_records = validation_report.valid
+                    result = exporter.export_taxi_excel(valid_records, selected_month, export_format)
                     
-                    st.session_state['taxi_excel'] = excel_data
-                    st.session_state['taxi_count'] = record_count
-                    st.session_state['taxi_amount'] = total_amount
+                    st.session_state['taxi_excel'] = result
                     st.session_state['taxi_validated_records'] = valid_records
                     
-                    st.success(f"生成成功！共 {record_count} 条记录，总金额 ¥{total_amount:.2f}")
+                    st.success(f"生成成功！共 {result.record_count} 条记录，总金额 ¥{result.total_amount:.2f}")
             
             with col_down:
-                if 'taxi_excel' in st.session_state:
-                    output_config = db.get_config('output') or {'default_name': '姓名'}
-                    default_name = output_config['default_name']
-                    month_num = selected_month[-2:]
-                    file_name = f"{default_name}_加班打车报销明细表_{month_num}月.xls"
+                if 'taxi_excel' in st.session_state and os.path.exists(st.session_state['taxi_excel'].path):
+                    file_name = exporter.report_file_name('taxi', selected_month, os.path.splitext(st.session_state['taxi_excel'].path)[1])
                     
                     st.download_button(
                         label="📥 下载明细表",
-                        data=st.session_state['taxi_excel'],
+                        data=archive.archive_reader(st.session_state['taxi_excel'].path),
                         file_name=file_name,
-                        mime="application/vnd.ms-excel",
+                        mime=exporter.excel_mime(st.session_state['taxi_excel'].path),
                         use_container_width=True,
                         key='download_taxi'
                     )
             
             with col_zip:
-                if 'taxi_excel' in st.session_state:
-                    output_config = db.get_config('output') or {'default_name': '姓名'}
-                    default_name = output_config['default_name']
-                    month_num = selected_month[-2:]
-                    file_name = f"{default_name}_加班打车报销明细表_{month_num}月.xls"
-                    zip_name = f"{default_name}_打车报销_{month_num}月.zip"
+                if 'taxi_excel' in st.session_state and os.path.exists(st.session_state['taxi_excel'].path):
+                    file_name = exporter.report_file_name('taxi', selected_month, os.path.splitext(st.session_state['taxi_excel'].path)[1])
+                    zip_name = exporter.bundle_file_name('taxi', selected_month)
                     
                     if st.button("📦 打包下载(含发票附件)", use_container_width=True, key='zip_taxi'):
-                        valid_records = st.session_state.get('taxi_validated_records', [r for r in validated_records if r['valid']])
-                        zip_data = create_taxi_zip(
+                        valid_records = st.session_state.get('taxi_validated_records', validation_report.valid)
+                        zip_result = exporter.export_taxi_zip(
                             st.session_state['taxi_excel'],
                             selected_month,
                             file_name,
-                            valid_records
+                            valid_records,
+                            os.path.join(UPLOADS_DIR, selected_month)
                         )
-                        st.session_state['taxi_zip'] = zip_data
+                        st.session_state['taxi_zip'] = zip_result.path
                         st.session_state['taxi_zip_name'] = zip_name
                     
-                    if 'taxi_zip' in st.session_state:
+                    if 'taxi_zip' in st.session_state and os.path.exists(st.session_state['taxi_zip']):
                         st.download_button(
                             label=f"📥 下载 {st.session_state['taxi_zip_name']}",
-                            data=st.session_state['taxi_zip'],
+                            data=archive.archive_reader(st.session_state['taxi_zip']),
                             file_name=st.session_state['taxi_zip_name'],
                             mime="application/zip",
                             use_container_width=True,
@@ -573,13 +266,64 @@ with tab2:
 
 st.markdown("---")
 
+st.markdown("### 📅 批量导出")
+
+sorted_months = sorted(month_folders)
+col_start, col_end, col_batch = st.columns([1, 1, 1])
+
+with col_start:
+    batch_start = st.selectbox("起始月份", options=sorted_months, index=0, key='batch_start')
+
+with col_end:
+    batch_end = st.selectbox("结束月份", options=sorted_months, index=len(sorted_months) - 1, key='batch_end')
+
+batch_months = [m for m in sorted_months if batch_start <= m <= batch_end]
+
+with col_batch:
+    st.markdown("&nbsp;")
+    if st.button(f"🗂️ 批量导出 {len(batch_months)} 个月", use_container_width=True, disabled=not batch_months, key='gen_batch'):
+        try:
+            with st.spinner("正在生成各月份报销明细与打包文件..."):
+                batch_result, month_exports = exporter.export_batch(batch_months, UPLOADS_DIR, export_format)
+        except ValueError as e:
+            st.session_state.pop('batch_zip', None)
+            st.warning(str(e))
+        else:
+            st.session_state['batch_zip'] = batch_result
+            st.session_state['batch_zip_name'] = f"{batch_months[0]}~{batch_months[-1]}_报销明细.zip"
+            st.session_state['batch_summary'] = pd.DataFrame([
+                {
+                    '月份': export.month_folder,
+                    '晚餐夜宵记录': export.night_meal.record_count if export.night_meal else 0,
+                    '晚餐夜宵金额': export.night_meal.total_amount if export.night_meal else 0.0,
+                    '打车记录': export.taxi.record_count if export.taxi else 0,
+                    '打车金额': export.taxi.total_amount if export.taxi else 0.0
+                }
+                for export in month_exports
+            ])
+
+if 'batch_zip' in st.session_state and os.path.exists(st.session_state['batch_zip'].path):
+    batch_result = st.session_state['batch_zip']
+    st.success(f"批量导出完成！共 {batch_result.record_count} 条记录，总金额 ¥{batch_result.total_amount:.2f}")
+    st.dataframe(st.session_state['batch_summary'], use_container_width=True, hide_index=True)
+    st.download_button(
+        label=f"📥 下载 {st.session_state['batch_zip_name']}",
+        data=archive.archive_reader(batch_result.path),
+        file_name=st.session_state['batch_zip_name'],
+        mime="application/zip",
+        use_container_width=True,
+        key='download_batch_zip'
+    )
+
+st.markdown("---")
+
 st.markdown("### 📋 导出历史")
 
-export_history = db.get_export_history(10)
+df_history = db.get_export_history_dataframe(10)
 
-if export_history:
-    df_history = pd.DataFrame(export_history)
-    df_history['created_at'] = pd.to_datetime(df_history['created_at']).dt.strftime('%Y-%m-%d %H:%M')
+if not df_history.empty:
+    df_history['created_at'] = df_history['created_at'].dt.strftime('%Y-%m-%d %H:%M')
+    df_history['file_path'] = df_history['file_path'].map(os.path.basename)
     df_history = df_history[['month_folder', 'export_type', 'file_path', 'record_count', 'total_amount', 'created_at']]
     df_history.columns = ['月份', '类型', '文件名', '记录数', '总金额', '导出时间']
     
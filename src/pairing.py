@@ -0,0 +1,179 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+ITINERARY = 'itinerary'
+INVOICE = 'invoice'
+
+ROLE_MARKS = (
+    (ITINERARY, ('出行行程报销单', '电子行程单', '行程报销单', '行程单')),
+    (INVOICE, ('电子发票', '发票'))
+)
+PAIRABLE_EXTENSIONS = ('.pdf', '.ofd')
+
+NAME = 'name'
+ORDER_NUMBER = 'order_number'
+AMOUNT_DATE = 'amount_date'
+AMOUNT = 'amount'
+
+_SEPARATORS = re.compile(r'[\s_\-—.·,，、]+')
+
+class Pair(NamedTuple):
+    itinerary: str
+    invoice: str
+    method: str
+
+class PairingReport(NamedTuple):
+    pairs: List[Pair]
+    unmatched_itineraries: List[str]
+    unmatched_invoices: List[str]
+    ignored: List[str]
+    suggestions: List[Pair]
+
+    def as_import_pairs(self) -> Dict[str, Dict[str, str]]:
+        result = {pair.itinerary: {'itinerary': pair.itinerary, 'invoice': pair.invoice} for pair in self.pairs}
+        result.update((name, {'itinerary': name}) for name in self.unmatched_itineraries)
+        result.update((name, {'invoice': name}) for name in self.unmatched_invoices)
+        return result
+
+    def summary(self) -> Dict[str, int]:
+        counts = {method: 0 for method in (NAME, ORDER_NUMBER, AMOUNT_DATE)}
+        for pair in self.pairs:
+            counts[pair.method] += 1
+        counts['suggestions'] = len(self.suggestions)
+        counts['unmatched_itineraries'] = len(self.unmatched_itineraries)
+        counts['unmatched_invoices'] = len(self.unmatched_invoices)
+        return counts
+
+class _Facts(NamedTuple):
+    order_number: Optional[str]
+    amount: Optional[float]
+    date: Optional[str]
+
+def file_role(file_name: str) -> Optional[str]:
+    if not file_name.lower().endswith(PAIRABLE_EXTENSIONS):
+        return None
+    for role, marks in ROLE_MARKS:
+        if any(mark in file_name for mark in marks):
+            return role
+    return None
+
+def pairing_key(file_name: str) -> str:
+    stem = unicodedata.normalize('NFKC', os.path.splitext(file_name)[0]).lower()
+    for _, marks in ROLE_MARKS:
+        for mark in marks:
+            stem = stem.replace(mark, '')
+    return _SEPARATORS.sub('', stem)
+
+def _facts(record: Optional[Dict]) -> _Facts:
+    if not record:
+        return _Facts(None, None, None)
+    amount = record.get('amount') or None
+    date = record.get('date')
+    if hasattr(date, 'strftime'):
+        date = date.strftime('%Y-%m-%d')
+    return _Facts(record.get('order_number') or None, round(float(amount), 2) if amount else None, date or None)
+
+_CONTENT_TIERS = (
+    (ORDER_NUMBER, lambda f: f.order_number),
+    (AMOUNT_DATE, lambda f: (f.amount, f.date) if f.amount and f.date else None)
+)
+_SUGGESTION_TIER = (AMOUNT, lambda f: f.amount)
+
+class PairingIndex:
+    def __init__(self, file_names: Iterable[str]):
+        self.itineraries = defaultdict(list)
+        self.invoices = defaultdict(list)
+        self.ignored = []
+        for file_name in sorted(file_names):
+            role = file_role(file_name)
+            if role == ITINERARY:
+                self.itineraries[pairing_key(file_name)].append(file_name)
+            elif role == INVOICE:
+                self.invoices[pairing_key(file_name)].append(file_name)
+            else:
+                self.ignored.append(file_name)
+
+    def match(self, file_name: str) -> Optional[str]:
+        key = pairing_key(file_name)
+        if file_role(file_name) == INVOICE:
+            candidates = self.itineraries.get(key, [])
+        else:
+            candidates = self.invoices.get(key, [])
+        return candidates[0] if candidates else None
+
+    def report(self, content: Optional[Callable[[str], Optional[Dict]]] = None) -> PairingReport:
+        pairs = []
+        suggestions = []
+        itineraries = []
+        invoices = []
+        for key, names in self.itineraries.items():
+            counterparts = self.invoices.get(key, [])
+            pairs.extend(Pair(itinerary, invoice, NAME) for itinerary, invoice in zip(names, counterparts))
+            itineraries.extend(names[len(counterparts):])
+        for key, names in self.invoices.items():
+            invoices.extend(names[len(self.itineraries.get(key, [])):])
+
+        if content is not None and itineraries and invoices:
+            matched, suggestions = _match_by_content(itineraries, invoices, content)
+            pairs.extend(matched)
+            paired = {pair.itinerary for pair in matched} | {pair.invoice for pair in matched}
+            itineraries = [name for name in itineraries if name not in paired]
+            invoices = [name for name in invoices if name not in paired]
+
+        return PairingReport(sorted(pairs), sorted(itineraries), sorted(invoices), list(self.ignored), sorted(suggestions))
+
+def _match_by_content(itineraries: List[str], invoices: List[str],
+                      content: Callable[[str], Optional[Dict]]) -> Tuple[List[Pair], List[Pair]]:
+    facts = {name: _facts(content(name)) for name in itineraries + invoices}
+    itineraries = list(itineraries)
+    invoices = list(invoices)
+    pairs = []
+
+    for method, key_of in _CONTENT_TIERS:
+        left = _unique_by(itineraries, facts, key_of)
+        right = _unique_by(invoices, facts, key_of)
+        for key in left.keys() & right.keys():
+            pairs.append(Pair(left[key], right[key], method))
+            itineraries.remove(left[key])
+            invoices.remove(right[key])
+
+    # Invoices carry the issue date rather than the trip date, so an amount-only match is
+    # too weak to import; it is only reported for someone to confirm by hand.
+    method, key_of = _SUGGESTION_TIER
+    left = _unique_by(itineraries, facts, key_of)
+    right = _unique_by(invoices, facts, key_of)
+    suggestions = [Pair(left[key], right[key], method) for key in left.keys() & right.keys()]
+
+    return pairs, suggestions
+
+def _unique_by(names: List[str], facts: Dict[str, _Facts], key_of) -> Dict:
+    groups = defaultdict(list)
+    for name in names:
+        key = key_of(facts[name])
+        if key:
+            groups[key].append(name)
+    return {key: group[0] for key, group in groups.items() if len(group) == 1}
+
+_directory_indexes = {}
+_directory_lock = threading.Lock()
+
+def directory_index(path: str) -> PairingIndex:
+    path = os.path.abspath(path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return PairingIndex(())
+
+    with _directory_lock:
+        cached = _directory_indexes.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+    index = PairingIndex(entry.name for entry in os.scandir(path) if entry.is_file())
+    with _directory_lock:
+        _directory_indexes[path] = (mtime_ns, index)
+    return index
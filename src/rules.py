@@ -0,0 +1,259 @@
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Dict, Any, List, Optional
+import numpy as np
+from work_calendar import WorkCalendar
+
+DEFAULT_REIMBURSE_RULES = {
+    'night_meal': {
+        'dinner_threshold': 9.5,
+        'dinner_amount': 18,
+        'night_threshold': 12,
+        'night_amount': 20
+    },
+    'taxi': {
+        'threshold': 11.0
+    }
+}
+
+REIMBURSE_TYPES = ('dinner', 'night', 'taxi')
+DAY_TYPES = ('workday', 'weekend', 'holiday')
+
+REIMBURSE_TYPE_NAMES = {'dinner': '晚餐报销', 'night': '夜宵报销', 'taxi': '打车报销'}
+DAY_TYPE_NAMES = {'workday': '工作日', 'weekend': '周末', 'holiday': '节假日'}
+
+_compiled_cache = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+COMPILED_CACHE_SIZE = 64
+
+_default_calendar = WorkCalendar()
+
+class Eligibility(NamedTuple):
+    work_hours: np.ndarray
+    dinner: np.ndarray
+    night: np.ndarray
+    taxi: np.ndarray
+    dinner_amount: np.ndarray
+    night_amount: np.ndarray
+    dinner_threshold: np.ndarray
+    night_threshold: np.ndarray
+    taxi_threshold: np.ndarray
+
+    def mask(self, reimburse_type: str) -> np.ndarray:
+        return getattr(self, reimburse_type)
+
+    def thresholds(self, reimburse_type: str) -> np.ndarray:
+        return getattr(self, f'{reimburse_type}_threshold')
+
+    def reason(self, index: int, reimburse_type: str) -> str:
+        return _format_reason(self.work_hours[index].item(), self.thresholds(reimburse_type)[index].item(),
+                              bool(self.mask(reimburse_type)[index]))
+
+    def reasons(self, reimburse_type: str) -> List[str]:
+        return [_format_reason(hours, threshold, eligible)
+                for hours, threshold, eligible in zip(self.work_hours.tolist(),
+                                                      self.thresholds(reimburse_type).tolist(),
+                                                      self.mask(reimburse_type).tolist())]
+
+    @property
+    def total_dinner(self) -> float:
+        return float(self.dinner_amount.sum())
+
+    @property
+    def total_night(self) -> float:
+        return float(self.night_amount.sum())
+
+class _Tier(NamedTuple):
+    threshold: float
+    amount: float
+    day_mask: np.ndarray
+
+class CompiledPolicy:
+    __slots__ = ('digest', 'policy', 'tiers', 'multipliers', 'calendar', 'needs_calendar',
+                 'taxi_cap_default', 'taxi_cap_cities', 'taxi_cap_pattern')
+
+    def __init__(self, policy: Dict[str, Any], digest: str):
+        self.digest = digest
+        self.policy = policy
+        self.tiers = {kind: [_compile_tier(kind, tier) for tier in policy.get(kind) or []] for kind in REIMBURSE_TYPES}
+
+        multipliers = policy.get('multipliers') or {}
+        for day_type in multipliers:
+            if day_type not in DAY_TYPES:
+                raise ValueError(f'未知日期类型: {day_type}')
+        self.multipliers = np.array([float(multipliers.get(day_type, 1.0)) for day_type in DAY_TYPES])
+
+        self.needs_calendar = bool((self.multipliers != 1.0).any()) or any(
+            not tier.day_mask.all() for tiers in self.tiers.values() for tier in tiers
+        )
+
+        holidays = policy.get('holidays') or []
+        workdays = policy.get('workdays') or []
+        try:
+            self.calendar = WorkCalendar(holidays, workdays) if holidays or workdays else _default_calendar
+        except ValueError:
+            raise ValueError('节假日及调休日期格式应为 YYYY-MM-DD')
+
+        taxi_caps = policy.get('taxi_caps') or {}
+        default_cap = taxi_caps.get('default')
+        self.taxi_cap_default = float(default_cap) if default_cap is not None else np.inf
+        self.taxi_cap_cities = {city: float(cap) for city, cap in (taxi_caps.get('cities') or {}).items()}
+        self.taxi_cap_pattern = re.compile('|'.join(map(re.escape, self.taxi_cap_cities))) if self.taxi_cap_cities else None
+
+    def day_types(self, dates, count: int) -> Optional[np.ndarray]:
+        if not self.needs_calendar:
+            return None
+        if dates is None:
+            return np.zeros(count, dtype=np.int8)
+
+        return self.calendar.day_types(dates)
+
+    def evaluate(self, work_hours, dates=None) -> Eligibility:
+        hours = np.asarray(work_hours, dtype=np.float64)
+        day_codes = self.day_types(dates, len(hours))
+
+        dinner, dinner_amount, dinner_threshold = _apply_tiers(self.tiers['dinner'], hours, day_codes)
+        night, night_amount, night_threshold = _apply_tiers(self.tiers['night'], hours, day_codes)
+        taxi, _, taxi_threshold = _apply_tiers(self.tiers['taxi'], hours, day_codes, with_amount=False)
+
+        if day_codes is not None:
+            multipliers = self.multipliers[day_codes]
+            dinner_amount = dinner_amount * multipliers
+            night_amount = night_amount * multipliers
+
+        return Eligibility(
+            work_hours=hours,
+            dinner=dinner,
+            night=night,
+            taxi=taxi,
+            dinner_amount=dinner_amount,
+            night_amount=night_amount,
+            dinner_threshold=dinner_threshold,
+            night_threshold=night_threshold,
+            taxi_threshold=taxi_threshold
+        )
+
+    def taxi_caps(self, locations: List[str]) -> np.ndarray:
+        if self.taxi_cap_pattern is None:
+            return np.full(len(locations), self.taxi_cap_default)
+
+        caps = []
+        for location in locations:
+            match = self.taxi_cap_pattern.search(location or '')
+            caps.append(self.taxi_cap_cities[match.group(0)] if match else self.taxi_cap_default)
+        return np.array(caps, dtype=np.float64)
+
+def _format_reason(work_hours: float, threshold: float, eligible: bool) -> str:
+    if threshold != threshold:
+        return f'工作时长{work_hours}小时，当日无适用规则'
+    if eligible:
+        return f'工作时长{work_hours}小时，超过{threshold}小时阈值'
+    return f'工作时长{work_hours}小时，未达到{threshold}小时阈值'
+
+def _compile_tier(kind: str, tier: Dict[str, Any]) -> _Tier:
+    if 'threshold' not in tier:
+        raise ValueError(f'{kind} 规则缺少 threshold')
+
+    days = tier.get('days')
+    if days:
+        unknown = [d for d in days if d not in DAY_TYPES]
+        if unknown:
+            raise ValueError(f"未知日期类型: {', '.join(unknown)}")
+        day_mask = np.array([day_type in days for day_type in DAY_TYPES])
+    else:
+        day_mask = np.ones(len(DAY_TYPES), dtype=bool)
+
+    return _Tier(float(tier['threshold']), float(tier.get('amount', 0)), day_mask)
+
+def _apply_tiers(tiers: List[_Tier], hours: np.ndarray, day_codes: Optional[np.ndarray], with_amount: bool = True):
+    count = len(hours)
+    if not tiers:
+        return np.zeros(count, dtype=bool), np.zeros(count), np.broadcast_to(np.nan, count)
+
+    if len(tiers) == 1 and tiers[0].day_mask.all():
+        tier = tiers[0]
+        eligible = hours >= tier.threshold
+        amount = np.where(eligible, tier.amount, 0.0) if with_amount else None
+        return eligible, amount, np.broadcast_to(tier.threshold, count)
+
+    eligible = np.zeros(count, dtype=bool)
+    amount = np.zeros(count, dtype=np.float64)
+    matched_threshold = np.full(count, np.nan)
+    lowest_threshold = np.full(count, np.nan)
+
+    for tier in tiers:
+        hit = hours >= tier.threshold
+        if tier.day_mask.all():
+            lowest_threshold = np.fmin(lowest_threshold, tier.threshold)
+        else:
+            applies = tier.day_mask[day_codes]
+            hit &= applies
+            lowest_threshold = np.where(applies, np.fmin(lowest_threshold, tier.threshold), lowest_threshold)
+        hit &= ~eligible
+        eligible |= hit
+        amount[hit] = tier.amount
+        matched_threshold[hit] = tier.threshold
+
+    return eligible, amount, np.where(eligible, matched_threshold, lowest_threshold)
+
+def policy_from_rules(rules: Dict[str, Any]) -> Dict[str, Any]:
+    night_meal = rules['night_meal']
+    return {
+        'dinner': [{'threshold': night_meal['dinner_threshold'], 'amount': night_meal['dinner_amount']}],
+        'night': [{'threshold': night_meal['night_threshold'], 'amount': night_meal['night_amount']}],
+        'taxi': [{'threshold': rules['taxi']['threshold']}]
+    }
+
+def describe_policy(policy: Dict[str, Any], kinds=REIMBURSE_TYPES) -> List[str]:
+    compiled = compile_policy(policy)
+    lines = []
+    for kind in kinds:
+        for tier in compiled.policy.get(kind) or []:
+            line = f"{REIMBURSE_TYPE_NAMES[kind]}：工作时长 ≥ {tier['threshold']} 小时"
+            if kind != 'taxi':
+                line += f"，金额 ¥{tier.get('amount', 0)}"
+            if tier.get('days'):
+                line += f"（仅{'/'.join(DAY_TYPE_NAMES[d] for d in tier['days'])}）"
+            lines.append(line)
+
+    if 'dinner' in kinds or 'night' in kinds:
+        for day_type, multiplier in (compiled.policy.get('multipliers') or {}).items():
+            if multiplier != 1:
+                lines.append(f"{DAY_TYPE_NAMES[day_type]}餐补金额 × {multiplier}")
+
+    if 'taxi' in kinds:
+        if compiled.taxi_cap_cities:
+            caps = '，'.join(f'{city} ¥{cap:g}' for city, cap in compiled.taxi_cap_cities.items())
+            lines.append(f"打车单次限额：{caps}")
+        if compiled.taxi_cap_default != np.inf:
+            lines.append(f"打车单次默认限额：¥{compiled.taxi_cap_default:g}")
+    return lines
+
+def policy_digest(policy: Dict[str, Any]) -> str:
+    canonical = json.dumps(policy, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def compile_policy(policy: Dict[str, Any]) -> CompiledPolicy:
+    if not isinstance(policy, dict):
+        raise ValueError('报销规则应为 JSON 对象')
+    if 'night_meal' in policy:
+        policy = policy_from_rules(policy)
+
+    digest = policy_digest(policy)
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(digest)
+        if compiled is not None:
+            _compiled_cache.move_to_end(digest)
+    if compiled is None:
+        compiled = CompiledPolicy(policy, digest)
+        with _compiled_cache_lock:
+            _compiled_cache[digest] = compiled
+            while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+                _compiled_cache.popitem(last=False)
+    return compiled
+
+def evaluate(work_hours, rules: Optional[Dict[str, Any]] = None, dates=None) -> Eligibility:
+    return compile_policy(rules or DEFAULT_REIMBURSE_RULES).evaluate(work_hours, dates)
@@ -0,0 +1,161 @@
+import copy
+from typing import Dict, Any, Callable, Iterable, List, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+import rules
+from models import CheckinRecord, InvoiceRecord
+from validation import validate_taxi_invoices
+
+_MONTH_STRIDE = 100.0
+_MATCH_ALL_POLICY = {'taxi': [{'threshold': 0}]}
+
+class _MonthRows(NamedTuple):
+    policy: Dict[str, Any]
+    checkin_hours: np.ndarray
+    checkin_dates: List[str]
+    taxi_hours: np.ndarray
+    taxi_dates: List[str]
+    taxi_amounts: np.ndarray
+    taxi_locations: List[str]
+
+def _normalize(policy: Dict[str, Any]) -> Dict[str, Any]:
+    return rules.policy_from_rules(policy) if 'night_meal' in policy else policy
+
+def _base_position(tiers: List[Dict[str, Any]]) -> Optional[int]:
+    for i, tier in enumerate(tiers):
+        if not tier.get('days'):
+            return i
+    return 0 if tiers else None
+
+def base_tier(policy: Dict[str, Any], reimburse_type: str) -> Dict[str, Any]:
+    tiers = _normalize(policy).get(reimburse_type) or []
+    position = _base_position(tiers)
+    return tiers[position] if position is not None else {}
+
+def override_policy(policy: Dict[str, Any], overrides: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    policy = copy.deepcopy(_normalize(policy))
+    for reimburse_type, override in overrides.items():
+        if not override:
+            continue
+        tiers = policy.get(reimburse_type) or []
+        position = _base_position(tiers)
+        if position is None:
+            tiers = [dict(override)]
+        else:
+            tiers[position] = dict(tiers[position], **override)
+        policy[reimburse_type] = tiers
+    return policy
+
+class PayoutIndex:
+    def __init__(self, checkins: Iterable[CheckinRecord], invoices: Iterable[InvoiceRecord],
+                 policy_for: Callable[[str], Dict[str, Any]]):
+        checkins = list(checkins)
+        matched = validate_taxi_invoices(list(invoices), checkins, _MATCH_ALL_POLICY).valid
+
+        self.months = np.array(sorted({c.month_folder for c in checkins} | {r.invoice.month_folder for r in matched}), dtype=object)
+        checkins_by_month = {month: [] for month in self.months}
+        for checkin in checkins:
+            checkins_by_month[checkin.month_folder].append(checkin)
+        taxi_by_month = {month: [] for month in self.months}
+        for result in matched:
+            taxi_by_month[result.invoice.month_folder].append(result)
+
+        self._rows = []
+        multipliers = []
+        taxi_weights = []
+        for month in self.months.tolist():
+            month_checkins = checkins_by_month[month]
+            month_taxi = taxi_by_month[month]
+            rows = _MonthRows(
+                policy=policy_for(month),
+                checkin_hours=np.array([c.work_hours for c in month_checkins], dtype=np.float64),
+                checkin_dates=[c.date for c in month_checkins],
+                taxi_hours=np.array([r.work_hours for r in month_taxi], dtype=np.float64),
+                taxi_dates=[r.invoice.date for r in month_taxi],
+                taxi_amounts=np.array([r.invoice.amount or 0 for r in month_taxi], dtype=np.float64),
+                taxi_locations=[f'{r.invoice.start_location or ""} {r.invoice.end_location or ""}' for r in month_taxi]
+            )
+            self._rows.append(rows)
+
+            compiled = rules.compile_policy(rows.policy)
+            day_codes = compiled.day_types(rows.checkin_dates, len(rows.checkin_dates))
+            multipliers.append(compiled.multipliers[day_codes] if day_codes is not None else np.ones(len(rows.checkin_dates)))
+            taxi_weights.append(np.minimum(rows.taxi_amounts, compiled.taxi_caps(rows.taxi_locations)))
+
+        codes = np.arange(len(self.months))
+        self._checkin_keys, self._checkin_offsets, checkin_order = self._build_keys(
+            np.repeat(codes, [len(r.checkin_hours) for r in self._rows]), [r.checkin_hours for r in self._rows]
+        )
+        self._multiplier_cumsum = self._cumsum(multipliers, checkin_order)
+
+        self._taxi_keys, self._taxi_offsets, taxi_order = self._build_keys(
+            np.repeat(codes, [len(r.taxi_hours) for r in self._rows]), [r.taxi_hours for r in self._rows]
+        )
+        self._taxi_cumsum = self._cumsum(taxi_weights, taxi_order)
+
+    def _build_keys(self, codes: np.ndarray, hours: List[np.ndarray]):
+        codes = np.asarray(codes, dtype=np.int64)
+        hours = np.concatenate(hours) if hours else np.zeros(0)
+        order = np.lexsort((hours, codes))
+        keys = codes[order] * _MONTH_STRIDE + hours[order]
+        offsets = np.searchsorted(codes[order], np.arange(len(self.months) + 1))
+        return keys, offsets, order
+
+    @staticmethod
+    def _cumsum(weights: List[np.ndarray], order: np.ndarray) -> np.ndarray:
+        weights = np.concatenate(weights) if weights else np.zeros(0)
+        return np.concatenate(([0.0], np.cumsum(weights[order])))
+
+    def _positions(self, keys: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+        month_base = np.arange(len(self.months))[:, None] * _MONTH_STRIDE
+        thresholds = np.clip(thresholds, 0, _MONTH_STRIDE - 1)
+        return np.searchsorted(keys, month_base + thresholds[None, :], side='left')
+
+    def checkin_counts(self, thresholds) -> np.ndarray:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        ends = self._checkin_offsets[1:, None]
+        return ends - self._positions(self._checkin_keys, thresholds)
+
+    def multiplier_sums(self, thresholds) -> np.ndarray:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        ends = self._checkin_offsets[1:, None]
+        return self._multiplier_cumsum[ends] - self._multiplier_cumsum[self._positions(self._checkin_keys, thresholds)]
+
+    def taxi_counts(self, thresholds) -> np.ndarray:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        ends = self._taxi_offsets[1:, None]
+        return ends - self._positions(self._taxi_keys, thresholds)
+
+    def taxi_amounts(self, thresholds) -> np.ndarray:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        ends = self._taxi_offsets[1:, None]
+        return self._taxi_cumsum[ends] - self._taxi_cumsum[self._positions(self._taxi_keys, thresholds)]
+
+    def simulate(self, candidates: Dict[str, Dict[str, Dict[str, float]]]) -> pd.DataFrame:
+        records = []
+        for month, rows in zip(self.months.tolist(), self._rows):
+            for name, overrides in candidates.items():
+                compiled = rules.compile_policy(override_policy(rows.policy, overrides))
+                meals = compiled.evaluate(rows.checkin_hours, rows.checkin_dates)
+                taxi = compiled.evaluate(rows.taxi_hours, rows.taxi_dates).taxi
+                taxi_amounts = np.minimum(rows.taxi_amounts, compiled.taxi_caps(rows.taxi_locations))
+                records.append((
+                    month, name, int(meals.dinner.sum()), int(meals.night.sum()),
+                    meals.total_dinner, meals.total_night, float(taxi_amounts[taxi].sum())
+                ))
+
+        result = pd.DataFrame(records, columns=['month_folder', 'candidate', 'dinner_count', 'night_count',
+                                                'dinner_amount', 'night_amount', 'taxi_amount'])
+        if not result.empty:
+            result['total'] = result['dinner_amount'] + result['night_amount'] + result['taxi_amount']
+        return result
+
+    def sweep(self, reimburse_type: str, thresholds, amount: float = 0.0) -> pd.DataFrame:
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        if reimburse_type == 'taxi':
+            totals = self.taxi_amounts(thresholds).sum(axis=0)
+            counts = self.taxi_counts(thresholds).sum(axis=0)
+        else:
+            counts = self.checkin_counts(thresholds).sum(axis=0)
+            totals = self.multiplier_sums(thresholds).sum(axis=0) * float(amount)
+        return pd.DataFrame({'threshold': thresholds, 'count': counts, 'total': totals})
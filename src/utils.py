@@ -6,6 +6,7 @@ import tempfile
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import database as db
+import pairing
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
@@ -121,6 +122,10 @@ def extract_date_from_text(text: str) -> Optional[datetime]:
     
     return None
 
+def extract_order_number_from_text(text: str) -> Optional[str]:
+    match = re.search(r'(?:订单号|订单编号|行程单号|流水号)[:：]?\s*([A-Za-z0-9]{8,})', text)
+    return match.group(1) if match else None
+
 def extract_company_from_text(text: str, file_name: str) -> str:
     company_match = re.search(r'【([^】]*)】', file_name)
     if company_match:
@@ -177,7 +182,8 @@ def extract_taxi_locations_from_text(text: str) -> Tuple[str, str]:
     
     return "", ""
 
-def parse_taxi_pdf(file_path: str) -> Optional[Dict]:
+def parse_taxi_pdf(file_path, file_name: Optional[str] = None) -> Optional[Dict]:
+    file_name = file_name or os.path.basename(file_path)
     try:
         with pdfplumber.open(file_path) as pdf:
             full_text = ""
@@ -196,7 +202,8 @@ def parse_taxi_pdf(file_path: str) -> Optional[Dict]:
             
             amount = extract_amount_from_text(full_text)
             date = extract_date_from_text(full_text)
-            company = extract_company_from_text(full_text, os.path.basename(file_path))
+            company = extract_company_from_text(full_text, file_name)
+            order_number = extract_order_number_from_text(full_text)
             
             start_location, end_location = extract_taxi_locations_from_text(full_text)
             
@@ -211,7 +218,8 @@ def parse_taxi_pdf(file_path: str) -> Optional[Dict]:
                 'start_location': start_location,
                 'end_location': end_location,
                 'company': company,
-                'source_file': os.path.basename(file_path)
+                'order_number': order_number,
+                'source_file': file_name
             }
     except Exception as e:
         return None
@@ -227,43 +235,12 @@ def generate_month_folder_name(date: Optional[datetime] = None) -> str:
     
     return f"{year_short}_{month}"
 
-def check_reimburse_eligibility(work_hours: float, reimburse_type: str) -> Tuple[bool, float, str]:
-    config = db.get_config('reimburse_rules')
-    
-    if not config:
-        config = {
-            'night_meal': {
-                'dinner_threshold': 9.5,
-                'dinner_amount': 18,
-                'night_threshold': 12,
-                'night_amount': 20
-            },
-            'taxi': {
-                'threshold': 11.0
-            }
-        }
-    
-    if reimburse_type == 'dinner':
-        threshold = config['night_meal']['dinner_threshold']
-        amount = config['night_meal']['dinner_amount']
-        if work_hours >= threshold:
-            return True, amount, f'工作时长{work_hours}小时，超过{threshold}小时阈值'
-        return False, 0, f'工作时长{work_hours}小时，未达到{threshold}小时阈值'
-    
-    elif reimburse_type == 'night':
-        threshold = config['night_meal']['night_threshold']
-        amount = config['night_meal']['night_amount']
-        if work_hours >= threshold:
-            return True, amount, f'工作时长{work_hours}小时，超过{threshold}小时阈值'
-        return False, 0, f'工作时长{work_hours}小时，未达到{threshold}小时阈值'
-    
-    elif reimburse_type == 'taxi':
-        threshold = config['taxi']['threshold']
-        if work_hours > threshold:
-            return True, 0, f'工作时长{work_hours}小时，超过{threshold}小时阈值'
-        return False, 0, f'工作时长{work_hours}小时，未达到{threshold}小时阈值'
-    
-    return False, 0, '未知报销类型'
+def format_rule_version(valid_from: Optional[str]) -> str:
+    if valid_from is None:
+        return '当前规则'
+    if valid_from == db.INITIAL_RULE_VERSION:
+        return '初始规则'
+    return f'{valid_from} 起'
 
 def format_date(date_str: str) -> str:
     try:
@@ -274,16 +251,6 @@ def format_date(date_str: str) -> str:
         pass
     return date_str
 
-def get_weekday_name(date_str: str) -> str:
-    try:
-        if isinstance(date_str, str):
-            dt = datetime.strptime(date_str, '%Y-%m-%d')
-            weekday_map = {0: '星期一', 1: '星期二', 2: '星期三', 3: '星期四', 4: '星期五', 5: '星期六', 6: '星期日'}
-            return weekday_map[dt.weekday()]
-    except:
-        pass
-    return ""
-
 def save_uploaded_file(uploaded_file, target_dir: str) -> str:
     os.makedirs(target_dir, exist_ok=True)
     
@@ -299,43 +266,9 @@ def validate_month_folder_name(name: str) -> bool:
     return bool(re.match(pattern, name))
 
 def find_matching_invoice(itinerary_path: str, invoice_folder: str) -> Optional[str]:
-    base_name = os.path.basename(itinerary_path)
-    name_without_ext = os.path.splitext(base_name)[0]
-    
-    if '行程单' in name_without_ext:
-        invoice_name = name_without_ext.replace('行程单', '发票')
-    else:
-        invoice_name = name_without_ext
-    
-    possible_names = [
-        f"{invoice_name}.pdf",
-        f"{invoice_name}.PDF",
-    ]
-    
-    for inv_name in possible_names:
-        potential_path = os.path.join(invoice_folder, inv_name)
-        if os.path.exists(potential_path):
-            return potential_path
-    
-    return None
+    invoice_name = pairing.directory_index(invoice_folder).match(os.path.basename(itinerary_path))
+    return os.path.join(invoice_folder, invoice_name) if invoice_name else None
 
 def find_matching_itinerary(invoice_path: str, invoice_folder: str) -> Optional[str]:
-    base_name = os.path.basename(invoice_path)
-    name_without_ext = os.path.splitext(base_name)[0]
-    
-    if '发票' in name_without_ext:
-        itinerary_name = name_without_ext.replace('发票', '行程单')
-    else:
-        itinerary_name = name_without_ext
-    
-    possible_names = [
-        f"{itinerary_name}.pdf",
-        f"{itinerary_name}.PDF",
-    ]
-    
-    for itin_name in possible_names:
-        potential_path = os.path.join(invoice_folder, itin_name)
-        if os.path.exists(potential_path):
-            return potential_path
-    
-    return None
+    itinerary_name = pairing.directory_index(invoice_folder).match(os.path.basename(invoice_path))
+    return os.path.join(invoice_folder, itinerary_name) if itinerary_name else None
@@ -0,0 +1,97 @@
+from datetime import date
+from typing import NamedTuple, List, Dict, Optional, Tuple, Any, Iterable
+import rules
+from work_calendar import get_expense_month_range
+from models import CheckinRecord, InvoiceRecord, ValidationResult
+
+class ValidationReport(NamedTuple):
+    results: List[ValidationResult]
+
+    @property
+    def valid(self) -> List[ValidationResult]:
+        return [r for r in self.results if r.valid]
+
+    @property
+    def invalid(self) -> List[ValidationResult]:
+        return [r for r in self.results if not r.valid]
+
+    @property
+    def valid_amount(self) -> float:
+        return sum(r.reimburse_amount for r in self.results if r.valid)
+
+    @property
+    def total_amount(self) -> float:
+        return sum(r.invoice.amount for r in self.results)
+
+def _parse_date(value: str, cache: Dict[str, Optional[date]]) -> Optional[date]:
+    if value not in cache:
+        try:
+            cache[value] = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            cache[value] = None
+    return cache[value]
+
+def index_checkins(checkins: Iterable[CheckinRecord], date_cache: Optional[Dict] = None) -> Dict[Tuple[str, date], CheckinRecord]:
+    date_cache = {} if date_cache is None else date_cache
+    index = {}
+    for checkin in checkins:
+        checkin_date = _parse_date(checkin.date, date_cache)
+        if checkin_date is not None:
+            index.setdefault((checkin.month_folder, checkin_date), checkin)
+    return index
+
+def validate_taxi_invoices(invoices: List[InvoiceRecord], checkins: Iterable[CheckinRecord],
+                           rules_config: Optional[Dict[str, Any]] = None) -> ValidationReport:
+    date_cache = {}
+    checkin_index = index_checkins(checkins, date_cache)
+    month_ranges = {}
+
+    results = [None] * len(invoices)
+    matched = []
+
+    for i, invoice in enumerate(invoices):
+        month_folder = invoice.month_folder
+        if month_folder not in month_ranges:
+            month_ranges[month_folder] = get_expense_month_range(month_folder)
+        start_date, end_date = month_ranges[month_folder]
+
+        if not start_date or not end_date:
+            results[i] = ValidationResult(invoice, False, '无法确定费用月份范围', 0)
+            continue
+
+        invoice_date = _parse_date(invoice.date, date_cache)
+        if invoice_date is None:
+            results[i] = ValidationResult(invoice, False, '发票日期格式错误', 0)
+            continue
+
+        if invoice_date < start_date or invoice_date > end_date:
+            results[i] = ValidationResult(invoice, False, f'日期不在费用月份范围内({start_date.strftime("%Y-%m-%d")}~{end_date.strftime("%Y-%m-%d")})', 0)
+            continue
+
+        checkin = checkin_index.get((month_folder, invoice_date))
+        if checkin is None:
+            results[i] = ValidationResult(invoice, False, '无对应打卡记录', 0)
+            continue
+
+        matched.append((i, checkin.work_hours, invoice_date))
+
+    if matched:
+        policy = rules.compile_policy(rules_config or rules.DEFAULT_REIMBURSE_RULES)
+        eligibility = policy.evaluate([hours for _, hours, _ in matched], [d for _, _, d in matched])
+        caps = policy.taxi_caps([f'{invoices[i].start_location or ""} {invoices[i].end_location or ""}' for i, _, _ in matched])
+
+        for (i, work_hours, _), eligible, threshold, cap in zip(matched, eligibility.taxi.tolist(),
+                                                                 eligibility.taxi_threshold.tolist(), caps.tolist()):
+            invoice = invoices[i]
+            if eligible:
+                reimburse_amount = min(invoice.amount or 0, cap)
+                reason = f'工作时长{work_hours}h，符合条件'
+                if reimburse_amount < (invoice.amount or 0):
+                    reason += f'，按限额¥{cap:g}报销'
+                results[i] = ValidationResult(invoice, True, reason, work_hours, reimburse_amount)
+            elif threshold != threshold:
+                results[i] = ValidationResult(invoice, False, f'工作时长{work_hours}h，当日无适用规则', work_hours)
+            else:
+                results[i] = ValidationResult(invoice, False, f'工作时长{work_hours}h未达到{threshold}h阈值', work_hours)
+
+    return ValidationReport(results)
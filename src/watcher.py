@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC_DIR)
+
+import database as db
+import importer
+import pairing
+from models import IngestedFile, InvoiceRecord
+
+POLL_INTERVAL = 30.0
+SETTLE_SECONDS = 2.0
+HASH_CHUNK_SIZE = 1024 * 1024
+
+INVOICE_UPDATE_FIELDS = ('amount', 'date', 'start_location', 'end_location', 'company')
+
+class FileChange(NamedTuple):
+    path: str
+    month_folder: str
+    size: int
+    mtime_ns: int
+    sha256: str
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestWatcher:
+    def __init__(self, root: str = db.UPLOADS_DIR, workers: int = importer.PARSE_WORKERS,
+                 settle: float = SETTLE_SECONDS):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.settle = settle
+
+    def scan(self, sources: List[importer.MonthSource]) -> Tuple[List[FileChange], List[Tuple[FileChange, IngestedFile]]]:
+        known = {f.path: f for f in db.get_ingested_files()}
+        now = time.time()
+        changed = []
+        touched = []
+
+        for source in sources:
+            for path in source.checkin_files + source.invoice_files:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime < self.settle:
+                    continue
+
+                entry = known.get(path)
+                if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+                    continue
+
+                change = FileChange(path, source.month_folder, stat.st_size, stat.st_mtime_ns, file_sha256(path))
+                if entry is not None and entry.sha256 == change.sha256:
+                    touched.append((change, entry))
+                else:
+                    changed.append(change)
+
+        return changed, touched
+
+    def poll(self) -> Dict:
+        started = time.perf_counter()
+        sources = {source.month_folder: source for source in importer.scan_sources(self.root)}
+        changed, touched = self.scan(list(sources.values()))
+
+        statuses = {}
+        bindings = {}
+        checkin_paths = {path for source in sources.values() for path in source.checkin_files}
+        checkin_changes = [c for c in changed if c.path in checkin_paths]
+        invoice_changes = [c for c in changed if c.path not in checkin_paths]
+
+        if checkin_changes:
+            statuses.update(self._ingest_checkins(checkin_changes))
+
+        if invoice_changes:
+            itinerary_paths = [c.path for c in invoice_changes if importer.is_itinerary_file(os.path.basename(c.path))]
+            parsed = importer.parse_taxi_pdfs(itinerary_paths, self.workers)
+
+            by_month = defaultdict(list)
+            for change in invoice_changes:
+                by_month[change.month_folder].append(change)
+            for month_folder, changes in by_month.items():
+                month_statuses, month_bindings = self._ingest_invoices(sources[month_folder], changes, parsed)
+                statuses.update(month_statuses)
+                bindings.update(month_bindings)
+
+        entries = [dict(change._asdict(), status=entry.status, message=entry.message, stored_name=entry.stored_name)
+                   for change, entry in touched]
+        for change in changed:
+            status, message = statuses.get(change.path, ('skipped', ''))
+            entries.append(dict(change._asdict(), status=status, message=message, stored_name=bindings.get(change.path)))
+        db.save_ingested_files(entries)
+
+        return {
+            'root': self.root,
+            'changed': len(changed),
+            'touched': len(touched),
+            'statuses': dict(Counter(status for status, _ in statuses.values())),
+            'months': sorted({change.month_folder for change in changed}),
+            'elapsed': round(time.perf_counter() - started, 3)
+        }
+
+    def _ingest_checkins(self, changes: List[FileChange]) -> Dict[str, Tuple[str, str]]:
+        parsed = importer.parse_checkin_files([c.path for c in changes], self.workers)
+        statuses = {}
+        for change in changes:
+            count, failed = importer.import_checkin_files({change.path: parsed[change.path]}, change.month_folder)
+            statuses[change.path] = ('imported', f'{count} 条打卡记录') if count else ('failed', failed[0])
+        return statuses
+
+    def _ingest_invoices(self, source: importer.MonthSource, changes: List[FileChange],
+                         parsed: Dict[str, Optional[Dict]]) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]:
+        month_folder = source.month_folder
+        file_paths = {os.path.basename(path): path for path in source.invoice_files}
+        changed_names = {os.path.basename(c.path) for c in changes}
+        existing = self._bound_records(month_folder)
+
+        statuses = {}
+        bindings = {}
+        new_pairs = {}
+        for base_name, pair in importer.pair_invoice_files(file_paths).items():
+            itinerary_file = pair.get('itinerary')
+            invoice_file = pair.get('invoice')
+            if itinerary_file not in changed_names and invoice_file not in changed_names:
+                continue
+
+            if not itinerary_file:
+                statuses[invoice_file] = ('waiting', '等待对应的行程单')
+                continue
+
+            record = existing.get(file_paths[itinerary_file])
+            if record is None:
+                if itinerary_file in changed_names:
+                    new_pairs[base_name] = pair
+                else:
+                    statuses[invoice_file] = ('paired', f'行程单 {itinerary_file} 未导入')
+                continue
+
+            updates = {}
+            if itinerary_file in changed_names:
+                updates, statuses[itinerary_file] = self._reparse_itinerary(parsed.get(file_paths[itinerary_file]), month_folder)
+                if updates:
+                    importer.store_attachment(file_paths[itinerary_file], month_folder, pairing.ITINERARY,
+                                              replace=True, file_name=record.source_file)
+                bindings[itinerary_file] = record.source_file
+            if invoice_file in changed_names:
+                updates['invoice_file'] = importer.store_attachment(file_paths[invoice_file], month_folder, pairing.INVOICE)
+                statuses[invoice_file] = ('paired', itinerary_file)
+                bindings[invoice_file] = updates['invoice_file']
+            if updates:
+                db.update_invoice_record(record.id, **updates)
+
+        parsed_by_name = {os.path.basename(path): record for path, record in parsed.items()}
+        store = importer.file_store(file_paths, month_folder)
+        stored_names = {}
+
+        def store_named(file_name: str, kind: str) -> str:
+            stored_name = store(file_name, kind)
+            stored_names[stored_name] = file_name
+            return stored_name
+
+        result = importer.import_invoice_pairs(new_pairs, parsed_by_name.get, month_folder, store_named)
+        outcomes = [(r, 'imported', '') for r in result.imported]
+        outcomes += [(r, 'duplicate', r['duplicate_reason']) for r in result.duplicates]
+        outcomes += [({'source_file': p['itinerary_file'], 'invoice_file': p['invoice_file']}, 'invalid', p['reason'])
+                     for p in result.invalid]
+        for record, status, message in outcomes:
+            for file_name in (record['source_file'], record['invoice_file']):
+                if file_name:
+                    statuses[stored_names.get(file_name, file_name)] = (status, message)
+        for record in result.imported:
+            for file_name in (record['source_file'], record['invoice_file']):
+                if file_name:
+                    bindings[stored_names.get(file_name, file_name)] = file_name
+        for pair in new_pairs.values():
+            for file_name in pair.values():
+                statuses.setdefault(file_name, ('failed', '解析失败'))
+
+        return ({file_paths[name]: status for name, status in statuses.items()},
+                {file_paths[name]: stored_name for name, stored_name in bindings.items()})
+
+    def _bound_records(self, month_folder: str) -> Dict[str, InvoiceRecord]:
+        records = {record.source_file: record for record in db.get_invoice_records(month_folder)}
+        stored_by_digest = {a.sha256: a.file_name for a in db.get_attachments(month_folder, pairing.ITINERARY)
+                            if a.file_name in records}
+
+        bound = {}
+        for entry in db.get_ingested_files(month_folder):
+            stored_name = entry.stored_name
+            if stored_name is None and entry.status in ('imported', 'updated'):
+                stored_name = stored_by_digest.get(entry.sha256)
+            if stored_name in records:
+                bound[entry.path] = records[stored_name]
+        return bound
+
+    def _reparse_itinerary(self, record: Optional[Dict], month_folder: str) -> Tuple[Dict, Tuple[str, str]]:
+        if not record or record.get('amount', 0) <= 0:
+            return {}, ('failed', '解析失败')
+        validation = importer.validate_invoice_for_import(record, month_folder)
+        if not validation['valid']:
+            return {}, ('invalid', validation['reason'])
+        return {key: record[key] for key in INVOICE_UPDATE_FIELDS}, ('updated', '')
+
+    def run(self, interval: float = POLL_INTERVAL, stop: Optional[threading.Event] = None,
+            on_poll: Optional[Callable[[Dict], None]] = None,
+            on_error: Optional[Callable[[Exception], None]] = None):
+        stop = stop or threading.Event()
+        on_error = on_error or report_error
+        while not stop.is_set():
+            try:
+                summary = self.poll()
+            except Exception as exc:
+                on_error(exc)
+            else:
+                if on_poll is not None:
+                    on_poll(summary)
+            stop.wait(interval)
+
+def report_error(exc: Exception):
+    print(json.dumps({'error': f'{type(exc).__name__}: {exc}', 'at': time.strftime('%Y-%m-%d %H:%M:%S')},
+                     ensure_ascii=False), file=sys.stderr, flush=True)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='监视月份文件夹，增量解析并导入新增或修改的打卡文件与行程单')
+    parser.add_argument('root', nargs='?', default=db.UPLOADS_DIR, help='包含月份文件夹（如 25_05）的共享目录')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='轮询间隔（秒）')
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS, help='文件修改后等待多久再解析（秒）')
+    parser.add_argument('--workers', type=int, default=importer.PARSE_WORKERS, help='解析进程数')
+    parser.add_argument('--once', action='store_true', help='只扫描一次后退出')
+    parser.add_argument('--db', help='数据库文件路径')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.DB_PATH = os.path.abspath(args.db)
+    if not os.path.isdir(args.root):
+        print(json.dumps({'error': f'目录不存在: {args.root}'}, ensure_ascii=False), file=sys.stderr)
+        return 2
+
+    db.init_db()
+    watcher = IngestWatcher(args.root, args.workers, args.settle)
+
+    def report(summary: Dict):
+        if args.once or summary['changed']:
+            print(json.dumps(summary, ensure_ascii=False), flush=True)
+
+    if args.once:
+        report(watcher.poll())
+        return 0
+
+    try:
+        watcher.run(args.interval, on_poll=report)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
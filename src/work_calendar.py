@@ -0,0 +1,63 @@
+from datetime import date
+from typing import Optional, Tuple, Iterable
+import numpy as np
+
+WEEKDAY_NAMES = ('星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日')
+
+WORKDAY, WEEKEND, HOLIDAY = 0, 1, 2
+
+CALENDAR_START = np.datetime64('1999-12-01', 'D')
+CALENDAR_END = np.datetime64('2100-01-01', 'D')
+
+_START = CALENDAR_START.astype(np.int64)
+_DAYS = np.arange(CALENDAR_START, CALENDAR_END)
+
+WEEKDAY = ((_DAYS.astype(np.int64) + 3) % 7).astype(np.int8)
+EXPENSE_MONTH = _DAYS.astype('datetime64[M]').astype(np.int32)
+REIMBURSE_MONTH = EXPENSE_MONTH + 1
+
+_FIRST_MONTH = int(EXPENSE_MONTH[0])
+_MONTH_OFFSETS = np.append(np.flatnonzero(np.diff(EXPENSE_MONTH, prepend=_FIRST_MONTH - 1)), len(_DAYS))
+_WEEKDAY_NAMES = np.array(WEEKDAY_NAMES)
+
+class WorkCalendar:
+    __slots__ = ('day_type',)
+
+    def __init__(self, holidays: Iterable = (), workdays: Iterable = ()):
+        self.day_type = np.where(WEEKDAY >= 5, WEEKEND, WORKDAY).astype(np.int8)
+        self.day_type[day_index(list(workdays))] = WORKDAY
+        self.day_type[day_index(list(holidays))] = HOLIDAY
+
+    def day_types(self, dates) -> np.ndarray:
+        return self.day_type[day_index(dates)]
+
+def day_index(dates) -> np.ndarray:
+    index = np.asarray(dates, dtype='datetime64[D]').astype(np.int64) - _START
+    if index.size and (index.min() < 0 or index.max() >= len(_DAYS)):
+        raise ValueError('日期超出日历范围')
+    return index
+
+def weekday_names(dates) -> np.ndarray:
+    return _WEEKDAY_NAMES[WEEKDAY[day_index(dates)]]
+
+def month_folder_name(month: int) -> str:
+    year, month = divmod(int(month), 12)
+    return f"{str(1970 + year)[-2:]}_{str(month + 1).zfill(2)}"
+
+def reimburse_month(value) -> str:
+    return month_folder_name(REIMBURSE_MONTH[day_index([value])[0]])
+
+def get_expense_month_range(month_folder: str) -> Tuple[Optional[date], Optional[date]]:
+    try:
+        year = 2000 + int(month_folder[:2])
+        month = int(month_folder[3:5])
+    except (TypeError, ValueError):
+        return None, None
+    if not 1 <= month <= 12:
+        return None, None
+
+    offset = (year - 1970) * 12 + month - 2 - _FIRST_MONTH
+    if not 0 <= offset < len(_MONTH_OFFSETS) - 1:
+        return None, None
+
+    return _DAYS[_MONTH_OFFSETS[offset]].item(), _DAYS[_MONTH_OFFSETS[offset + 1] - 1].item()